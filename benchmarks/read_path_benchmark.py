@@ -0,0 +1,69 @@
+"""
+Сравнение стоимости одной строки при чтении списка товаров через ORM
+(select(Item) + экземпляры модели) и через Core (select колонок + ItemRow),
+включая валидацию в ItemResponse.
+
+Запуск из корня репозитория:
+    PYTHONPATH=src python benchmarks/read_path_benchmark.py [--rows 50000] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from items_app.api.schemas.item_schemas import ItemResponse
+from items_app.infrastructure.postgres.models import Base, Company, Item
+from items_app.infrastructure.postgres.rows import ItemRow, ITEM_ROW_COLUMNS
+
+
+async def read_orm(session):
+    cursor = await session.execute(select(Item))
+    items = list(cursor.scalars().all())
+    return [ItemResponse.model_validate(item) for item in items]
+
+
+async def read_rows(session):
+    cursor = await session.execute(select(*ITEM_ROW_COLUMNS))
+    items = [ItemRow(*row) for row in cursor]
+    return [ItemResponse.model_validate(item) for item in items]
+
+
+async def measure(session_factory, read, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with session_factory() as session:
+            started = time.perf_counter()
+            await read(session)
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main(rows: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        company_id = uuid.uuid4()
+        await conn.execute(insert(Company).values(id=company_id, name="Benchmark"))
+        await conn.execute(
+            insert(Item),
+            [
+                {"id": uuid.uuid4(), "title": f"Item {i}", "price": i + 0.5, "company_id": company_id}
+                for i in range(rows)
+            ],
+        )
+
+    for name, read in (("ORM", read_orm), ("Core rows", read_rows)):
+        elapsed = await measure(session_factory, read, repeat)
+        print(f"{name:<10} {elapsed * 1000:9.1f} ms total  {elapsed / rows * 1e6:7.2f} us/row")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
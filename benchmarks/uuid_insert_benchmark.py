@@ -0,0 +1,66 @@
+"""
+Пропускная способность пакетной вставки в таблицу companies с первичным ключом
+из UUIDv4 (случайные листья B-дерева) и из UUIDv7 (вставка в правый край индекса).
+
+По умолчанию используется временный файл SQLite; для PostgreSQL передайте --url
+(таблица companies создаётся и удаляется, поэтому используйте отдельную базу).
+
+Запуск из корня репозитория:
+    PYTHONPATH=src python benchmarks/uuid_insert_benchmark.py \
+        [--url postgresql+asyncpg://...] [--rows 200000] [--batch 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from items_app.infrastructure.postgres.ids import uuid7
+from items_app.infrastructure.postgres.models import Company
+
+
+async def measure(url: str, generate_id, rows: int, batch: int) -> float:
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Company.__table__.drop, checkfirst=True)
+        await conn.run_sync(Company.__table__.create)
+
+    started = time.perf_counter()
+    for offset in range(0, rows, batch):
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(Company),
+                [
+                    {"id": generate_id(), "name": f"Company {offset + i}"}
+                    for i in range(min(batch, rows - offset))
+                ],
+            )
+    elapsed = time.perf_counter() - started
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Company.__table__.drop)
+    await engine.dispose()
+    return elapsed
+
+
+async def main(url: str, rows: int, batch: int) -> None:
+    for name, generate_id in (("uuid4", uuid.uuid4), ("uuid7", uuid7)):
+        elapsed = await measure(url, generate_id, rows, batch)
+        print(f"{name:<6} {elapsed:8.2f} s  {rows / elapsed:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+    if args.url:
+        asyncio.run(main(args.url, args.rows, args.batch))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "uuid_insert_benchmark.db")
+            asyncio.run(main(f"sqlite+aiosqlite:///{path}", args.rows, args.batch))
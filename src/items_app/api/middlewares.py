@@ -0,0 +1,35 @@
+import time
+from fastapi import Request
+from items_app.infrastructure.config import config
+
+
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def is_primary_sticky(request: Request) -> bool:
+    """
+    Проверяет, писал ли клиент недавно, и должен ли он читать с основной базы.
+    """
+    sticky_until = request.cookies.get(PRIMARY_STICKY_COOKIE)
+    try:
+        return sticky_until is not None and float(sticky_until) > time.time()
+    except ValueError:
+        return False
+
+
+async def primary_stickiness_middleware(request: Request, call_next):
+    """
+    После успешного пишущего запроса ставит cookie, по которой чтения клиента
+    в течение DB_REPLICA_STICKINESS_SECONDS идут в основную базу (read-your-writes).
+    """
+    response = await call_next(request)
+    if request.method not in READ_ONLY_METHODS and response.status_code < 400:
+        stickiness = config.DB_REPLICA_STICKINESS_SECONDS
+        response.set_cookie(
+            PRIMARY_STICKY_COOKIE,
+            str(time.time() + stickiness),
+            max_age=stickiness,
+            httponly=True,
+        )
+    return response
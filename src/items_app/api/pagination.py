@@ -0,0 +1,62 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
+
+""" Курсоры keyset-пагинации: значение колонки сортировки и ID последнего товара страницы. """
+
+
+def encode_cursor(item: Any, sort: Optional[str]) -> str:
+    sort_field = sort.lstrip("-") if sort else "id"
+    payload = [getattr(item, sort_field), str(item.id)]
+    if sort_field == "id":
+        payload[0] = None
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: Optional[str]) -> Tuple[Any, UUID]:
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = UUID(last_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+    sort_field = sort.lstrip("-") if sort else "id"
+    expected_types: Dict[str, Union[type, Tuple[type, ...]]] = {
+        "price": (int, float),
+        "title": str,
+        "id": type(None),
+    }
+    expected_type = expected_types[sort_field]
+    if not isinstance(value, expected_type) or isinstance(value, bool):
+        raise ValueError("Pagination cursor does not match the requested sort")
+    return value, last_id
+
+
+def encode_changes_cursor(positions: Sequence[Optional[Tuple[int, Optional[UUID]]]]) -> str:
+    """Курсор ленты изменений: позиция (версия, ID) для каждого шарда."""
+    payload = [
+        None if position is None else [position[0], str(position[1]) if position[1] else None]
+        for position in positions
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_changes_cursor(cursor: str) -> List[Optional[Tuple[int, Optional[UUID]]]]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        positions: List[Optional[Tuple[int, Optional[UUID]]]] = []
+        for position in payload:
+            if position is None:
+                positions.append(None)
+                continue
+            version, last_id = position
+            if not isinstance(version, int) or isinstance(version, bool):
+                raise TypeError("Change version must be an integer")
+            positions.append((version, UUID(last_id) if last_id else None))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid changes cursor") from e
+    if not positions:
+        raise ValueError("Invalid changes cursor")
+    return positions
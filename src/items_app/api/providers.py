@@ -1,12 +1,37 @@
-from typing import Annotated
-from fastapi import Depends
+import asyncio
+import logging
+from functools import partial
+from typing import Annotated, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from items_app.infrastructure.postgres.database import async_session
+from items_app.api.middlewares import is_primary_sticky
+from items_app.infrastructure.config import config
+from items_app.infrastructure.postgres.database import shard_router
+from items_app.infrastructure.postgres.ids import uuid7
+from items_app.infrastructure.postgres.lazy_session import LazySession
+from items_app.infrastructure.postgres.rows import CompanyRow, ItemRow
+from items_app.infrastructure.postgres.shards import Shard, ShardRouter
 from items_app.infrastructure.postgres.repositories.item_repo import ItemRepo
 from items_app.infrastructure.postgres.repositories.company_repo import CompanyRepo
 from items_app.infrastructure.redis.cache.async_client import AsyncRedisClient
 from items_app.infrastructure.redis.cache.json_serializer import JsonSerializer
 from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
+from items_app.application.batching.micro_batcher import MicroBatcher, get_lookup_batcher
+from items_app.application.cache_outbox.cache_outbox_relay import CacheOutboxRelay
+from items_app.application.change_stream.change_stream import (
+    ChangePublisher,
+    ChangeStream,
+    change_stream,
+)
+from items_app.application.company_filter.company_filter import (
+    CompanyExistenceFilter,
+    company_filter,
+)
+from items_app.application.write_behind.price_write_behind import (
+    PriceWriteBehindBuffer,
+    price_write_behind,
+)
 from items_app.application.items_applications.items_applications_service import (
     ItemsApplicationsService,
 )
@@ -15,15 +40,159 @@ from items_app.application.companies_applications.companies_applications_service
 )
 
 
+logger = logging.getLogger(__name__)
+
+
+# --- Получение шарда запроса ---
+def get_shard_router() -> ShardRouter:
+    return shard_router
+
+
+async def get_request_company_id(request: Request) -> Optional[UUID]:
+    """
+    Ключ шардирования запроса: ID компании из пути, строки запроса или JSON-тела.
+    ID новой компании назначается заранее (assign_new_company_id), чтобы она
+    сразу создавалась в своём шарде.
+    """
+    company_id = getattr(request.state, "company_id", None)
+    company_id = company_id or request.path_params.get("company_id")
+    company_id = company_id or request.query_params.get("company_id")
+    if company_id is None and request.headers.get("content-type", "").startswith(
+        "application/json"
+    ):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict):
+            company_id = body.get("company_id")
+    try:
+        return UUID(str(company_id)) if company_id else None
+    except ValueError:
+        return None
+
+
+def assign_new_company_id(request: Request) -> UUID:
+    # Должна объявляться в роуте раньше зависимостей, получающих сессию
+    request.state.company_id = uuid7()
+    return request.state.company_id
+
+
+def get_request_shard(
+    router: Annotated[ShardRouter, Depends(get_shard_router)],
+    company_id: Annotated[Optional[UUID], Depends(get_request_company_id)],
+) -> Shard:
+    return router.shard_for(company_id)
+
+
 # --- Получение сессии базы данных ---
-async def get_session():
-    session = async_session()
+# Сессии ленивые: соединение берётся из пула только при первом обращении к БД,
+# а все репозитории запроса получают одну и ту же сессию (зависимость кешируется FastAPI)
+async def get_session(shard: Annotated[Shard, Depends(get_request_shard)]):
+    session = LazySession(shard.replicas.write_session, bind=shard.bind)
     try:
         yield session
     finally:
         await session.close()
 
 
+# --- Фабрика сессий основной базы шарда для фоновых задач, переживающих запрос ---
+def get_session_factory(
+    shard: Annotated[Shard, Depends(get_request_shard)],
+) -> Callable[[], AsyncSession]:
+    return shard.replicas.write_session
+
+
+# --- Фабрики сессий всех шардов для фоновых задач по всем компаниям ---
+def get_shard_session_factories(
+    router: Annotated[ShardRouter, Depends(get_shard_router)],
+) -> List[Callable[[], AsyncSession]]:
+    return [shard.replicas.write_session for shard in router.shards]
+
+
+# --- Получение сессии реплики для чтения (основная база сразу после записи клиента) ---
+async def get_read_session(
+    request: Request,
+    session: Annotated[LazySession, Depends(get_session)],
+    shard: Annotated[Shard, Depends(get_request_shard)],
+):
+    # Без реплик чтения идут через сессию основной базы, а не через вторую сессию
+    if is_primary_sticky(request) or not shard.replicas.has_replicas:
+        yield session
+        return
+    # Реплика выбирается (и проверяется) только при первом чтении из БД
+    read_session = LazySession(shard.replicas.read_session, bind=shard.bind)
+    try:
+        yield read_session
+    finally:
+        await read_session.close()
+
+
+# --- Получение сессий чтения всех шардов для запросов без компании (scatter-gather) ---
+async def get_shard_read_sessions(
+    request: Request,
+    router: Annotated[ShardRouter, Depends(get_shard_router)],
+):
+    # Без шардирования запросы без компании обслуживает сессия чтения запроса
+    if not router.is_sharded:
+        yield None
+        return
+    sticky = is_primary_sticky(request)
+    sessions = [
+        LazySession(
+            shard.replicas.write_session if sticky else shard.replicas.read_session,
+            bind=shard.bind,
+        )
+        for shard in router.shards
+    ]
+    try:
+        yield sessions
+    finally:
+        await asyncio.gather(*(session.close() for session in sessions))
+
+
+# --- Получение сессий основных баз всех шардов для записей, затрагивающих разные компании ---
+async def get_shard_write_sessions(
+    router: Annotated[ShardRouter, Depends(get_shard_router)],
+    shard: Annotated[Shard, Depends(get_request_shard)],
+    session: Annotated[LazySession, Depends(get_session)],
+):
+    # Без шардирования все записи идут через сессию запроса; шард запроса её и использует
+    if not router.is_sharded:
+        yield None
+        return
+    sessions = {
+        other.name: (
+            session
+            if other is shard
+            else LazySession(other.replicas.write_session, bind=other.bind)
+        )
+        for other in router.shards
+    }
+    try:
+        yield sessions
+    finally:
+        await asyncio.gather(
+            *(
+                other_session.close()
+                for other_session in sessions.values()
+                if other_session is not session
+            )
+        )
+
+
+# --- Время жизни в кеше прочитанного: короткое, если чтения идут с реплик ---
+def get_read_cache_expire_seconds(
+    request: Request,
+    router: Annotated[ShardRouter, Depends(get_shard_router)],
+) -> int:
+    if is_primary_sticky(request) or not any(
+        shard.replicas.has_replicas for shard in router.shards
+    ):
+        return config.REDIS_CACHE_EXPIRE_SECONDS
+    return config.DB_REPLICA_CACHE_EXPIRE_SECONDS
+
+
 # --- Получение репозиториев для работы с БД ---
 def get_item_repo(session: Annotated[AsyncSession, Depends(get_session)]) -> ItemRepo:
     return ItemRepo(async_session=session)
@@ -35,6 +204,45 @@ def get_company_repo(
     return CompanyRepo(async_session=session)
 
 
+def get_read_item_repo(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+) -> ItemRepo:
+    return ItemRepo(async_session=session)
+
+
+def get_read_company_repo(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+) -> CompanyRepo:
+    return CompanyRepo(async_session=session)
+
+
+def get_shard_item_repos(
+    item_repo: Annotated[ItemRepo, Depends(get_item_repo)],
+    sessions: Annotated[
+        Optional[Dict[str, LazySession]], Depends(get_shard_write_sessions)
+    ],
+    session: Annotated[LazySession, Depends(get_session)],
+) -> Optional[Dict[str, ItemRepo]]:
+    if not sessions:
+        return None
+    return {
+        name: item_repo if shard_session is session else ItemRepo(async_session=shard_session)
+        for name, shard_session in sessions.items()
+    }
+
+
+def get_shard_read_item_repos(
+    sessions: Annotated[Optional[List[LazySession]], Depends(get_shard_read_sessions)],
+) -> Optional[List[ItemRepo]]:
+    return [ItemRepo(async_session=session) for session in sessions] if sessions else None
+
+
+def get_shard_read_company_repos(
+    sessions: Annotated[Optional[List[LazySession]], Depends(get_shard_read_sessions)],
+) -> Optional[List[CompanyRepo]]:
+    return [CompanyRepo(async_session=session) for session in sessions] if sessions else None
+
+
 # --- Получение клиента Redis, сериализатора и менеджера кеша ---
 def get_async_redis_client() -> AsyncRedisClient:
     return AsyncRedisClient()
@@ -51,16 +259,262 @@ def get_async_cache_manager(
     return AsyncCacheManager(redis_client=redis_client, serializer=json_serializer)
 
 
+# --- Получение ретранслятора событий инвалидации кеша ---
+def get_cache_outbox_relay(
+    session_factory: Annotated[
+        Callable[[], AsyncSession], Depends(get_session_factory)
+    ],
+    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)],
+) -> CacheOutboxRelay:
+    return CacheOutboxRelay(session_factory=session_factory, cache=cache)
+
+
+# --- Получение публикатора событий изменений и общего для процесса потока изменений ---
+def get_change_publisher(
+    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)],
+) -> ChangePublisher:
+    return ChangePublisher(cache=cache)
+
+
+def get_change_stream() -> ChangeStream:
+    return change_stream
+
+
+# --- Получение общих для процесса батчеров чтений по ID (свой у каждого шарда) ---
+# Клиент, недавно писавший, читает с основной базы: его чтения не объединяются
+# с чужими, которые могут выполниться на реплике
+def get_item_lookup_batcher(
+    request: Request, shard: Annotated[Shard, Depends(get_request_shard)]
+) -> Optional[MicroBatcher]:
+    if is_primary_sticky(request):
+        return None
+    return get_lookup_batcher("items", shard.name, partial(load_items_batch, shard))
+
+
+def get_company_lookup_batcher(
+    request: Request, shard: Annotated[Shard, Depends(get_request_shard)]
+) -> Optional[MicroBatcher]:
+    if is_primary_sticky(request):
+        return None
+    return get_lookup_batcher("companies", shard.name, partial(load_companies_batch, shard))
+
+
+# --- Получение общего для процесса фильтра существующих компаний ---
+def get_company_filter() -> CompanyExistenceFilter:
+    return company_filter
+
+
+# --- Получение общего для процесса буфера отложенной записи цен ---
+def get_price_write_behind() -> PriceWriteBehindBuffer:
+    return price_write_behind
+
+
 # --- Получение сервисов для работы с сущностями ---
 def get_items_app_service(
     item_repo: Annotated[ItemRepo, Depends(get_item_repo)],
-    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)]
+    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)],
+    read_item_repo: Annotated[ItemRepo, Depends(get_read_item_repo)],
+    outbox_relay: Annotated[CacheOutboxRelay, Depends(get_cache_outbox_relay)],
+    lookup_batcher: Annotated[Optional[MicroBatcher], Depends(get_item_lookup_batcher)],
+    company_filter: Annotated[CompanyExistenceFilter, Depends(get_company_filter)],
+    shard_read_item_repos: Annotated[
+        Optional[List[ItemRepo]], Depends(get_shard_read_item_repos)
+    ],
+    shard_item_repos: Annotated[
+        Optional[Dict[str, ItemRepo]], Depends(get_shard_item_repos)
+    ],
+    router: Annotated[ShardRouter, Depends(get_shard_router)],
+    change_publisher: Annotated[ChangePublisher, Depends(get_change_publisher)],
+    price_buffer: Annotated[PriceWriteBehindBuffer, Depends(get_price_write_behind)],
+    read_cache_expire_seconds: Annotated[int, Depends(get_read_cache_expire_seconds)],
 ) -> ItemsApplicationsService:
-    return ItemsApplicationsService(item_repo=item_repo, cache=cache)
+    return ItemsApplicationsService(
+        item_repo=item_repo,
+        cache=cache,
+        read_item_repo=read_item_repo,
+        outbox_relay=outbox_relay,
+        lookup_batcher=lookup_batcher,
+        company_filter=company_filter,
+        shard_read_item_repos=shard_read_item_repos,
+        shard_router=router,
+        shard_item_repos=shard_item_repos,
+        change_publisher=change_publisher,
+        price_buffer=price_buffer,
+        read_cache_expire_seconds=read_cache_expire_seconds,
+    )
 
 
 def get_companies_app_service(
     company_repo: Annotated[CompanyRepo, Depends(get_company_repo)],
-    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)]
+    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)],
+    read_company_repo: Annotated[CompanyRepo, Depends(get_read_company_repo)],
+    outbox_relay: Annotated[CacheOutboxRelay, Depends(get_cache_outbox_relay)],
+    lookup_batcher: Annotated[Optional[MicroBatcher], Depends(get_company_lookup_batcher)],
+    company_filter: Annotated[CompanyExistenceFilter, Depends(get_company_filter)],
+    shard_read_company_repos: Annotated[
+        Optional[List[CompanyRepo]], Depends(get_shard_read_company_repos)
+    ],
+    change_publisher: Annotated[ChangePublisher, Depends(get_change_publisher)],
+    read_cache_expire_seconds: Annotated[int, Depends(get_read_cache_expire_seconds)],
 ) -> CompaniesApplicationsService:
-    return CompaniesApplicationsService(company_repo=company_repo, cache=cache)
+    return CompaniesApplicationsService(
+        company_repo=company_repo,
+        cache=cache,
+        read_company_repo=read_company_repo,
+        outbox_relay=outbox_relay,
+        lookup_batcher=lookup_batcher,
+        company_filter=company_filter,
+        shard_read_company_repos=shard_read_company_repos,
+        change_publisher=change_publisher,
+        read_cache_expire_seconds=read_cache_expire_seconds,
+    )
+
+
+# --- Загрузка пакетов батчеров: сессия реплики шарда на пакет, а не сессия запроса ---
+def _lookup_cache_expire_seconds(shard: Shard) -> int:
+    if shard.replicas.has_replicas:
+        return config.DB_REPLICA_CACHE_EXPIRE_SECONDS
+    return config.REDIS_CACHE_EXPIRE_SECONDS
+
+
+async def load_items_batch(
+    shard: Shard, keys: List[Tuple[UUID, UUID]]
+) -> Dict[Tuple[UUID, UUID], ItemRow]:
+    cache = get_async_cache_manager(get_async_redis_client(), get_json_serializer())
+    session = LazySession(shard.replicas.read_session, bind=shard.bind)
+    try:
+        items_service = ItemsApplicationsService(
+            item_repo=ItemRepo(async_session=session),
+            cache=cache,
+            read_cache_expire_seconds=_lookup_cache_expire_seconds(shard),
+        )
+        return await items_service.load_items_batch(keys)
+    finally:
+        await session.close()
+
+
+async def load_companies_batch(shard: Shard, company_ids: List[UUID]) -> Dict[UUID, CompanyRow]:
+    cache = get_async_cache_manager(get_async_redis_client(), get_json_serializer())
+    session = LazySession(shard.replicas.read_session, bind=shard.bind)
+    try:
+        companies_service = CompaniesApplicationsService(
+            company_repo=CompanyRepo(async_session=session),
+            cache=cache,
+            read_cache_expire_seconds=_lookup_cache_expire_seconds(shard),
+        )
+        return await companies_service.load_companies_batch(company_ids)
+    finally:
+        await session.close()
+
+
+# --- Фоновые задачи ---
+async def run_company_purge(
+    company_id: UUID,
+    session_factory: Callable[[], AsyncSession],
+    cache: AsyncCacheManager,
+) -> None:
+    async with session_factory() as session:
+        companies_service = CompaniesApplicationsService(
+            company_repo=CompanyRepo(async_session=session),
+            cache=cache,
+            outbox_relay=CacheOutboxRelay(session_factory=session_factory, cache=cache),
+        )
+        await companies_service.purge_deleted_company(company_id)
+
+
+async def sweep_deleted_companies(
+    session_factories: List[Callable[[], AsyncSession]],
+    cache: AsyncCacheManager,
+) -> int:
+    # Доочищает компании, помеченные удалёнными: фоновая задача запроса могла не завершиться
+    # (перезапуск, сбой); очистка продолжается с сохранённого прогресса
+    purged = 0
+    for session_factory in session_factories:
+        async with session_factory() as session:
+            company_ids = await CompanyRepo(async_session=session).get_deleted_company_ids()
+        if company_ids is None:
+            logger.error("Deleted companies sweep failed: could not read deleted companies")
+            continue
+        for company_id in company_ids:
+            await run_company_purge(company_id, session_factory, cache)
+            purged += 1
+    return purged
+
+
+async def run_company_stats_reconciliation(
+    session_factories: List[Callable[[], AsyncSession]],
+    cache: AsyncCacheManager,
+    company_id: Optional[UUID] = None,
+) -> None:
+    # Шарды пересчитываются по очереди, каждый в своей транзакции
+    for session_factory in session_factories:
+        async with session_factory() as session:
+            companies_service = CompaniesApplicationsService(
+                company_repo=CompanyRepo(async_session=session),
+                cache=cache,
+                outbox_relay=CacheOutboxRelay(session_factory=session_factory, cache=cache),
+            )
+            try:
+                rebuilt = await companies_service.reconcile_company_stats(company_id)
+                logger.info(f"Company stats rebuilt for {rebuilt} companies")
+            except Exception as e:
+                logger.error(f"Company stats reconciliation failed: {e}")
+
+
+async def flush_company_prices(
+    company_id: UUID,
+    updates: List[Tuple[UUID, float, Optional[str]]],
+    router: ShardRouter = shard_router,
+) -> Tuple[int, List[str]]:
+    # Отложенные цены пишутся тем же пакетным обновлением, что и PATCH /items/bulk:
+    # с версиями изменений, инвалидацией кеша и событиями для подписчиков
+    cache = get_async_cache_manager(get_async_redis_client(), get_json_serializer())
+    session_factory = router.shard_for(company_id).replicas.write_session
+    async with session_factory() as session:
+        items_service = ItemsApplicationsService(
+            item_repo=ItemRepo(async_session=session),
+            cache=cache,
+            outbox_relay=CacheOutboxRelay(session_factory=session_factory, cache=cache),
+            change_publisher=ChangePublisher(cache=cache),
+        )
+        return await items_service.bulk_update_items(company_id, updates)
+
+
+async def run_cache_outbox_relay() -> None:
+    # Фоновые ретрансляторы всех шардов на время жизни приложения (зависимости без переопределений)
+    cache = get_async_cache_manager(get_async_redis_client(), get_json_serializer())
+    await asyncio.gather(
+        *(
+            CacheOutboxRelay(session_factory=shard.replicas.write_session, cache=cache).run()
+            for shard in shard_router.shards
+        )
+    )
+
+
+async def run_deleted_companies_sweep() -> None:
+    cache = get_async_cache_manager(get_async_redis_client(), get_json_serializer())
+    session_factories = [shard.replicas.write_session for shard in shard_router.shards]
+    while True:
+        try:
+            await sweep_deleted_companies(session_factories, cache)
+        except Exception as e:
+            logger.error(f"Deleted companies sweep failed: {e}")
+        await asyncio.sleep(config.COMPANY_PURGE_SWEEP_INTERVAL_SECONDS)
+
+
+async def run_company_filter() -> None:
+    # Строится с основных баз шардов: на реплике только что созданная компания может отсутствовать
+    await company_filter.run(
+        session_factories=[shard.replicas.write_session for shard in shard_router.shards]
+    )
+
+
+async def run_change_stream() -> None:
+    # Слушатель канала Redis, раздающий события подключениям SSE этого экземпляра
+    cache = get_async_cache_manager(get_async_redis_client(), get_json_serializer())
+    await change_stream.run(cache)
+
+
+async def run_price_write_behind() -> None:
+    # Периодический сброс отложенных цен; при остановке приложения — последний сброс
+    await price_write_behind.run(flush_company_prices)
@@ -1,13 +1,26 @@
 import logging
 from uuid import UUID
-from typing import Annotated, List, Optional, Union, Dict
-from fastapi import APIRouter, Depends, HTTPException
-from items_app.api.providers import get_companies_app_service
+from typing import Annotated, Callable, List, Literal, Optional, Union, Dict
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from items_app.api.providers import (
+    assign_new_company_id,
+    get_async_cache_manager,
+    get_companies_app_service,
+    get_session_factory,
+    get_shard_session_factories,
+    run_company_purge,
+    run_company_stats_reconciliation,
+)
 from items_app.api.schemas.company_schemas import (
     CompanyCreate,
     CompanyResponse,
     CompanyUpdate,
     CompanyUpdateResponse,
+    CompanyWithItemsResponse,
+    CompanyDeletionProgress,
+    CompanyStatsResponse,
+    CompanyPriceStatsResponse,
 )
 from items_app.application.companies_applications.companies_applications_service import (
     CompaniesApplicationsService,
@@ -16,6 +29,7 @@ from items_app.application.companies_applications.companies_applications_excepti
     CompanyNotFound,
 )
 from items_app.infrastructure.postgres.models import Company
+from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
 
 
 logger = logging.getLogger(__name__)
@@ -26,12 +40,14 @@ router = APIRouter(prefix="/companies", tags=["Companies"])
 @router.post("", summary="Создание компании")
 async def create_new_company(
     new_company_schema: CompanyCreate,
+    # ID назначается до получения сессии: по нему выбирается шард новой компании
+    new_company_id: Annotated[UUID, Depends(assign_new_company_id)],
     companies_service: Annotated[
         CompaniesApplicationsService, Depends(get_companies_app_service)
     ],
 ):
     try:
-        new_company_data = Company(name=new_company_schema.name)
+        new_company_data = Company(id=new_company_id, name=new_company_schema.name)
         new_company = await companies_service.create_company(new_company_data)
         company_response = CompanyResponse.model_validate(new_company)
         return {
@@ -66,6 +82,109 @@ async def get_company_by_id(
         raise HTTPException(status_code=500, detail="Failed to fetch company")
 
 
+@router.get(
+    "/{company_id}/items",
+    summary="Вывод компании вместе со страницей её товаров одним запросом",
+    response_model=CompanyWithItemsResponse,
+)
+async def get_company_with_items(
+    company_id: UUID,
+    companies_service: Annotated[
+        CompaniesApplicationsService, Depends(get_companies_app_service)
+    ],
+    offset: Optional[int] = 0,
+    limit: Optional[int] = 10,
+    include_total: bool = False,
+):
+    try:
+        company = await companies_service.fetch_company_with_items(
+            company_id, offset, limit
+        )
+        company_response = CompanyWithItemsResponse.model_validate(company)
+        if include_total:
+            company_response.total_items = await companies_service.count_company_items(
+                company_id
+            )
+        return company_response
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch company with items")
+
+
+@router.get(
+    "/{company_id}/stats",
+    summary="Количество товаров компании и минимальная, максимальная и средняя цена",
+    response_model=CompanyStatsResponse,
+)
+async def get_company_stats(
+    company_id: UUID,
+    companies_service: Annotated[
+        CompaniesApplicationsService, Depends(get_companies_app_service)
+    ],
+):
+    try:
+        company_stats = await companies_service.fetch_company_stats(company_id)
+        return CompanyStatsResponse.model_validate(company_stats)
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch company stats")
+
+
+@router.get(
+    "/{company_id}/price-stats",
+    summary="Квантили, гистограмма и выбросы цен товаров компании",
+    response_model=CompanyPriceStatsResponse,
+)
+async def get_company_price_stats(
+    company_id: UUID,
+    companies_service: Annotated[
+        CompaniesApplicationsService, Depends(get_companies_app_service)
+    ],
+    bins: int = Query(10, ge=1, le=100, description="Число корзин гистограммы"),
+    z_threshold: float = Query(3.0, gt=0, description="Порог |z-оценки| для выбросов"),
+):
+    try:
+        return await companies_service.fetch_company_price_stats(
+            company_id, bins=bins, z_threshold=z_threshold
+        )
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch company price stats")
+
+
+@router.post(
+    "/stats/reconcile",
+    summary="Фоновый пересчёт агрегатов компаний с нуля",
+    status_code=202,
+)
+async def reconcile_company_stats(
+    background_tasks: BackgroundTasks,
+    session_factory: Annotated[
+        Callable[[], AsyncSession], Depends(get_session_factory)
+    ],
+    shard_session_factories: Annotated[
+        List[Callable[[], AsyncSession]], Depends(get_shard_session_factories)
+    ],
+    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)],
+    company_id: Optional[UUID] = None,
+):
+    # Одна компания пересчитывается в своём шарде, все компании — во всех шардах
+    session_factories = [session_factory] if company_id else shard_session_factories
+    background_tasks.add_task(
+        run_company_stats_reconciliation, session_factories, cache, company_id
+    )
+    return {"message": "Company stats reconciliation started"}
+
+
 @router.get(
     "", summary="Вывод всех компаний", response_model=Union[List[CompanyResponse], Dict]
 )
@@ -75,9 +194,18 @@ async def get_all_companies(
     ],
     offset: Optional[int] = 0,
     limit: Optional[int] = 10,
+    include_total: bool = False,
 ):
     try:
         companies = await companies_service.fetch_all_companies(offset, limit)
+        if include_total:
+            total = await companies_service.count_companies()
+            return {
+                "companies": [
+                    CompanyResponse.model_validate(company) for company in companies or []
+                ],
+                "total": total,
+            }
         if companies:
             company_response = [
                 CompanyResponse.model_validate(company) for company in companies
@@ -124,8 +252,24 @@ async def delete_company_by_id(
     companies_service: Annotated[
         CompaniesApplicationsService, Depends(get_companies_app_service)
     ],
+    background_tasks: BackgroundTasks,
+    session_factory: Annotated[
+        Callable[[], AsyncSession], Depends(get_session_factory)
+    ],
+    cache: Annotated[AsyncCacheManager, Depends(get_async_cache_manager)],
+    mode: Literal["sync", "background"] = "sync",
 ):
     try:
+        if mode == "background":
+            # Компания сразу помечается удалённой, товары удаляются пакетами в фоне
+            progress = await companies_service.mark_company_deleted(company_id)
+            background_tasks.add_task(
+                run_company_purge, company_id, session_factory, cache
+            )
+            return {
+                "message": "Company marked as deleted, its items are being deleted",
+                "progress": progress,
+            }
         result = await companies_service.delete_company(company_id)
         if result is None:
             raise CompanyNotFound(f"Company with company_id={company_id} not found")
@@ -141,3 +285,26 @@ async def delete_company_by_id(
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete company")
+
+
+@router.get(
+    "/{company_id}/deletion",
+    summary="Прогресс фонового удаления компании",
+    response_model=CompanyDeletionProgress,
+)
+async def get_company_deletion_progress(
+    company_id: UUID,
+    companies_service: Annotated[
+        CompaniesApplicationsService, Depends(get_companies_app_service)
+    ],
+):
+    try:
+        return await companies_service.fetch_company_deletion_progress(company_id)
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to fetch company deletion progress"
+        )
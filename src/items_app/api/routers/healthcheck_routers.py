@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Depends
 from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
 from items_app.api.providers import get_async_cache_manager
+from items_app.application.cache_outbox.cache_outbox_relay import outbox_metrics
+from items_app.application.company_filter.company_filter import company_filter
+from items_app.application.batching.micro_batcher import lookup_batching_metrics
+from items_app.application.change_stream.change_stream import change_stream
+from items_app.application.write_behind.price_write_behind import price_write_behind
 
 
 router = APIRouter(prefix="/healthy", tags=["Healthcheck"])
@@ -16,3 +21,28 @@ async def ping_cache(cache: AsyncCacheManager = Depends(get_async_cache_manager)
     key = cache.generate_key("ping", "test")
     await cache.set(key, {"status": "ok"})
     return await cache.get(key)
+
+
+@router.get("/cache-outbox", summary="Метрики ретрансляции инвалидации кеша (задержка, очередь)")
+async def cache_outbox_metrics():
+    return outbox_metrics
+
+
+@router.get("/lookup-batching", summary="Гистограммы размера пакетов и ожидания при объединении чтений по ID")
+async def lookup_batching():
+    return lookup_batching_metrics()
+
+
+@router.get("/company-filter", summary="Состояние фильтра Блума существующих компаний")
+async def company_filter_metrics():
+    return company_filter.metrics()
+
+
+@router.get("/change-stream", summary="Метрики потока изменений SSE (подписчики, доставка, отключения)")
+async def change_stream_metrics():
+    return change_stream.metrics()
+
+
+@router.get("/price-write-behind", summary="Метрики отложенной записи цен (буфер, сбросы, потери)")
+async def price_write_behind_metrics():
+    return price_write_behind.metrics()
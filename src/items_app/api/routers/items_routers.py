@@ -1,15 +1,47 @@
 import logging
 from uuid import UUID
-from typing import Annotated, List, Optional, Union, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query
-from items_app.api.providers import get_items_app_service, get_companies_app_service
-from items_app.api.schemas.item_schemas import ItemCreate, ItemResponse, ItemsIdList
+from typing import Annotated, List, Literal, Optional, Union, Dict
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from items_app.api.providers import (
+    get_change_stream,
+    get_companies_app_service,
+    get_items_app_service,
+)
+from pydantic import ValidationError
+from items_app.api.pagination import (
+    decode_changes_cursor,
+    decode_cursor,
+    encode_changes_cursor,
+    encode_cursor,
+)
+from items_app.api.streaming import (
+    encode_change_events,
+    encode_items_csv,
+    encode_items_ndjson,
+    iter_ndjson_lines,
+)
+from items_app.api.schemas.item_schemas import (
+    ItemCreate,
+    ItemResponse,
+    ItemsIdList,
+    ItemsBulkPriceUpdate,
+    ItemPriceChange,
+    ItemPriceChangeResponse,
+    ItemsBulkUpdateResponse,
+    ItemIngest,
+    ItemsIngestResponse,
+    ItemChange,
+    ItemChangesResponse,
+)
 from items_app.application.items_applications.items_applications_service import (
     ItemsApplicationsService,
 )
 from items_app.application.companies_applications.companies_applications_service import (
     CompaniesApplicationsService,
 )
+from items_app.application.change_stream.change_stream import ChangeStream
+from items_app.application.write_behind.price_write_behind import PriceBufferFull
 from items_app.application.items_applications.items_applications_exceptions import (
     ItemNotFound, NoAccessToItem
 )
@@ -17,11 +49,17 @@ from items_app.application.companies_applications.companies_applications_excepti
     CompanyNotFound,
 )
 from items_app.infrastructure.postgres.models import Item
+from items_app.infrastructure.postgres.rows import ItemRow
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INGEST_MAX_REPORTED_INVALID_LINES = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+ItemSort = Literal["price", "-price", "title", "-title"]
+
 router = APIRouter(prefix="/items", tags=["Items"])
 
 
@@ -39,6 +77,9 @@ async def create_new_item(
         new_item = await items_service.create_item(new_item_data)
         item_response = ItemResponse.model_validate(new_item)
         return {"message": "New item created successfully", "item": item_response}
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to create item")
@@ -65,6 +106,9 @@ async def get_items_by_ids_get(
             raise ItemNotFound("No items found for the provided IDs")
         item_response = [ItemResponse.model_validate(item) for item in items]
         return item_response
+    except NoAccessToItem as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
     except ItemNotFound as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -75,6 +119,96 @@ async def get_items_by_ids_get(
         raise HTTPException(status_code=500, detail="Failed to fetch items")
 
 
+@router.get(
+    "/search",
+    summary="Поиск товаров по названию (подстрока или префикс)",
+    response_model=List[ItemResponse],
+)
+async def search_items(
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+    q: str = Query(min_length=1, max_length=32, description="Строка поиска"),
+    company_id: Optional[UUID] = None,
+    mode: Literal["substring", "prefix"] = "substring",
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=100),
+):
+    try:
+        items = await items_service.search_items(
+            q, company_id, prefix_only=mode == "prefix", offset=offset, limit=limit
+        )
+        return [ItemResponse.model_validate(item) for item in items]
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search items")
+
+
+@router.get(
+    "/changes",
+    summary="Изменения товаров после версии (upsert и удаления) для инкрементальной синхронизации",
+    response_model=ItemChangesResponse,
+)
+async def get_items_changes(
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+    since: Optional[int] = Query(
+        default=None,
+        gt=0,
+        description=(
+            "Последняя версия, уже полученная клиентом; для полной синхронизации не передаётся "
+            "(товары до журнала изменений имеют версию 0 и отдаются только без since)"
+        ),
+    ),
+    after: Optional[str] = Query(
+        default=None, description="Курсор next_cursor предыдущего ответа (вместо since)"
+    ),
+    company_id: Optional[UUID] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    try:
+        changes, positions, has_more = await items_service.fetch_item_changes(
+            since=since,
+            after=decode_changes_cursor(after) if after else None,
+            limit=limit,
+            company_id=company_id,
+        )
+        return {
+            "changes": [ItemChange.model_validate(change) for change in changes],
+            "next_cursor": encode_changes_cursor(positions),
+            "has_more": has_more,
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch item changes")
+
+
+@router.get(
+    "/stream",
+    summary="Поток событий изменений товаров и компаний (Server-Sent Events)",
+)
+async def stream_items_changes(
+    request: Request,
+    stream: Annotated[ChangeStream, Depends(get_change_stream)],
+    company_id: Optional[UUID] = None,
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+):
+    subscription = stream.subscribe(company_id=company_id, last_event_id=last_event_id)
+
+    async def events():
+        try:
+            async for event in encode_change_events(subscription, request.is_disconnected):
+                yield event
+        finally:
+            stream.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Прокси не должны буферизовать и кешировать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{item_id}", summary="Вывод товара по ID", response_model=ItemResponse)
 async def get_item_by_id(
     item_id: UUID,
@@ -113,6 +247,9 @@ async def get_items_by_ids_post(
             raise ItemNotFound("No items found for the provided IDs")
         item_response = [ItemResponse.model_validate(item) for item in items]
         return item_response
+    except NoAccessToItem as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
     except ItemNotFound as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -130,16 +267,34 @@ async def get_items_by_ids_post(
 )
 async def get_items_of_company_by_company_id(
     company_id: UUID,
-    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+    response: Response,
     companies_service: Annotated[
         CompaniesApplicationsService, Depends(get_companies_app_service)
     ],
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+    min_price: Optional[float] = Query(default=None, ge=0),
+    max_price: Optional[float] = Query(default=None, ge=0),
+    sort: Optional[ItemSort] = None,
+    after: Optional[str] = Query(default=None, description="Курсор следующей страницы"),
+    limit: Optional[int] = Query(default=None, ge=1),
 ):
     try:
-        current_company = await companies_service.fetch_company_by_id(company_id)
-        if not current_company:
-            raise CompanyNotFound(f"Company with company_id={company_id} not found")
-        items = await items_service.fetch_items_of_company_by_company_id(company_id)
+        if all(param is None for param in (min_price, max_price, sort, after, limit)):
+            # Компания и её товары читаются одним запросом и одной записью кеша
+            company = await companies_service.fetch_company_with_items(company_id)
+            items: Optional[List[ItemRow]] = company.items
+        else:
+            items = await items_service.fetch_all_items(
+                0,
+                limit,
+                company_id=company_id,
+                min_price=min_price,
+                max_price=max_price,
+                sort=sort,
+                after=decode_cursor(after, sort) if after else None,
+            )
+            if items and limit and len(items) == limit:
+                response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1], sort)
         if not items:
             raise ItemNotFound(
                 f"No items found for company with company_id={company_id}"
@@ -152,26 +307,89 @@ async def get_items_of_company_by_company_id(
     except ItemNotFound as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch items of company")
 
 
+@router.get(
+    "/company/{company_id}/export",
+    summary="Потоковая выгрузка каталога компании в формате NDJSON или CSV",
+)
+async def export_items_of_company(
+    company_id: UUID,
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+):
+    try:
+        await items_service.ensure_company_exists(company_id)
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to export items of company")
+    items = items_service.stream_items_of_company(company_id)
+    if export_format == "csv":
+        content, media_type = encode_items_csv(items), "text/csv"
+    else:
+        content, media_type = encode_items_ndjson(items), "application/x-ndjson"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="items_{company_id}.{export_format}"'
+        },
+    )
+
+
 @router.get(
     "", summary="Вывод всех товаров", response_model=Union[List[ItemResponse], Dict]
 )
 async def get_all_items(
+    response: Response,
     items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
     offset: Optional[int] = 0,
     limit: Optional[int] = 10,
+    include_total: bool = False,
+    estimate_total: bool = False,
+    min_price: Optional[float] = Query(default=None, ge=0),
+    max_price: Optional[float] = Query(default=None, ge=0),
+    sort: Optional[ItemSort] = None,
+    after: Optional[str] = Query(default=None, description="Курсор следующей страницы"),
 ):
     try:
-        items = await items_service.fetch_all_items(offset, limit)
+        if include_total and (min_price is not None or max_price is not None):
+            # Счётчики хранят только полные количества, а COUNT(*) по фильтру слишком дорог
+            raise ValueError("include_total is not supported together with price filters")
+        items = await items_service.fetch_all_items(
+            offset,
+            limit,
+            min_price=min_price,
+            max_price=max_price,
+            sort=sort,
+            after=decode_cursor(after, sort) if after else None,
+        )
+        if items and limit and len(items) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1], sort)
+        if include_total:
+            total, total_is_estimate = await items_service.count_items(
+                estimate=estimate_total
+            )
+            return {
+                "items": [ItemResponse.model_validate(item) for item in items or []],
+                "total": total,
+                "total_is_estimate": total_is_estimate,
+            }
         if items:
             item_response = [ItemResponse.model_validate(item) for item in items]
             return item_response
         else:
             return {"message": "No items in database"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch items")
@@ -193,6 +411,9 @@ async def update_item_data_by_id(
         updated_item = await items_service.update_item_data(update_item_data)
         item_response = ItemResponse.model_validate(updated_item)
         return {"message": "Item updated successfully", "item": item_response}
+    except NoAccessToItem as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
     except ItemNotFound as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -201,6 +422,118 @@ async def update_item_data_by_id(
         raise HTTPException(status_code=500, detail="Failed to update item")
 
 
+@router.patch(
+    "/bulk",
+    summary="Пакетное изменение цен (и названий) товаров компании",
+    response_model=ItemsBulkUpdateResponse,
+)
+async def bulk_update_items_prices(
+    bulk_update_data: ItemsBulkPriceUpdate,
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+):
+    try:
+        updates = [
+            (item.item_id, item.price, item.title) for item in bulk_update_data.items
+        ]
+        updated_count, missing_ids = await items_service.bulk_update_items(
+            bulk_update_data.company_id, updates
+        )
+        return {"updated_count": updated_count, "missing_ids": missing_ids}
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update items")
+
+
+@router.patch(
+    "/{item_id}/price",
+    summary="Изменение цены товара (с опциональной отложенной записью)",
+    response_model=ItemPriceChangeResponse,
+)
+async def update_item_price(
+    item_id: UUID,
+    price_data: ItemPriceChange,
+    response: Response,
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+    write_behind: bool = Query(
+        False,
+        description=(
+            "Подтвердить сразу (202) и записать пакетом в течение интервала сброса. "
+            "Цена теряется при падении экземпляра до сброса и не видна чтениям до него"
+        ),
+    ),
+):
+    try:
+        if write_behind:
+            items_service.buffer_price_update(item_id, price_data.company_id, price_data.price)
+            response.status_code = 202
+            return {
+                "message": "Item price accepted for write-behind",
+                "item_id": item_id,
+                "price": price_data.price,
+                "durable": False,
+            }
+        await items_service.update_item_price(item_id, price_data.company_id, price_data.price)
+        return {"item_id": item_id, "price": price_data.price, "durable": True}
+    except CompanyNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except NoAccessToItem as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
+    except ItemNotFound as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except PriceBufferFull as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to update item price")
+
+
+@router.post(
+    "/ingest",
+    summary="Потоковая загрузка (upsert) товаров из тела запроса в формате NDJSON",
+    response_model=ItemsIngestResponse,
+)
+async def ingest_items(
+    request: Request,
+    items_service: Annotated[ItemsApplicationsService, Depends(get_items_app_service)],
+):
+    invalid_lines: List[int] = []
+    invalid_count = 0
+
+    async def parse_items():
+        nonlocal invalid_count
+        async for line_number, line in iter_ndjson_lines(request.stream()):
+            try:
+                item = ItemIngest.model_validate_json(line)
+            except ValidationError:
+                invalid_count += 1
+                if len(invalid_lines) < INGEST_MAX_REPORTED_INVALID_LINES:
+                    invalid_lines.append(line_number)
+                continue
+            yield item.model_dump()
+
+    try:
+        summary = await items_service.ingest_items(parse_items())
+        return {
+            "received_count": summary["received"],
+            "upserted_count": summary["upserted"],
+            "skipped_count": summary["skipped"],
+            "failed_count": summary["failed"],
+            "invalid_count": invalid_count,
+            "invalid_lines": invalid_lines,
+            "chunks_committed": summary["chunks"],
+        }
+    except ValueError as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error: {type(e).__name__} - {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to ingest items")
+
+
 @router.delete("/delete-many", summary="Удаление нескольких товаров по ID")
 async def delete_items_by_ids(
     item_ids: ItemsIdList,
@@ -216,6 +549,9 @@ async def delete_items_by_ids(
         await items_service.delete_items(item_ids_list, company_id)
         item_ids_str = ", ".join(str(item_id) for item_id in item_ids_list)
         return {"message": f"Items with IDs [{item_ids_str}] have been deleted"}
+    except NoAccessToItem as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
     except ItemNotFound as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -235,6 +571,9 @@ async def delete_item_by_id(
     try:
         await items_service.delete_item(item_id, company_id)
         return {"message": f"Item with item_id={item_id} was deleted"}
+    except NoAccessToItem as e:
+        logger.error(f"Error: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
     except ItemNotFound as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=404, detail=str(e))
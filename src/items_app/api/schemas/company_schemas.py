@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import Literal, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field, ConfigDict
+from items_app.api.schemas.item_schemas import ItemResponse
 
 
 """ Схемы для валидации данных, связанных с компаниями. """
@@ -17,6 +18,52 @@ class CompanyResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CompanyWithItemsResponse(BaseModel):
+    id: UUID
+    name: str
+    items: list[ItemResponse]
+    total_items: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CompanyStatsResponse(BaseModel):
+    company_id: UUID
+    items_count: int
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    avg_price: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PriceHistogram(BaseModel):
+    # len(edges) == len(counts) + 1; последняя корзина включает правую границу
+    edges: list[float]
+    counts: list[int]
+
+
+class PriceOutlier(BaseModel):
+    item_id: UUID
+    price: float
+    z_score: float
+
+
+class CompanyPriceStatsResponse(BaseModel):
+    company_id: UUID
+    data_version: int
+    items_count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    quantiles: dict[str, Optional[float]]
+    histogram: PriceHistogram
+    z_threshold: float
+    outliers_count: int
+    outliers: list[PriceOutlier]
+
+
 class CompanyUpdate(BaseModel):
     id: UUID
     name: str = Field(min_length=1, max_length=64)
@@ -25,3 +72,9 @@ class CompanyUpdate(BaseModel):
 class CompanyUpdateResponse(BaseModel):
     message: Optional[str] = "Company updated successfully"
     company: CompanyResponse
+
+
+class CompanyDeletionProgress(BaseModel):
+    status: Literal["pending", "in_progress", "completed", "failed"]
+    deleted_items: int
+    total_items: Optional[int] = None
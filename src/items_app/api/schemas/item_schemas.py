@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from uuid import UUID
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -26,3 +27,69 @@ class ItemsIdList(BaseModel):
     item_ids: list[UUID]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ItemPriceUpdate(BaseModel):
+    item_id: UUID
+    price: float = Field(gt=0)
+    title: Optional[str] = Field(default=None, min_length=1, max_length=32)
+
+
+class ItemPriceChange(BaseModel):
+    company_id: UUID
+    price: float = Field(gt=0)
+
+
+class ItemPriceChangeResponse(BaseModel):
+    message: Optional[str] = "Item price updated successfully"
+    item_id: UUID
+    price: float
+    # False: цена принята в буфер отложенной записи и ещё не зафиксирована в БД
+    durable: bool
+
+
+class ItemsBulkPriceUpdate(BaseModel):
+    company_id: UUID
+    items: list[ItemPriceUpdate] = Field(min_length=1, max_length=5000)
+
+
+class ItemsBulkUpdateResponse(BaseModel):
+    message: Optional[str] = "Items updated successfully"
+    updated_count: int
+    missing_ids: list[UUID]
+
+
+class ItemIngest(BaseModel):
+    id: UUID
+    title: str = Field(min_length=1, max_length=32)
+    price: float = Field(gt=0)
+    company_id: UUID
+
+
+class ItemsIngestResponse(BaseModel):
+    message: Optional[str] = "Items ingested successfully"
+    received_count: int
+    upserted_count: int
+    skipped_count: int
+    failed_count: int
+    invalid_count: int
+    invalid_lines: list[int]
+    chunks_committed: int
+
+
+class ItemChange(BaseModel):
+    version: int
+    op: Literal["upsert", "delete"]
+    id: UUID
+    company_id: UUID
+    title: Optional[str] = None
+    price: Optional[float] = None
+    updated_at: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ItemChangesResponse(BaseModel):
+    changes: list[ItemChange]
+    next_cursor: str
+    has_more: bool
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+from items_app.api.schemas.item_schemas import ItemResponse
+from items_app.application.change_stream.change_stream import ChangeSubscription
+from items_app.infrastructure.config import config
+from items_app.infrastructure.postgres.rows import ItemRow
+
+
+""" Потоковое кодирование и разбор товаров для выгрузки и загрузки каталога без загрузки его в память. """
+
+ITEM_EXPORT_FIELDS = list(ItemResponse.model_fields.keys())
+NDJSON_MAX_LINE_BYTES = 64 * 1024
+
+
+async def encode_items_ndjson(
+    items: AsyncIterator[ItemRow], chunk_size: int = config.DB_STREAM_YIELD_PER
+) -> AsyncIterator[str]:
+    lines = []
+    async for item in items:
+        lines.append(ItemResponse.model_validate(item).model_dump_json())
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def encode_items_csv(
+    items: AsyncIterator[ItemRow], chunk_size: int = config.DB_STREAM_YIELD_PER
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ITEM_EXPORT_FIELDS)
+    rows_in_buffer = 0
+    async for item in items:
+        writer.writerow([getattr(item, field) for field in ITEM_EXPORT_FIELDS])
+        rows_in_buffer += 1
+        if rows_in_buffer >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            rows_in_buffer = 0
+    yield buffer.getvalue()
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = NDJSON_MAX_LINE_BYTES
+) -> AsyncIterator[Tuple[int, bytes]]:
+    buffer = b""
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(
+                f"Line {line_number + 1} exceeds {max_line_bytes} bytes"
+            )
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+
+def format_sse(event_type: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event_type}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def encode_change_events(
+    subscription: ChangeSubscription,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    keepalive_seconds: float = config.CHANGE_STREAM_KEEPALIVE_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    События подписки в формате Server-Sent Events. Комментарий keepalive не даёт
+    прокси закрыть простаивающее соединение и обнаруживает отключение клиента.
+    """
+    if subscription.needs_resync:
+        # События после Last-Event-ID уже вытеснены из буфера: клиент догоняет по /items/changes
+        yield format_sse("resync", {"reason": "Last-Event-ID is no longer buffered"})
+    while not await is_disconnected():
+        if subscription.overflowed:
+            yield format_sse("overflow", {"reason": "Client is too slow, reconnect with Last-Event-ID"})
+            return
+        event = await subscription.next_event(keepalive_seconds)
+        if event is None:
+            yield ": keepalive\n\n"
+            continue
+        yield format_sse(
+            f"{event['entity']}.{event['type']}",
+            {key: value for key, value in event.items() if key != "id"},
+            event_id=event["id"],
+        )
@@ -0,0 +1,153 @@
+import asyncio
+import bisect
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+from items_app.infrastructure.config import config
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchLoader = Callable[[List[K]], Awaitable[Mapping[K, V]]]
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+
+class Histogram:
+    """Гистограмма с накопительными корзинами (как le-корзины Prometheus)."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._count += 1
+        self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self._count
+        return {"buckets": buckets, "count": self._count, "sum": self._sum}
+
+
+class MicroBatcher(Generic[K, V]):
+    """
+    Объединяет точечные чтения по ключу из конкурентных запросов (в духе DataLoader).
+    Первый ключ открывает окно max_wait_seconds; пакет уходит по истечении окна
+    или при наборе max_batch_size разных ключей. Пакет загружает функция батчера:
+    она сама берёт сессию из фабрики шарда и не зависит от запроса, открывшего окно.
+    Результат (или ошибка) раздаётся всем ожидающим ключей пакета.
+    Одинаковые ключи внутри окна загружаются один раз.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: BatchLoader,
+        max_batch_size: int = config.LOOKUP_BATCH_MAX_SIZE,
+        max_wait_seconds: float = config.LOOKUP_BATCH_MAX_WAIT_SECONDS,
+    ):
+        self.name = name
+        self._loader = loader
+        self._max_batch_size = max_batch_size
+        self._max_wait_seconds = max_wait_seconds
+        self._pending: Dict[K, List[Tuple[asyncio.Future, float]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Ссылки на выполняющиеся пакеты, чтобы задачи не были собраны сборщиком мусора
+        self._tasks: Set[asyncio.Task] = set()
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_seconds = Histogram(WAIT_SECONDS_BUCKETS)
+
+    async def load(self, key: K) -> Optional[V]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            self._timer = loop.call_later(self._max_wait_seconds, self._dispatch)
+        self._pending.setdefault(key, []).append((future, time.perf_counter()))
+        if len(self._pending) >= self._max_batch_size:
+            self._dispatch()
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        dispatched_at = time.perf_counter()
+        self.batch_size.observe(len(pending))
+        for waiters in pending.values():
+            for _, enqueued_at in waiters:
+                self.wait_seconds.observe(dispatched_at - enqueued_at)
+
+        task = asyncio.ensure_future(self._resolve(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(
+        self,
+        pending: Dict[K, List[Tuple[asyncio.Future, float]]],
+    ) -> None:
+        try:
+            results = await self._loader(list(pending))
+        except Exception as e:
+            for waiters in pending.values():
+                for future, _ in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for key, waiters in pending.items():
+            for future, _ in waiters:
+                # Ожидающий мог быть отменён (например, клиент закрыл соединение)
+                if not future.done():
+                    future.set_result(results.get(key))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+# Общие для процесса батчеры: сервисы создаются на запрос, а объединять нужно
+# чтения разных запросов. Пакет читается из одной базы, поэтому у каждого шарда свой батчер
+_lookup_batchers: Dict[Tuple[str, str], MicroBatcher] = {}
+
+
+def get_lookup_batcher(entity: str, shard: str, loader: BatchLoader) -> MicroBatcher:
+    # Загрузчик привязан к шарду, поэтому фиксируется при создании батчера
+    key = (entity, shard)
+    if key not in _lookup_batchers:
+        _lookup_batchers[key] = MicroBatcher(entity, loader)
+    return _lookup_batchers[key]
+
+
+def lookup_batching_metrics() -> Dict[str, Dict[str, Any]]:
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for (entity, shard), batcher in _lookup_batchers.items():
+        metrics.setdefault(entity, {})[shard] = batcher.metrics()
+    return metrics
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+from items_app.infrastructure.postgres.repositories.outbox_repo import OutboxRepo
+from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
+from items_app.infrastructure.config import config
+
+logger = logging.getLogger(__name__)
+
+# Общие для процесса блокировка и метрики: одновременно outbox разбирает только один ретранслятор
+_drain_lock = asyncio.Lock()
+
+# Сигналы фоновых циклов ретрансляции: запись будит их, не дожидаясь разбора outbox
+_relay_wakeups: Set[asyncio.Event] = set()
+
+outbox_metrics: Dict[str, Any] = {
+    "drained_events": 0,
+    "applied_patterns": 0,
+    "batches": 0,
+    "failures": 0,
+    "pending_events": None,
+    "last_lag_seconds": None,
+    "max_lag_seconds": 0.0,
+    "oldest_pending_age_seconds": None,
+}
+
+
+def coalesce_patterns(patterns: Iterable[str]) -> List[str]:
+    """
+    Убирает повторы и шаблоны, покрытые более общими:
+    "items:*" поглощает "items:company_id=...:*" и "items:all:*".
+    """
+    unique_patterns = list(dict.fromkeys(patterns))
+    prefixes = [pattern[:-1] for pattern in unique_patterns if pattern.endswith("*")]
+    return [
+        pattern
+        for pattern in unique_patterns
+        if not any(
+            pattern != prefix + "*" and pattern.startswith(prefix) for prefix in prefixes
+        )
+    ]
+
+
+class CacheOutboxRelay:
+    """
+    Переносит события инвалидации из таблицы cache_outbox в Redis пакетами.
+    Событие удаляется в той же транзакции, в которой было выбрано, и только после
+    удаления ключей из кеша: при сбое пакет будет применён повторно (at-least-once).
+    Разбор идёт только в фоновом цикле: записи лишь будят его (wake), поэтому
+    события конкурентных записей объединяются в общие пакеты.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        cache: AsyncCacheManager,
+        batch_size: int = config.CACHE_OUTBOX_BATCH_SIZE,
+    ):
+        self._session_factory = session_factory
+        self._cache = cache
+        self._batch_size = batch_size
+
+    def wake(self) -> None:
+        """Неблокирующий сигнал фоновым циклам: в outbox появились события."""
+        for wakeup in _relay_wakeups:
+            wakeup.set()
+
+    async def drain(self) -> int:
+        """Применяет все накопленные события; возвращает их количество."""
+        drained = 0
+        async with _drain_lock:
+            try:
+                while True:
+                    batch_size = await self._drain_batch()
+                    drained += batch_size
+                    if batch_size < self._batch_size:
+                        break
+            except Exception as e:
+                outbox_metrics["failures"] += 1
+                logger.error(f"Error of relaying cache invalidation events: {e}")
+        return drained
+
+    async def _drain_batch(self) -> int:
+        async with self._session_factory() as session:
+            outbox_repo = OutboxRepo(session)
+            events = await outbox_repo.claim_batch(self._batch_size)
+            if not events:
+                return 0
+            patterns = coalesce_patterns(event.pattern for event in events)
+            await self._cache.delete_pattern(*patterns)
+            await outbox_repo.delete([event.id for event in events])
+            await session.commit()
+
+        lag = time.time() - min(event.created_at for event in events)
+        outbox_metrics["drained_events"] += len(events)
+        outbox_metrics["applied_patterns"] += len(patterns)
+        outbox_metrics["batches"] += 1
+        outbox_metrics["last_lag_seconds"] = lag
+        outbox_metrics["max_lag_seconds"] = max(outbox_metrics["max_lag_seconds"], lag)
+        return len(events)
+
+    async def refresh_backlog_metrics(self) -> None:
+        async with self._session_factory() as session:
+            outbox_repo = OutboxRepo(session)
+            outbox_metrics["pending_events"] = await outbox_repo.count_pending()
+            oldest_created_at = await outbox_repo.oldest_created_at()
+        outbox_metrics["oldest_pending_age_seconds"] = (
+            time.time() - oldest_created_at if oldest_created_at is not None else None
+        )
+
+    async def run(
+        self, poll_interval: float = config.CACHE_OUTBOX_POLL_INTERVAL_SECONDS
+    ) -> None:
+        """
+        Фоновый цикл: разбирает outbox по сигналу записи (wake) или раз в poll_interval —
+        так подбираются и события других экземпляров приложения и неудачных попыток.
+        """
+        wakeup = asyncio.Event()
+        _relay_wakeups.add(wakeup)
+        try:
+            while True:
+                wakeup.clear()
+                await self.drain()
+                try:
+                    await self.refresh_backlog_metrics()
+                except Exception as e:
+                    logger.error(f"Error of reading cache outbox backlog: {e}")
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            _relay_wakeups.discard(wakeup)
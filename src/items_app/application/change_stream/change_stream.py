@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+from uuid import UUID
+from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
+from items_app.infrastructure.config import config
+
+logger = logging.getLogger(__name__)
+
+CHANGE_STREAM_CHANNEL = "change_stream"
+CHANGE_STREAM_SEQUENCE_KEY = "change_stream:sequence"
+
+# Пауза перед повторной подпиской после потери соединения с Redis
+RESUBSCRIBE_DELAY_SECONDS = 1.0
+
+
+def item_event(event_type: str, item_id: UUID, company_id: UUID, **fields: Any) -> Dict[str, Any]:
+    # Незаданные поля (например, название при пакетном изменении цен) не передаются
+    data = {"id": str(item_id), "company_id": str(company_id)}
+    data.update((name, value) for name, value in fields.items() if value is not None)
+    return {"entity": "item", "type": event_type, "company_id": str(company_id), "data": data}
+
+
+def company_event(event_type: str, company_id: UUID, name: Optional[str] = None) -> Dict[str, Any]:
+    data = {"id": str(company_id)}
+    if name is not None:
+        data["name"] = name
+    return {"entity": "company", "type": event_type, "company_id": str(company_id), "data": data}
+
+
+class ChangePublisher:
+    """
+    Публикует события изменений в канал Redis после фиксации транзакции.
+    ID событий выдаёт общий счётчик в Redis, поэтому они уникальны для всех экземпляров.
+    Ошибки не пробрасываются: запись уже зафиксирована, а пропущенное событие
+    клиент восстановит по ленте GET /items/changes.
+    """
+
+    def __init__(self, cache: AsyncCacheManager, channel: str = CHANGE_STREAM_CHANNEL):
+        self._cache = cache
+        self._channel = channel
+
+    async def publish(self, *events: Dict[str, Any]) -> None:
+        if not events:
+            return
+        try:
+            last_id = await self._cache.increment(CHANGE_STREAM_SEQUENCE_KEY, len(events))
+            first_id = last_id - len(events) + 1
+            await self._cache.publish(
+                self._channel,
+                *({"id": str(first_id + index), **event} for index, event in enumerate(events)),
+            )
+            change_stream_metrics["published"] += len(events)
+        except Exception as e:
+            change_stream_metrics["publish_failures"] += 1
+            logger.error(f"Error of publishing change events: {e}")
+
+
+class ChangeSubscription:
+    """Подключение клиента: события после Last-Event-ID и ограниченная очередь новых."""
+
+    def __init__(self, company_id: Optional[UUID], replay: List[Dict[str, Any]], queue_size: int):
+        self.company_id = str(company_id) if company_id else None
+        self.replay = [event for event in replay if self.matches(event)]
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Last-Event-ID уже вытеснен из буфера: клиенту нужна полная пересинхронизация
+        self.needs_resync = False
+        # Очередь переполнилась: клиент не успевает читать и будет отключён
+        self.overflowed = False
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        return self.company_id is None or event.get("company_id") == self.company_id
+
+    async def next_event(self, timeout: float) -> Optional[Dict[str, Any]]:
+        if self.replay:
+            return self.replay.pop(0)
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ChangeStream:
+    """
+    Раздаёт события из канала Redis подключениям SSE этого экземпляра.
+    Каждый экземпляр слушает канал сам, поэтому клиент получает события,
+    опубликованные любым экземпляром. Последние события хранятся в кольцевом буфере
+    для продолжения по Last-Event-ID; порядок в буфере — порядок доставки Redis.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = config.CHANGE_STREAM_BUFFER_SIZE,
+        queue_size: int = config.CHANGE_STREAM_QUEUE_SIZE,
+    ):
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._queue_size = queue_size
+        self._subscriptions: Set[ChangeSubscription] = set()
+
+    def subscribe(
+        self, company_id: Optional[UUID] = None, last_event_id: Optional[str] = None
+    ) -> ChangeSubscription:
+        replay: List[Dict[str, Any]] = []
+        needs_resync = False
+        if last_event_id is not None:
+            buffered_ids = [event["id"] for event in self._buffer]
+            if last_event_id in buffered_ids:
+                replay = list(self._buffer)[buffered_ids.index(last_event_id) + 1:]
+            else:
+                needs_resync = True
+        # Между снятием копии буфера и регистрацией нет await: событие
+        # не может потеряться или прийти дважды
+        subscription = ChangeSubscription(company_id, replay, self._queue_size)
+        subscription.needs_resync = needs_resync
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def dispatch(self, event: Dict[str, Any]) -> None:
+        self._buffer.append(event)
+        for subscription in list(self._subscriptions):
+            if not subscription.matches(event):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+                change_stream_metrics["delivered"] += 1
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self._subscriptions.discard(subscription)
+                change_stream_metrics["disconnected_slow_consumers"] += 1
+
+    async def run(self, cache: AsyncCacheManager, channel: str = CHANGE_STREAM_CHANNEL) -> None:
+        while True:
+            try:
+                async for event in cache.subscribe(channel):
+                    self.dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error of listening change stream: {e}")
+            await asyncio.sleep(RESUBSCRIBE_DELAY_SECONDS)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **change_stream_metrics,
+            "subscribers": len(self._subscriptions),
+            "buffered_events": len(self._buffer),
+        }
+
+
+# Общие для процесса метрики и поток: публикаторы и подключения создаются на запрос
+change_stream_metrics: Dict[str, Any] = {
+    "published": 0,
+    "publish_failures": 0,
+    "delivered": 0,
+    "disconnected_slow_consumers": 0,
+}
+
+change_stream = ChangeStream()
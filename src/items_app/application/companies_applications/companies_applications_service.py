@@ -1,53 +1,170 @@
+import asyncio
+import heapq
 import logging
+from itertools import islice
 from uuid import UUID
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set
 from items_app.application.companies_applications.companies_applications_exceptions import (
     CompanyNotFound,
 )
+from items_app.application.batching.micro_batcher import MicroBatcher
+from items_app.application.cache_outbox.cache_outbox_relay import CacheOutboxRelay
+from items_app.application.change_stream.change_stream import ChangePublisher, company_event
+from items_app.application.company_filter.company_filter import CompanyExistenceFilter
+from items_app.application.price_stats.price_stats import compute_price_stats, outlier_bounds
 from items_app.infrastructure.postgres.models import Company
+from items_app.infrastructure.postgres.rows import (
+    CompanyRow,
+    CompanyStatsRow,
+    CompanyWithItemsRow,
+)
 from items_app.infrastructure.postgres.repositories.company_repo import CompanyRepo
 from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
+from items_app.infrastructure.config import config
 
 logger = logging.getLogger(__name__)
 
+# Компании, очистка которых уже идёт в этом процессе (фоновая задача запроса или обход)
+_purging_company_ids: Set[UUID] = set()
+
 
 class CompaniesApplicationsService:
-    def __init__(self, company_repo: CompanyRepo, cache: AsyncCacheManager):
+    def __init__(
+        self,
+        company_repo: CompanyRepo,
+        cache: AsyncCacheManager,
+        read_company_repo: Optional[CompanyRepo] = None,
+        outbox_relay: Optional[CacheOutboxRelay] = None,
+        lookup_batcher: Optional[MicroBatcher] = None,
+        company_filter: Optional[CompanyExistenceFilter] = None,
+        shard_read_company_repos: Optional[List[CompanyRepo]] = None,
+        change_publisher: Optional[ChangePublisher] = None,
+        read_cache_expire_seconds: int = config.REDIS_CACHE_EXPIRE_SECONDS,
+    ):
         self.company_repo = company_repo
         self.cache = cache
+        # Чтения (fetch_*) идут в реплику, если она передана
+        self.read_company_repo = read_company_repo or company_repo
+        self.outbox_relay = outbox_relay
+        # Чтения компании по ID объединяются с конкурентными запросами, если батчер передан
+        self.lookup_batcher = lookup_batcher
+        # Заведомо несуществующие компании отклоняются без обращения к кешу и БД
+        self.company_filter = company_filter
+        # Репозитории всех шардов: списки и счётчики компаний собираются со всех шардов
+        self.shard_read_company_repos = shard_read_company_repos or [self.read_company_repo]
+        # События изменений для подписчиков SSE публикуются после фиксации записи
+        self.change_publisher = change_publisher
+        # Прочитанное с реплики кешируется не дольше допустимого отставания реплики:
+        # иначе устаревшее чтение, записанное в кеш после инвалидации, переживёт её надолго
+        self.read_cache_expire_seconds = read_cache_expire_seconds
+
+    def _reject_unknown_company(self, company_id: UUID) -> None:
+        if self.company_filter and not self.company_filter.might_exist(company_id):
+            raise CompanyNotFound(f"Company with company_id={company_id} not found")
+
+    def _companies_cache_pattern(self) -> str:
+        return self.cache.generate_key("companies", "*")
+
+    def _company_items_cache_pattern(self, company_id: UUID) -> str:
+        # Каталог компании вместе с товарами кешируется в пространстве "items"
+        return self.cache.generate_key("items", f"company_id={company_id}", "*")
+
+    def _items_cache_pattern(self) -> str:
+        return self.cache.generate_key("items", "*")
+
+    def _counts_cache_pattern(self, entity: str = "*") -> str:
+        return self.cache.generate_key("counts", entity, "*")
 
-    async def _invalidate_companies_cache(self):
-        invalidate_cache_key = self.cache.generate_key("companies", "*")
-        await self.cache.delete_pattern(invalidate_cache_key)
+    async def _commit_with_cache_invalidation(self, *patterns: str) -> None:
+        # Событие пишется в outbox в той же транзакции, что и изменение данных
+        if not await self.company_repo.record_cache_invalidation(patterns):
+            raise RuntimeError("Failed to record cache invalidation")
+        await self.company_repo.commit()
+        if not self.outbox_relay:
+            await self.cache.delete_pattern(*patterns)
+            return
+        # Ключи этой записи удаляются сразу (клиент читает свои записи), а событие
+        # в outbox остаётся фоновому ретранслятору: он повторит удаление при сбое
+        try:
+            await self.cache.delete_pattern(*patterns)
+        except Exception as e:
+            logger.error(f"Error of invalidating cache, left to outbox relay: {e}")
+        self.outbox_relay.wake()
+
+    async def _publish_changes(self, *events: Dict[str, Any]) -> None:
+        if self.change_publisher:
+            await self.change_publisher.publish(*events)
+
+    def _deletion_progress_key(self, company_id: UUID) -> str:
+        return self.cache.generate_key("company_deletions", f"company_id={company_id}")
 
-    async def _invalidate_companies_and_items_cache(self):
-        invalidate_companies_cache_key = self.cache.generate_key("companies", "*")
-        invalidate_items_cache_key = self.cache.generate_key("items", "*")
-        await self.cache.delete_pattern(invalidate_companies_cache_key, invalidate_items_cache_key)
+    async def _set_deletion_progress(self, company_id: UUID, **progress: Any):
+        await self.cache.set(self._deletion_progress_key(company_id), progress)
 
     async def create_company(self, new_company: Company) -> Optional[Company]:
         try:
             created_company = await self.company_repo.add_company(
                 company_data=new_company
             )
-            await self.company_repo.commit()
-            await self._invalidate_companies_cache()
+            if created_company is None:
+                raise RuntimeError("Failed to add company")
+            await self._commit_with_cache_invalidation(
+                self._companies_cache_pattern(), self._counts_cache_pattern("companies")
+            )
+            if self.company_filter:
+                self.company_filter.add(created_company.id)
+            await self._publish_changes(
+                company_event("created", created_company.id, created_company.name)
+            )
             return created_company
         except Exception as e:
             await self.company_repo.rollback()
             logger.error(f"Error of creating company: {e}")
             raise
 
-    async def fetch_company_by_id(self, company_id: UUID) -> Company | None:
+    def _company_cache_key(self, company_id: UUID) -> str:
+        return self.cache.generate_key("companies", f"company_id={company_id}")
+
+    async def load_companies_batch(self, company_ids: List[UUID]) -> Dict[UUID, CompanyRow]:
+        # Пакет ID: один MGET по кешу и один IN-запрос по промахам
+        cache_keys = [self._company_cache_key(company_id) for company_id in company_ids]
+        cached_values = await self.cache.get_many(*cache_keys)
+        result = {
+            company_id: value
+            for company_id, value in zip(company_ids, cached_values)
+            if value is not None
+        }
+        missing_ids = [company_id for company_id in company_ids if company_id not in result]
+        if not missing_ids:
+            return result
+
+        rows = await self.read_company_repo.get_companies_by_ids(company_ids=missing_ids)
+        if rows is None:
+            raise RuntimeError("Failed to get companies by ids")
+        result.update((row.id, row) for row in rows)
+        await self.cache.set_many(
+            {self._company_cache_key(row.id): row for row in rows},
+            ex=self.read_cache_expire_seconds,
+        )
+        return result
+
+    async def fetch_company_by_id(self, company_id: UUID) -> Company | CompanyRow | None:
         try:
-            cache_key = self.cache.generate_key("companies", f"company_id={company_id}")
+            self._reject_unknown_company(company_id)
+            if self.lookup_batcher:
+                response = await self.lookup_batcher.load(company_id)
+                if not response:
+                    raise CompanyNotFound(f"Company with company_id={company_id} not found")
+                return response
+
+            cache_key = self._company_cache_key(company_id)
             if cache_value := await self.cache.get(cache_key):
                 return cache_value
 
-            response = await self.company_repo.get_company_by_id(company_id=company_id)
+            response = await self.read_company_repo.get_company_by_id(company_id=company_id)
             if not response:
                 raise CompanyNotFound(f"Company with company_id={company_id} not found")
-            await self.cache.set(cache_key, response)
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
             return response
         except Exception as e:
             logger.error(f"Error of getting company by id: {e}")
@@ -55,19 +172,199 @@ class CompaniesApplicationsService:
 
     async def fetch_all_companies(
         self, offset: Optional[int], limit: Optional[int]
-    ) -> List[Company] | None:
+    ) -> List[CompanyRow] | None:
         try:
             cache_key = self.cache.generate_key("companies", "all", f"offset={offset}", f"limit={limit}")
             if cache_value := await self.cache.get(cache_key): 
                 return cache_value
             
-            response = await self.company_repo.get_all_companies(offset, limit)
-            await self.cache.set(cache_key, response)
+            if len(self.shard_read_company_repos) == 1:
+                response = await self.read_company_repo.get_all_companies(offset, limit)
+            else:
+                # Каждый шард отдаёт первые offset + limit компаний по ID, ответы сливаются
+                shard_limit = (offset or 0) + limit if limit is not None else None
+                responses = await asyncio.gather(
+                    *(
+                        repo.get_all_companies(0, shard_limit)
+                        for repo in self.shard_read_company_repos
+                    )
+                )
+                merged = heapq.merge(
+                    *(response or [] for response in responses), key=lambda company: company.id
+                )
+                response = list(islice(merged, offset or 0, shard_limit))
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
             return response
         except Exception as e:
             logger.error(f"Error of getting all companies: {e}")
             raise
 
+    async def fetch_company_with_items(
+        self, company_id: UUID, offset: Optional[int] = None, limit: Optional[int] = None
+    ) -> CompanyWithItemsRow:
+        try:
+            self._reject_unknown_company(company_id)
+            cache_key = self.cache.generate_key(
+                "items", f"company_id={company_id}", "with_company", f"offset={offset}", f"limit={limit}"
+            )
+            if cache_value := await self.cache.get(cache_key):
+                return cache_value
+
+            response = await self.read_company_repo.get_company_with_items(
+                company_id=company_id, offset=offset, limit=limit
+            )
+            if not response:
+                raise CompanyNotFound(f"Company with company_id={company_id} not found")
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
+            return response
+        except Exception as e:
+            logger.error(f"Error of getting company with items: {e}")
+            raise
+
+    async def count_companies(self) -> int:
+        try:
+            cache_key = self.cache.generate_key("counts", "companies", "all")
+            if (cache_value := await self.cache.get(cache_key)) is not None:
+                return cache_value
+
+            counts = await asyncio.gather(
+                *(repo.count_companies() for repo in self.shard_read_company_repos)
+            )
+            if None in counts:
+                raise RuntimeError("Failed to count companies")
+            response = sum(count for count in counts if count is not None)
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
+            return response
+        except Exception as e:
+            logger.error(f"Error of counting companies: {e}")
+            raise
+
+    async def count_company_items(self, company_id: UUID) -> int:
+        try:
+            # Ключ совпадает с ключом ItemsApplicationsService.count_items для компании
+            cache_key = self.cache.generate_key(
+                "counts", "items", f"company_id={company_id}", "estimate=False"
+            )
+            if cache_value := await self.cache.get(cache_key):
+                return cache_value[0]
+
+            response = await self.read_company_repo.count_items_of_company(
+                company_id=company_id
+            )
+            if response is None:
+                raise RuntimeError(
+                    f"Failed to count items of company with company_id={company_id}"
+                )
+            await self.cache.set(cache_key, [response, False], ex=self.read_cache_expire_seconds)
+            return response
+        except Exception as e:
+            logger.error(f"Error of counting items of company: {e}")
+            raise
+
+    async def fetch_company_stats(self, company_id: UUID) -> CompanyStatsRow:
+        try:
+            self._reject_unknown_company(company_id)
+            # Агрегаты меняются вместе с товарами компании, поэтому ключ в пространстве "items"
+            cache_key = self.cache.generate_key("items", f"company_id={company_id}", "stats")
+            if cache_value := await self.cache.get(cache_key):
+                return cache_value
+
+            response = await self.read_company_repo.get_company_stats(company_id=company_id)
+            if not response:
+                raise CompanyNotFound(f"Company with company_id={company_id} not found")
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
+            return response
+        except Exception as e:
+            logger.error(f"Error of getting company stats: {e}")
+            raise
+
+    async def fetch_company_price_stats(
+        self,
+        company_id: UUID,
+        bins: int,
+        z_threshold: float,
+        outliers_limit: int = config.PRICE_STATS_OUTLIERS_LIMIT,
+    ) -> Dict[str, Any]:
+        try:
+            self._reject_unknown_company(company_id)
+            data_version = await self.read_company_repo.get_company_data_version(company_id)
+            if data_version is None:
+                raise RuntimeError(
+                    f"Failed to get data version of company with company_id={company_id}"
+                )
+            version, settled = data_version
+            # Ключ меняется с любой записью товаров компании, поэтому устаревшая
+            # статистика не читается; в пространстве "items" её снимает и общая инвалидация
+            cache_key = self.cache.generate_key(
+                "items",
+                f"company_id={company_id}",
+                "price_stats",
+                f"version={version}",
+                f"bins={bins}",
+                f"z={z_threshold}",
+            )
+            if cache_value := await self.cache.get(cache_key):
+                return cache_value
+
+            prices = await self.read_company_repo.get_item_prices(company_id)
+            if prices is None:
+                raise RuntimeError(
+                    f"Failed to get item prices of company with company_id={company_id}"
+                )
+            if not prices.size:
+                # Пустой каталог или нет компании: различаются только здесь
+                await self.fetch_company_by_id(company_id)
+
+            stats = compute_price_stats(prices, bins=bins, z_threshold=z_threshold)
+            bounds = outlier_bounds(stats["mean"], stats["std"], z_threshold) if prices.size else None
+            outliers = []
+            if bounds is not None and stats["outliers_count"]:
+                low, high = bounds
+                rows = await self.read_company_repo.get_price_outliers(
+                    company_id, low, high, stats["mean"], outliers_limit
+                )
+                if rows is None:
+                    raise RuntimeError(
+                        f"Failed to get price outliers of company with company_id={company_id}"
+                    )
+                outliers = [
+                    {
+                        "item_id": item_id,
+                        "price": price,
+                        "z_score": (price - stats["mean"]) / stats["std"],
+                    }
+                    for item_id, price in rows
+                ]
+            response = {
+                "company_id": company_id,
+                "data_version": version,
+                **stats,
+                "outliers": outliers,
+            }
+            # Пока транзакции с меньшей версией не завершены, данные под этой версией ещё изменятся.
+            # Версия читается из той же базы, что и цены, поэтому отставание реплики
+            # не сохраняет устаревшие данные под новой версией
+            if settled:
+                await self.cache.set(cache_key, response)
+            return response
+        except Exception as e:
+            logger.error(f"Error of getting company price stats: {e}")
+            raise
+
+    async def reconcile_company_stats(self, company_id: Optional[UUID] = None) -> int:
+        try:
+            response = await self.company_repo.rebuild_company_stats(company_id=company_id)
+            if response is None:
+                raise RuntimeError("Failed to rebuild company stats")
+            await self._commit_with_cache_invalidation(
+                self.cache.generate_key("items", f"company_id={company_id or '*'}", "stats")
+            )
+            return response
+        except Exception as e:
+            await self.company_repo.rollback()
+            logger.error(f"Error of reconciling company stats: {e}")
+            raise
+
     async def update_company_data(self, update_company: Company) -> Company | None:
         try:
             response = await self.company_repo.update_company_data(
@@ -77,8 +374,11 @@ class CompaniesApplicationsService:
                 raise CompanyNotFound(
                     f"No such company with company_id={update_company.id}"
                 )
-            await self.company_repo.commit()
-            await self._invalidate_companies_cache()
+            await self._commit_with_cache_invalidation(
+                self._companies_cache_pattern(),
+                self._company_items_cache_pattern(update_company.id),
+            )
+            await self._publish_changes(company_event("updated", response.id, response.name))
             return response
         except Exception as e:
             await self.company_repo.rollback()
@@ -92,10 +392,109 @@ class CompaniesApplicationsService:
             )
             if not response:
                 raise CompanyNotFound(f"No such company with company_id={company_id}")
-            await self.company_repo.commit()
-            await self._invalidate_companies_and_items_cache()
+            await self._commit_with_cache_invalidation(
+                self._companies_cache_pattern(),
+                self._items_cache_pattern(),
+                self._counts_cache_pattern(),
+            )
+            await self._publish_changes(company_event("deleted", company_id))
             return True
         except Exception as e:
             await self.company_repo.rollback()
             logger.error(f"Error of deleting company: {e}")
             raise
+
+    async def mark_company_deleted(self, company_id: UUID) -> Dict[str, Any]:
+        try:
+            response = await self.company_repo.mark_company_deleted(company_id=company_id)
+            if not response:
+                raise CompanyNotFound(f"No such company with company_id={company_id}")
+            total_items = await self.company_repo.count_items_of_company(
+                company_id=company_id
+            )
+            await self._commit_with_cache_invalidation(
+                self._companies_cache_pattern(),
+                self._items_cache_pattern(),
+                self._counts_cache_pattern(),
+            )
+            await self._publish_changes(company_event("deleted", company_id))
+            progress = {"status": "pending", "deleted_items": 0, "total_items": total_items}
+            await self._set_deletion_progress(company_id, **progress)
+            return progress
+        except Exception as e:
+            await self.company_repo.rollback()
+            logger.error(f"Error of marking company deleted: {e}")
+            raise
+
+    async def purge_deleted_company(
+        self,
+        company_id: UUID,
+        batch_size: int = config.COMPANY_PURGE_BATCH_SIZE,
+        pause_seconds: float = config.COMPANY_PURGE_PAUSE_SECONDS,
+    ) -> None:
+        if company_id in _purging_company_ids:
+            return
+        _purging_company_ids.add(company_id)
+        # Прерванная очистка продолжается: удалённые пакеты уже зафиксированы,
+        # а счётчик прогресса продолжает предыдущий
+        progress = await self.cache.get(self._deletion_progress_key(company_id)) or {}
+        total_items = progress.get("total_items")
+        deleted_items = 0
+        if progress.get("status") != "completed":
+            deleted_items = progress.get("deleted_items", 0)
+        try:
+            if total_items is None:
+                # Прогресс потерян (истёк в кеше или очистку начал обход): считаем заново
+                total_items = deleted_items + (
+                    await self.company_repo.count_items_of_company(company_id=company_id) or 0
+                )
+            # Каждый пакет удаляется в своей короткой транзакции, чтобы не держать блокировки
+            while True:
+                deleted = await self.company_repo.delete_items_batch_of_company(
+                    company_id=company_id, batch_size=batch_size
+                )
+                if deleted is None:
+                    raise RuntimeError(f"Failed to delete items of company {company_id}")
+                await self.company_repo.commit()
+                deleted_items += deleted
+                await self._set_deletion_progress(
+                    company_id,
+                    status="in_progress",
+                    deleted_items=deleted_items,
+                    total_items=total_items,
+                )
+                if deleted < batch_size:
+                    break
+                await asyncio.sleep(pause_seconds)
+
+            await self.company_repo.remove_deleted_company(company_id=company_id)
+            await self._commit_with_cache_invalidation(self._counts_cache_pattern("items"))
+            await self._set_deletion_progress(
+                company_id,
+                status="completed",
+                deleted_items=deleted_items,
+                total_items=total_items,
+            )
+        except Exception as e:
+            await self.company_repo.rollback()
+            logger.error(f"Error of purging deleted company: {e}")
+            await self._set_deletion_progress(
+                company_id,
+                status="failed",
+                deleted_items=deleted_items,
+                total_items=total_items,
+            )
+        finally:
+            _purging_company_ids.discard(company_id)
+
+    async def fetch_company_deletion_progress(self, company_id: UUID) -> Dict[str, Any]:
+        try:
+            progress = await self.cache.get(self._deletion_progress_key(company_id))
+            if not progress:
+                raise CompanyNotFound(
+                    f"No deletion in progress for company with company_id={company_id}"
+                )
+            return progress
+        except Exception as e:
+            logger.error(f"Error of getting company deletion progress: {e}")
+            raise
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from items_app.infrastructure.postgres.ids import uuid7_lower_bound
+from items_app.infrastructure.postgres.repositories.company_repo import CompanyRepo
+from items_app.infrastructure.config import config
+
+logger = logging.getLogger(__name__)
+
+# Запас на расхождение часов экземпляров, выдающих UUIDv7: дозагрузка новых компаний
+# перечитывает ID, созданные за это время до предыдущей дозагрузки
+REFRESH_OVERLAP_SECONDS = 60.0
+
+
+class BloomFilter:
+    """
+    Битовый массив с k хеш-функциями (двойное хеширование одного BLAKE2b).
+    Отсутствие значения гарантировано, присутствие — с вероятностью ложного срабатывания.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float, max_bytes: int):
+        optimal_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        self.size_bits = max(8, min(optimal_bits, max_bytes * 8))
+        self.hashes = max(1, round(self.size_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.size_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: bytes) -> Iterator[int]:
+        digest = hashlib.blake2b(value, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, value: bytes) -> None:
+        is_new = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                is_new = True
+        # Повторно добавленные значения (перекрытие дозагрузок) не увеличивают счётчик,
+        # поэтому он приблизителен: ложное срабатывание тоже не считается новым значением
+        if is_new:
+            self.count += 1
+
+    def __contains__(self, value: bytes) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+    def estimated_false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size_bits)) ** self.hashes
+
+
+class CompanyExistenceFilter:
+    """
+    Фильтр Блума по ID действующих компаний в памяти процесса.
+    Строится при старте, пополняется при создании компании и дозагрузкой новых
+    (UUIDv7 упорядочены по времени), периодически перестраивается, чтобы забыть удалённые.
+    Пока фильтр не построен, любая компания считается возможно существующей.
+    Компании с UUIDv7 не старше последней дозагрузки (с запасом на расхождение часов)
+    тоже не отклоняются: их мог создать другой экземпляр, и фильтр о них ещё не знает.
+    """
+
+    def __init__(
+        self,
+        capacity: int = config.COMPANY_FILTER_CAPACITY,
+        false_positive_rate: float = config.COMPANY_FILTER_FALSE_POSITIVE_RATE,
+        max_bytes: int = config.COMPANY_FILTER_MAX_BYTES,
+    ):
+        self._capacity = capacity
+        self._false_positive_rate = false_positive_rate
+        self._max_bytes = max_bytes
+        self._bloom: Optional[BloomFilter] = None
+        # Компании, созданные во время перестройки, переносятся в новый фильтр
+        self._added_during_rebuild: Optional[List[UUID]] = None
+        self._refreshed_at: Optional[float] = None
+        self.rejected = 0
+
+    @property
+    def is_ready(self) -> bool:
+        return self._bloom is not None
+
+    def _may_be_unloaded(self, company_id: UUID) -> bool:
+        # Отсутствие в фильтре гарантировано только для ID, созданных до дозагрузки
+        if company_id.version != 7 or self._refreshed_at is None:
+            return False
+        return company_id >= uuid7_lower_bound(self._refreshed_at - REFRESH_OVERLAP_SECONDS)
+
+    def might_exist(self, company_id: UUID) -> bool:
+        if self._bloom is None or company_id.bytes in self._bloom:
+            return True
+        if self._may_be_unloaded(company_id):
+            return True
+        self.rejected += 1
+        return False
+
+    def add(self, company_id: UUID) -> None:
+        if self._bloom is not None:
+            self._bloom.add(company_id.bytes)
+        if self._added_during_rebuild is not None:
+            self._added_during_rebuild.append(company_id)
+
+    async def rebuild(self, *session_factories: Callable[[], AsyncSession]) -> None:
+        """Строит фильтр заново по компаниям всех переданных баз (шардов)."""
+        started_at = time.time()
+        bloom = BloomFilter(self._capacity, self._false_positive_rate, self._max_bytes)
+        self._added_during_rebuild = []
+        try:
+            for session_factory in session_factories:
+                async with session_factory() as session:
+                    async for company_id in CompanyRepo(session).stream_company_ids():
+                        bloom.add(company_id.bytes)
+            for company_id in self._added_during_rebuild:
+                bloom.add(company_id.bytes)
+        finally:
+            self._added_during_rebuild = None
+        if bloom.count > self._capacity:
+            logger.warning(
+                f"Company filter holds {bloom.count} companies over capacity {self._capacity}"
+            )
+        self._bloom = bloom
+        self._refreshed_at = started_at
+
+    async def refresh(self, *session_factories: Callable[[], AsyncSession]) -> None:
+        """Добавляет компании, созданные другими экземплярами приложения."""
+        if self._bloom is None or self._refreshed_at is None:
+            await self.rebuild(*session_factories)
+            return
+        started_at = time.time()
+        min_id = uuid7_lower_bound(self._refreshed_at - REFRESH_OVERLAP_SECONDS)
+        for session_factory in session_factories:
+            async with session_factory() as session:
+                async for company_id in CompanyRepo(session).stream_company_ids(min_id=min_id):
+                    self._bloom.add(company_id.bytes)
+        self._refreshed_at = started_at
+
+    async def run(
+        self,
+        session_factories: Sequence[Callable[[], AsyncSession]],
+        refresh_interval: float = config.COMPANY_FILTER_REFRESH_INTERVAL_SECONDS,
+        rebuild_interval: float = config.COMPANY_FILTER_REBUILD_INTERVAL_SECONDS,
+    ) -> None:
+        rebuilt_at: Optional[float] = None
+        while True:
+            try:
+                if rebuilt_at is None or time.monotonic() - rebuilt_at >= rebuild_interval:
+                    await self.rebuild(*session_factories)
+                    rebuilt_at = time.monotonic()
+                else:
+                    await self.refresh(*session_factories)
+            except Exception as e:
+                logger.error(f"Error of refreshing company filter: {e}")
+            await asyncio.sleep(refresh_interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        bloom = self._bloom
+        return {
+            "ready": bloom is not None,
+            "companies": bloom.count if bloom else None,
+            "size_bytes": (bloom.size_bits + 7) // 8 if bloom else None,
+            "hashes": bloom.hashes if bloom else None,
+            "estimated_false_positive_rate": (
+                bloom.estimated_false_positive_rate() if bloom else None
+            ),
+            "rejected": self.rejected,
+        }
+
+
+# Общий для процесса фильтр: сервисы создаются на запрос
+company_filter = CompanyExistenceFilter()
@@ -3,4 +3,8 @@ class ItemNotFound(Exception):
 
 
 class NoAccessToItem(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class ItemsBulkUpdateFailed(Exception):
+    pass
@@ -1,84 +1,309 @@
+import asyncio
+import heapq
 import logging
+from itertools import islice
 from uuid import UUID
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from items_app.application.items_applications.items_applications_exceptions import (
-    ItemNotFound, NoAccessToItem
+    ItemNotFound, NoAccessToItem, ItemsBulkUpdateFailed
+)
+from items_app.application.batching.micro_batcher import MicroBatcher
+from items_app.application.cache_outbox.cache_outbox_relay import CacheOutboxRelay
+from items_app.application.change_stream.change_stream import ChangePublisher, item_event
+from items_app.application.company_filter.company_filter import CompanyExistenceFilter
+from items_app.application.write_behind.price_write_behind import PriceWriteBehindBuffer
+from items_app.application.companies_applications.companies_applications_exceptions import (
+    CompanyNotFound,
 )
 from items_app.infrastructure.postgres.models import Item
-from items_app.infrastructure.postgres.repositories.item_repo import ItemRepo
+from items_app.infrastructure.postgres.rows import ItemChangeRow, ItemRow
+from items_app.infrastructure.postgres.repositories.item_repo import ItemRepo, ITEM_SORTS
+from items_app.infrastructure.postgres.repositories.change_log_repo import ChangePosition
+from items_app.infrastructure.postgres.shards import ShardRouter
 from items_app.infrastructure.redis.cache.async_cache_manager import AsyncCacheManager
+from items_app.infrastructure.config import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class ItemsApplicationsService:
-    def __init__(self, item_repo: ItemRepo, cache: AsyncCacheManager):
+    def __init__(
+        self,
+        item_repo: ItemRepo,
+        cache: AsyncCacheManager,
+        read_item_repo: Optional[ItemRepo] = None,
+        outbox_relay: Optional[CacheOutboxRelay] = None,
+        lookup_batcher: Optional[MicroBatcher] = None,
+        company_filter: Optional[CompanyExistenceFilter] = None,
+        shard_read_item_repos: Optional[List[ItemRepo]] = None,
+        change_publisher: Optional[ChangePublisher] = None,
+        read_cache_expire_seconds: int = config.REDIS_CACHE_EXPIRE_SECONDS,
+        price_buffer: Optional[PriceWriteBehindBuffer] = None,
+        shard_router: Optional[ShardRouter] = None,
+        shard_item_repos: Optional[Dict[str, ItemRepo]] = None,
+    ):
         self.item_repo = item_repo
         self.cache = cache
+        # Чтения (fetch_*) идут в реплику, если она передана
+        self.read_item_repo = read_item_repo or item_repo
+        self.outbox_relay = outbox_relay
+        # Чтения товара по ID объединяются с конкурентными запросами, если батчер передан
+        self.lookup_batcher = lookup_batcher
+        # Заведомо несуществующие компании отклоняются без обращения к кешу и БД
+        self.company_filter = company_filter
+        # Репозитории всех шардов: запросы без компании собираются со всех шардов
+        self.shard_read_item_repos = shard_read_item_repos
+        # События изменений для подписчиков SSE публикуются после фиксации записи
+        self.change_publisher = change_publisher
+        # Прочитанное с реплики кешируется не дольше допустимого отставания реплики:
+        # иначе устаревшее чтение, записанное в кеш после инвалидации, переживёт её надолго
+        self.read_cache_expire_seconds = read_cache_expire_seconds
+        # Буфер отложенной записи цен: синхронная запись товара отменяет его отложенную цену
+        self.price_buffer = price_buffer
+        # Репозитории основных баз шардов по имени: записи товаров разных компаний
+        # (потоковая загрузка) идут в шард компании каждого товара
+        self.shard_router = shard_router
+        self.shard_item_repos = shard_item_repos
+
+    def _reject_unknown_company(self, company_id: UUID) -> None:
+        if self.company_filter and not self.company_filter.might_exist(company_id):
+            raise CompanyNotFound(f"Company with company_id={company_id} not found")
+
+    def _repos_for_scope(self, company_id: Optional[UUID]) -> List[ItemRepo]:
+        # Компания целиком лежит в шарде запроса, остальное — во всех шардах
+        if company_id or not self.shard_read_item_repos:
+            return [self.read_item_repo]
+        return self.shard_read_item_repos
+
+    def _item_repo_for_company(self, company_id: UUID) -> ItemRepo:
+        if not self.shard_router or not self.shard_item_repos:
+            return self.item_repo
+        return self.shard_item_repos[self.shard_router.shard_for(company_id).name]
 
-    async def _invalidate_items_cache(self):
-        invalidate_cache_key = self.cache.generate_key("items", "*")
-        await self.cache.delete_pattern(invalidate_cache_key)
+    async def _get_items_from_shards(
+        self,
+        repos: List[ItemRepo],
+        offset: Optional[int],
+        limit: Optional[int],
+        sort: Optional[str] = None,
+        after: Optional[Tuple[Any, UUID]] = None,
+        **filters: Any,
+    ) -> List[ItemRow] | None:
+        """
+        Каждый шард отдаёт первые offset + limit строк в общем порядке сортировки,
+        упорядоченные ответы сливаются, и из результата вырезается нужная страница.
+        """
+        skip = 0 if after is not None else offset or 0
+        shard_limit = skip + limit if limit is not None else None
+        responses = await asyncio.gather(
+            *(
+                repo.get_items(0, shard_limit, sort=sort, after=after, **filters)
+                for repo in repos
+            )
+        )
+        sort_column, descending = ITEM_SORTS.get(sort, (None, False))
+
+        def sort_key(item: ItemRow) -> Any:
+            if sort_column is None:
+                return item.id
+            return getattr(item, sort_column.key), item.id
+
+        merged = heapq.merge(
+            *(response or [] for response in responses), key=sort_key, reverse=descending
+        )
+        return list(islice(merged, skip, shard_limit)) or None
+
+    async def _search_items_in_shards(
+        self,
+        repos: List[ItemRepo],
+        query: str,
+        prefix_only: bool,
+        offset: Optional[int],
+        limit: Optional[int],
+    ) -> List[ItemRow] | None:
+        # Как и списки: каждый шард отдаёт первые offset + limit совпадений,
+        # ответы сливаются по ключу порядка выдачи
+        skip = offset or 0
+        shard_limit = skip + limit if limit is not None else None
+        responses = await asyncio.gather(
+            *(
+                repo.search_items_ranked(query, prefix_only=prefix_only, offset=0, limit=shard_limit)
+                for repo in repos
+            )
+        )
+        if any(response is None for response in responses):
+            return None
+        merged = heapq.merge(
+            *(response or [] for response in responses), key=lambda ranked: ranked[0]
+        )
+        return [item for _, item in islice(merged, skip, shard_limit)]
+
+    def _items_cache_pattern(self) -> str:
+        return self.cache.generate_key("items", "*")
+
+    def _items_counts_cache_pattern(self) -> str:
+        return self.cache.generate_key("counts", "items", "*")
+
+    def _companies_items_cache_patterns(self, company_ids: Iterable[UUID]) -> List[str]:
+        patterns = [
+            self.cache.generate_key("items", f"company_id={company_id}", "*")
+            for company_id in company_ids
+        ]
+        patterns.append(self.cache.generate_key("items", "all", "*"))
+        return patterns
+
+    async def _record_cache_invalidation(
+        self, *patterns: str, item_repo: Optional[ItemRepo] = None
+    ) -> None:
+        # Событие пишется в outbox в той же транзакции (и том же шарде), что и изменение данных
+        if not await (item_repo or self.item_repo).record_cache_invalidation(patterns):
+            raise RuntimeError("Failed to record cache invalidation")
+
+    async def _apply_cache_invalidation(self, *patterns: str) -> None:
+        if not self.outbox_relay:
+            await self.cache.delete_pattern(*patterns)
+            return
+        # Ключи этой записи удаляются сразу (клиент читает свои записи), а событие
+        # в outbox остаётся фоновому ретранслятору: он повторит удаление при сбое
+        try:
+            await self.cache.delete_pattern(*patterns)
+        except Exception as e:
+            logger.error(f"Error of invalidating cache, left to outbox relay: {e}")
+        self.outbox_relay.wake()
+
+    async def _commit_with_cache_invalidation(self, *patterns: str) -> None:
+        await self._record_cache_invalidation(*patterns)
+        await self.item_repo.commit()
+        await self._apply_cache_invalidation(*patterns)
+
+    async def _publish_changes(self, *events: Dict[str, Any]) -> None:
+        if self.change_publisher:
+            await self.change_publisher.publish(*events)
+
+    async def _get_nonexistent_ids(
+        self, repo: ItemRepo, item_ids: Iterable[UUID]
+    ) -> List[str]:
+        # Вызывается только для ID, не найденных в компании: существующие среди них
+        # принадлежат другим компаниям (нет доступа), остальные не существуют вовсе
+        item_ids = list(item_ids)
+        existing_ids = await repo.get_existing_item_ids(item_ids=item_ids)
+        if existing_ids is None:
+            raise RuntimeError("Failed to check existence of items")
+        existing_ids_set = set(existing_ids)
+        return [str(item_id) for item_id in item_ids if item_id not in existing_ids_set]
 
     async def create_item(self, new_item: Item) -> Optional[Item]:
         try:
+            self._reject_unknown_company(new_item.company_id)
+            # Компания, помеченная удалённой, не принимает новые товары
+            is_active = await self.item_repo.is_company_active(new_item.company_id)
+            if is_active is None:
+                raise RuntimeError(f"Failed to check company with company_id={new_item.company_id}")
+            if not is_active:
+                raise CompanyNotFound(f"Company with company_id={new_item.company_id} not found")
             created_item = await self.item_repo.add_item(item_data=new_item)
-            await self.item_repo.commit()
-            await self._invalidate_items_cache()
+            if created_item is None:
+                raise RuntimeError("Failed to add item")
+            await self._commit_with_cache_invalidation(
+                self._items_cache_pattern(), self._items_counts_cache_pattern()
+            )
+            await self._publish_changes(
+                item_event(
+                    "created", created_item.id, created_item.company_id,
+                    title=created_item.title, price=created_item.price,
+                )
+            )
             return created_item
         except Exception as e:
             await self.item_repo.rollback()
             logger.error(f"Error of creating item: {e}")
             raise
 
-    async def fetch_item_by_id(self, item_id: UUID, company_id: UUID) -> Item | None:
+    def _item_cache_key(self, item_id: UUID, company_id: UUID) -> str:
+        return self.cache.generate_key("items", f"company_id={company_id}", f"item_id={item_id}")
+
+    async def load_items_batch(
+        self, keys: List[Tuple[UUID, UUID]]
+    ) -> Dict[Tuple[UUID, UUID], ItemRow]:
+        """
+        Загружает пакет пар (item_id, company_id): один MGET по кешу и один IN-запрос
+        по промахам. Товар ищется без фильтра по компании, чтобы вызывающий отличил
+        чужой товар от отсутствующего; в кеш попадают только товары своей компании.
+        """
+        cache_keys = [self._item_cache_key(item_id, company_id) for item_id, company_id in keys]
+        cached_values = await self.cache.get_many(*cache_keys)
+        result = {key: value for key, value in zip(keys, cached_values) if value is not None}
+        missing_keys = [key for key in keys if key not in result]
+        if not missing_keys:
+            return result
+
+        missing_ids = list(dict.fromkeys(item_id for item_id, _ in missing_keys))
+        rows = await self.read_item_repo.get_items_by_ids(item_ids=missing_ids)
+        # None означает и ошибку, и пустой результат: пустой подтверждается проверкой существования
+        if rows is None and await self.read_item_repo.get_existing_item_ids(item_ids=missing_ids) is None:
+            raise RuntimeError("Failed to get items by ids")
+        rows_by_id = {row.id: row for row in rows or []}
+        to_cache = {}
+        for item_id, company_id in missing_keys:
+            if row := rows_by_id.get(item_id):
+                result[(item_id, company_id)] = row
+                if row.company_id == company_id:
+                    to_cache[self._item_cache_key(item_id, company_id)] = row
+        await self.cache.set_many(to_cache, ex=self.read_cache_expire_seconds)
+        return result
+
+    async def fetch_item_by_id(self, item_id: UUID, company_id: UUID) -> Item | ItemRow | None:
         try:
-            cache_key = self.cache.generate_key("items", f"company_id={company_id}", f"item_id={item_id}")
+            if self.lookup_batcher:
+                response = await self.lookup_batcher.load((item_id, company_id))
+                if not response:
+                    raise ItemNotFound(f"Item with item_id={item_id} not found")
+                if response.company_id != company_id:
+                    raise NoAccessToItem(f"Company with ID {company_id} do not have access for item with ID {item_id}")
+                return response
+
+            cache_key = self._item_cache_key(item_id, company_id)
             if cache_value := await self.cache.get(cache_key):
                 return cache_value
-            response = await self.item_repo.get_item_by_id(item_id=item_id)
+            response = await self.read_item_repo.get_item_by_id(
+                item_id=item_id, company_id=company_id
+            )
             if not response:
-                raise ItemNotFound(f"Item with item_id={item_id} not found")
-            if response.company_id != company_id:
-                raise NoAccessToItem(f"Comapany with ID {company_id} do not have access for item with ID {item_id}")
-            await self.cache.set(cache_key, response)
+                if await self._get_nonexistent_ids(self.read_item_repo, [item_id]):
+                    raise ItemNotFound(f"Item with item_id={item_id} not found")
+                raise NoAccessToItem(f"Company with ID {company_id} do not have access for item with ID {item_id}")
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
             return response
         except Exception as e:
             logger.error(f"Error of getting item by id: {e}")
             raise
 
-    async def get_missing_ids(
-        self, existing_items: Optional[List[Item]], item_ids: List[UUID]
-    ) -> List[str]:
-        try:
-            existing_items_set = (
-                {item.id for item in existing_items} if existing_items else set()
-            )
-            missing_ids = [
-                str(item_id)
-                for item_id in item_ids
-                if item_id not in existing_items_set
-            ]
-            return missing_ids
-        except Exception as e:
-            logger.error(f"Error of getting existing and missing ids: {e}")
-            raise
-
-    async def fetch_items_by_ids(self, item_ids: List[UUID], company_id: UUID) -> List[Item] | None:
+    async def fetch_items_by_ids(self, item_ids: List[UUID], company_id: UUID) -> List[ItemRow] | None:
         try:
+            if not item_ids:
+                raise ItemNotFound("No item IDs provided")
             items_ids_for_cache = ",".join(sorted(str(i) for i in item_ids))
             cache_key = self.cache.generate_key("items", f"company_id={company_id}", f"items_ids={items_ids_for_cache}")
             if cache_value := await self.cache.get(cache_key):
                 return cache_value
-            response = await self.item_repo.get_items_by_ids(item_ids=item_ids)
-            if not response or len(response) != len(item_ids):
-                missing_ids = await self.get_missing_ids(response, item_ids)
-                raise ItemNotFound(f"No items found with IDs {', '.join(missing_ids)}")
-            for item in response:
-                if item.company_id != company_id:
-                    raise NoAccessToItem("You do not have access to some items")
-            await self.cache.set(cache_key, response)
+            response = await self.read_item_repo.get_items_by_ids(
+                item_ids=item_ids, company_id=company_id
+            )
+            if not response:
+                response = []
+            found_ids = {item.id for item in response}
+            not_found_ids = [
+                item_id for item_id in dict.fromkeys(item_ids) if item_id not in found_ids
+            ]
+            if not_found_ids:
+                missing_ids = await self._get_nonexistent_ids(
+                    self.read_item_repo, not_found_ids
+                )
+                if missing_ids:
+                    raise ItemNotFound(f"No items found with IDs {', '.join(missing_ids)}")
+                raise NoAccessToItem("You do not have access to some items")
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
             return response
         except Exception as e:
             logger.error(f"Error of getting items by ids: {e}")
@@ -86,60 +311,386 @@ class ItemsApplicationsService:
 
     async def fetch_items_of_company_by_company_id(
         self, company_id: UUID
-    ) -> List[Item] | None:
+    ) -> List[ItemRow] | None:
         try:
             cache_key = self.cache.generate_key("items", f"company_id={company_id}", "all")
             if cache_value := await self.cache.get(cache_key):
                 return cache_value
 
-            response = await self.item_repo.get_items_by_company_id(
+            response = await self.read_item_repo.get_items_by_company_id(
                 company_id=company_id
             )
             if not response:
                 raise ItemNotFound(
                     f"No items found for company with company_id={company_id}"
                 )
-            await self.cache.set(cache_key, response)
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
             return response
         except Exception as e:
             logger.error(f"Error of getting items by company id: {e}")
             raise
 
+    async def ensure_company_exists(self, company_id: UUID) -> None:
+        # Проверка до начала потоковой выгрузки: после отправки заголовков ответа
+        # вернуть 404 уже нельзя
+        try:
+            self._reject_unknown_company(company_id)
+            is_active = await self.read_item_repo.is_company_active(company_id)
+            if is_active is None:
+                raise RuntimeError(f"Failed to check company with company_id={company_id}")
+            if not is_active:
+                raise CompanyNotFound(f"Company with company_id={company_id} not found")
+        except Exception as e:
+            logger.error(f"Error of checking company: {e}")
+            raise
+
+    async def stream_items_of_company(self, company_id: UUID) -> AsyncIterator[ItemRow]:
+        try:
+            async for item in self.read_item_repo.stream_items_by_company_id(
+                company_id=company_id
+            ):
+                yield item
+        except Exception as e:
+            logger.error(f"Error of streaming items by company id: {e}")
+            raise
+        finally:
+            # Завершаем читающую транзакцию, чтобы сразу вернуть соединение в пул
+            await self.read_item_repo.rollback()
+
     async def fetch_all_items(
-        self, offset: Optional[int], limit: Optional[int]
-    ) -> List[Item] | None:
+        self,
+        offset: Optional[int],
+        limit: Optional[int],
+        company_id: Optional[UUID] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+        after: Optional[Tuple[Any, UUID]] = None,
+    ) -> List[ItemRow] | None:
         try:
-            cache_key = self.cache.generate_key("items", "all", f"offset={offset}", f"limit={limit}")
+            if company_id:
+                self._reject_unknown_company(company_id)
+            # В репозиторий и ключ кеша попадают только заданные фильтры
+            filters: Dict[str, Any] = {
+                name: value
+                for name, value in (
+                    ("company_id", company_id),
+                    ("min_price", min_price),
+                    ("max_price", max_price),
+                    ("sort", sort),
+                    ("after", after),
+                )
+                if value is not None
+            }
+            scope = f"company_id={company_id}" if company_id else "all"
+            cache_key = self.cache.generate_key(
+                "items", scope, f"offset={offset}", f"limit={limit}",
+                *(f"{name}={value}" for name, value in filters.items() if name != "company_id"),
+            )
             if cache_value := await self.cache.get(cache_key):
                 return cache_value
             
-            response = await self.item_repo.get_items(offset, limit)
-            await self.cache.set(cache_key, response)
+            repos = self._repos_for_scope(company_id)
+            if len(repos) == 1:
+                response = await repos[0].get_items(offset, limit, **filters)
+            else:
+                response = await self._get_items_from_shards(repos, offset, limit, **filters)
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
             return response
         except Exception as e:
             logger.error(f"Error of getting all items: {e}")
             raise
 
+    async def search_items(
+        self,
+        query: str,
+        company_id: Optional[UUID] = None,
+        prefix_only: bool = False,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 10,
+    ) -> List[ItemRow]:
+        try:
+            normalized_query = query.strip().lower()
+            scope = f"company_id={company_id}" if company_id else "all"
+            cache_key = self.cache.generate_key(
+                "items", scope, "search", f"prefix_only={prefix_only}",
+                f"q={normalized_query}", f"offset={offset}", f"limit={limit}",
+            )
+            if (cache_value := await self.cache.get(cache_key)) is not None:
+                return cache_value
+
+            repos = self._repos_for_scope(company_id)
+            response: List[ItemRow] | None
+            if len(repos) == 1:
+                response = await repos[0].search_items(
+                    query=normalized_query,
+                    company_id=company_id,
+                    prefix_only=prefix_only,
+                    offset=offset,
+                    limit=limit,
+                )
+            else:
+                response = await self._search_items_in_shards(
+                    repos, normalized_query, prefix_only, offset, limit
+                )
+            if response is None:
+                raise RuntimeError(f"Failed to search items by query={normalized_query}")
+            await self.cache.set(cache_key, response, ex=self.read_cache_expire_seconds)
+            return response
+        except Exception as e:
+            logger.error(f"Error of searching items: {e}")
+            raise
+
+    async def fetch_item_changes(
+        self,
+        since: Optional[int] = None,
+        after: Optional[List[Optional[ChangePosition]]] = None,
+        limit: int = 100,
+        company_id: Optional[UUID] = None,
+    ) -> Tuple[List[ItemChangeRow], List[Optional[ChangePosition]], bool]:
+        """
+        Изменения товаров (upsert и delete) после позиции клиента в порядке версий.
+        Версии шардов независимы, поэтому позиция хранится для каждого шарда отдельно.
+        Возвращает страницу изменений, позиции для следующего запроса и признак,
+        что изменений больше, чем limit. Ответ не кешируется: лента меняется с каждой записью.
+        """
+        try:
+            repos = self._repos_for_scope(company_id)
+            start: Optional[ChangePosition] = (since, None) if since is not None else None
+            positions = list(after) if after is not None else [start] * len(repos)
+            if len(positions) != len(repos):
+                raise ValueError("Changes cursor does not match the requested scope")
+
+            # Лишняя строка с каждого шарда показывает, есть ли изменения за страницей
+            responses = await asyncio.gather(
+                *(
+                    repo.get_item_changes(position, limit + 1, company_id=company_id)
+                    for repo, position in zip(repos, positions)
+                )
+            )
+            shard_changes: List[List[ItemChangeRow]] = []
+            for changes in responses:
+                if changes is None:
+                    raise RuntimeError("Failed to get item changes")
+                shard_changes.append(changes)
+            merged = sorted(
+                (
+                    (change.version, change.id, shard_index, change)
+                    for shard_index, changes in enumerate(shard_changes)
+                    for change in changes
+                ),
+                key=lambda entry: entry[:3],
+            )
+            page = merged[:limit]
+            for version, item_id, shard_index, _ in page:
+                positions[shard_index] = (version, item_id)
+            return [change for *_, change in page], positions, len(merged) > limit
+        except Exception as e:
+            logger.error(f"Error of getting item changes: {e}")
+            raise
+
+    async def count_items(
+        self, company_id: Optional[UUID] = None, estimate: bool = False
+    ) -> Tuple[int, bool]:
+        try:
+            scope = f"company_id={company_id}" if company_id else "all"
+            cache_key = self.cache.generate_key("counts", "items", scope, f"estimate={estimate}")
+            if cache_value := await self.cache.get(cache_key):
+                return tuple(cache_value)
+
+            repos = self._repos_for_scope(company_id)
+            # Оценка pg_class.reltuples допустима только для всей таблицы без фильтров
+            if estimate and not company_id:
+                estimates = await asyncio.gather(
+                    *(repo.estimate_items_count() for repo in repos)
+                )
+                if None not in estimates:
+                    estimated = sum(estimate for estimate in estimates if estimate is not None)
+                    await self.cache.set(
+                        cache_key, [estimated, True], ex=self.read_cache_expire_seconds
+                    )
+                    return estimated, True
+
+            counts = await asyncio.gather(
+                *(repo.count_items(company_id=company_id) for repo in repos)
+            )
+            if None in counts:
+                raise RuntimeError("Failed to count items")
+            count = sum(count for count in counts if count is not None)
+            await self.cache.set(cache_key, [count, False], ex=self.read_cache_expire_seconds)
+            return count, False
+        except Exception as e:
+            logger.error(f"Error of counting items: {e}")
+            raise
+
+    def _discard_buffered_prices(self, company_id: UUID, item_ids: List[UUID]) -> None:
+        if self.price_buffer:
+            self.price_buffer.discard(company_id, item_ids)
+
     async def update_item_data(self, update_item: Item) -> Item | None:
         try:
+            self._discard_buffered_prices(update_item.company_id, [update_item.id])
             response = await self.item_repo.update_item(updated_item_data=update_item)
             if not response:
-                raise ItemNotFound(f"No such item with item_id={update_item.id}")
-            await self.item_repo.commit()
-            await self._invalidate_items_cache()
+                if await self._get_nonexistent_ids(self.item_repo, [update_item.id]):
+                    raise ItemNotFound(f"No such item with item_id={update_item.id}")
+                raise NoAccessToItem(
+                    f"Company with ID {update_item.company_id} do not have access for item with ID {update_item.id}"
+                )
+            await self._commit_with_cache_invalidation(self._items_cache_pattern())
+            await self._publish_changes(
+                item_event(
+                    "updated", response.id, response.company_id,
+                    title=response.title, price=response.price,
+                )
+            )
             return response
         except Exception as e:
             await self.item_repo.rollback()
             logger.error(f"Error of updating item: {e}")
             raise
 
+    async def bulk_update_items(
+        self, company_id: UUID, updates: List[Tuple[UUID, float, Optional[str]]]
+    ) -> Tuple[int, List[str]]:
+        try:
+            # При повторе ID в пакете побеждает последнее значение
+            deduplicated_updates = {update[0]: update for update in updates}
+            item_ids = list(deduplicated_updates.keys())
+            self._discard_buffered_prices(company_id, item_ids)
+            updated_ids = await self.item_repo.bulk_update_items(
+                company_id=company_id, updates=list(deduplicated_updates.values())
+            )
+            if updated_ids is None:
+                raise ItemsBulkUpdateFailed(
+                    f"Failed to update items of company with company_id={company_id}"
+                )
+            if updated_ids:
+                await self._commit_with_cache_invalidation(self._items_cache_pattern())
+                await self._publish_changes(
+                    *(
+                        item_event(
+                            "updated", item_id, company_id,
+                            title=deduplicated_updates[item_id][2],
+                            price=deduplicated_updates[item_id][1],
+                        )
+                        for item_id in updated_ids
+                    )
+                )
+            else:
+                await self.item_repo.commit()
+            updated_ids_set = set(updated_ids)
+            missing_ids = [
+                str(item_id) for item_id in item_ids if item_id not in updated_ids_set
+            ]
+            return len(updated_ids), missing_ids
+        except Exception as e:
+            await self.item_repo.rollback()
+            logger.error(f"Error of bulk updating items: {e}")
+            raise
+
+    async def update_item_price(self, item_id: UUID, company_id: UUID, price: float) -> None:
+        updated_count, _ = await self.bulk_update_items(company_id, [(item_id, price, None)])
+        if not updated_count:
+            if await self._get_nonexistent_ids(self.item_repo, [item_id]):
+                raise ItemNotFound(f"No such item with item_id={item_id}")
+            raise NoAccessToItem(
+                f"Company with ID {company_id} do not have access for item with ID {item_id}"
+            )
+
+    def buffer_price_update(self, item_id: UUID, company_id: UUID, price: float) -> None:
+        # Существование товара проверяется при сбросе: здесь только дешёвая проверка компании
+        self._reject_unknown_company(company_id)
+        if not self.price_buffer:
+            raise RuntimeError("Price write-behind buffer is not configured")
+        self.price_buffer.put(company_id, item_id, price)
+
+    async def ingest_items(
+        self,
+        items: AsyncIterator[Dict[str, Any]],
+        chunk_size: int = config.DB_INGEST_CHUNK_SIZE,
+    ) -> Dict[str, int]:
+        summary = {"received": 0, "upserted": 0, "skipped": 0, "failed": 0, "chunks": 0}
+        touched_company_ids = set()
+
+        used_item_repos: List[ItemRepo] = []
+
+        async def flush_shard(item_repo: ItemRepo, chunk: Dict[UUID, Dict[str, Any]]) -> None:
+            upserted = await item_repo.upsert_items(list(chunk.values()))
+            if upserted is None:
+                summary["failed"] += len(chunk)
+                return
+            chunk_company_ids = {chunk[item_id]["company_id"] for item_id, _ in upserted}
+            if chunk_company_ids:
+                await self._record_cache_invalidation(
+                    *self._companies_items_cache_patterns(chunk_company_ids),
+                    self._items_counts_cache_pattern(),
+                    item_repo=item_repo,
+                )
+            await item_repo.commit()
+            await self._publish_changes(
+                *(
+                    item_event(
+                        "created" if created else "updated", item_id, chunk[item_id]["company_id"],
+                        title=chunk[item_id]["title"], price=chunk[item_id]["price"],
+                    )
+                    for item_id, created in upserted
+                )
+            )
+            summary["upserted"] += len(upserted)
+            summary["skipped"] += len(chunk) - len(upserted)
+            summary["chunks"] += 1
+            touched_company_ids.update(chunk_company_ids)
+
+        async def flush(chunk: Dict[UUID, Dict[str, Any]]) -> None:
+            # Строки несут компанию только в себе: пакет делится по шардам компаний,
+            # и каждая часть пишется и фиксируется в своём шарде
+            shard_chunks: Dict[ItemRepo, Dict[UUID, Dict[str, Any]]] = {}
+            for item_id, item_data in chunk.items():
+                item_repo = self._item_repo_for_company(item_data["company_id"])
+                shard_chunks.setdefault(item_repo, {})[item_id] = item_data
+            for item_repo, shard_chunk in shard_chunks.items():
+                if item_repo not in used_item_repos:
+                    used_item_repos.append(item_repo)
+                await flush_shard(item_repo, shard_chunk)
+
+        try:
+            # Следующая порция тела запроса читается только после записи текущего пакета
+            chunk: Dict[UUID, Dict[str, Any]] = {}
+            async for item_data in items:
+                summary["received"] += 1
+                chunk[item_data["id"]] = item_data
+                if len(chunk) >= chunk_size:
+                    await flush(chunk)
+                    chunk = {}
+            if chunk:
+                await flush(chunk)
+            return summary
+        except Exception as e:
+            for item_repo in used_item_repos or [self.item_repo]:
+                await item_repo.rollback()
+            logger.error(f"Error of ingesting items: {e}")
+            raise
+        finally:
+            if touched_company_ids:
+                await self._apply_cache_invalidation(
+                    *self._companies_items_cache_patterns(touched_company_ids),
+                    self._items_counts_cache_pattern(),
+                )
+
     async def delete_item(self, item_id: UUID, company_id: UUID) -> bool | None:
         try:
-            response = await self.item_repo.delete_item_by_id(item_id=item_id)
+            response = await self.item_repo.delete_item_by_id(
+                item_id=item_id, company_id=company_id
+            )
             if not response:
-                raise ItemNotFound(f"No such item with item_id={item_id}")
-            await self.item_repo.commit()
-            await self._invalidate_items_cache()
+                if await self._get_nonexistent_ids(self.item_repo, [item_id]):
+                    raise ItemNotFound(f"No such item with item_id={item_id}")
+                raise NoAccessToItem(f"Company with ID {company_id} do not have access for item with ID {item_id}")
+            await self._commit_with_cache_invalidation(
+                self._items_cache_pattern(), self._items_counts_cache_pattern()
+            )
+            await self._publish_changes(item_event("deleted", item_id, company_id))
             return True
         except Exception as e:
             await self.item_repo.rollback()
@@ -148,14 +699,29 @@ class ItemsApplicationsService:
 
     async def delete_items(self, item_ids: List[UUID], company_id: UUID) -> bool | None:
         try:
-            existing_items = await self.item_repo.get_items_by_ids(item_ids=item_ids)
-            if not existing_items or len(existing_items) != len(item_ids):
-                missing_ids = await self.get_missing_ids(existing_items, item_ids)
-                raise ItemNotFound(f"No items found with IDs {', '.join(missing_ids)}")
+            # Один DELETE, ограниченный компанией; если удалено не всё, транзакция
+            # откатывается, и ни один товар не удаляется
+            deleted_ids = await self.item_repo.delete_items_by_ids(
+                item_ids=item_ids, company_id=company_id
+            )
+            if deleted_ids is None:
+                raise RuntimeError("Failed to delete items")
+            deleted_ids_set = set(deleted_ids)
+            not_deleted_ids = [
+                item_id for item_id in dict.fromkeys(item_ids) if item_id not in deleted_ids_set
+            ]
+            if not_deleted_ids:
+                missing_ids = await self._get_nonexistent_ids(self.item_repo, not_deleted_ids)
+                if missing_ids:
+                    raise ItemNotFound(f"No items found with IDs {', '.join(missing_ids)}")
+                raise NoAccessToItem("You do not have access to some items")
 
-            await self.item_repo.delete_items_by_ids(item_ids=item_ids)
-            await self.item_repo.commit()
-            await self._invalidate_items_cache()
+            await self._commit_with_cache_invalidation(
+                self._items_cache_pattern(), self._items_counts_cache_pattern()
+            )
+            await self._publish_changes(
+                *(item_event("deleted", item_id, company_id) for item_id in deleted_ids)
+            )
             return True
         except Exception as e:
             await self.item_repo.rollback()
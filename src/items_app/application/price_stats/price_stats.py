@@ -0,0 +1,64 @@
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+
+
+# Квантили цен в ответе: ключ p{процентиль}
+PRICE_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def _quantile_key(quantile: float) -> str:
+    return f"p{quantile * 100:g}"
+
+
+def outlier_bounds(
+    mean: float, std: float, z_threshold: float
+) -> Optional[Tuple[float, float]]:
+    """Границы цен, за которыми |z| > z_threshold, или None, если все цены равны."""
+    if std == 0:
+        return None
+    return mean - z_threshold * std, mean + z_threshold * std
+
+
+def compute_price_stats(prices: np.ndarray, bins: int, z_threshold: float) -> Dict[str, Any]:
+    """
+    Квантили, гистограмма и выбросы по z-оценке для упакованного массива цен float64.
+    Все вычисления векторные: один проход NumPy на каждую статистику, без цикла по товарам.
+    """
+    if not prices.size:
+        return {
+            "items_count": 0,
+            "mean": None,
+            "std": None,
+            "min_price": None,
+            "max_price": None,
+            "quantiles": {_quantile_key(quantile): None for quantile in PRICE_QUANTILES},
+            "histogram": {"edges": [], "counts": []},
+            "z_threshold": z_threshold,
+            "outliers_count": 0,
+        }
+
+    mean = float(prices.mean())
+    std = float(prices.std())
+    quantiles = np.quantile(prices, PRICE_QUANTILES)
+    counts, edges = np.histogram(prices, bins=bins)
+    bounds = outlier_bounds(mean, std, z_threshold)
+    if bounds is None:
+        outliers_count = 0
+    else:
+        low, high = bounds
+        outliers_count = int(np.count_nonzero((prices < low) | (prices > high)))
+
+    return {
+        "items_count": int(prices.size),
+        "mean": mean,
+        "std": std,
+        "min_price": float(prices.min()),
+        "max_price": float(prices.max()),
+        "quantiles": {
+            _quantile_key(quantile): float(value)
+            for quantile, value in zip(PRICE_QUANTILES, quantiles)
+        },
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        "z_threshold": z_threshold,
+        "outliers_count": outliers_count,
+    }
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+from items_app.application.batching.micro_batcher import Histogram
+from items_app.infrastructure.config import config
+
+logger = logging.getLogger(__name__)
+
+# Сброс цен одной компании: (item_id, price, title=None) -> (обновлено, ID отсутствующих)
+CompanyPricesFlusher = Callable[
+    [UUID, List[Tuple[UUID, float, Optional[str]]]], Awaitable[Tuple[int, List[str]]]
+]
+
+FLUSH_SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000)
+FLUSH_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class PriceBufferFull(Exception):
+    pass
+
+
+class PriceWriteBehindBuffer:
+    """
+    Отложенная запись цен (write-behind): обновление подтверждается сразу,
+    а в памяти процесса хранится только последняя цена каждого товара.
+    Буфер сбрасывается пакетами по компаниям раз в flush_interval_seconds
+    или досрочно, когда набирается flush_threshold товаров.
+
+    Гарантии:
+    - подтверждённое, но не сброшенное обновление теряется при падении процесса
+      (не более одного интервала сброса); при штатной остановке буфер сбрасывается;
+    - до сброса чтения возвращают прежнюю цену (нет read-your-writes);
+    - синхронная запись товара через этот экземпляр отменяет его отложенную цену,
+      если та ещё не ушла в сброс; между экземплярами побеждает последний сброс;
+    - товары, удалённые или чужие к моменту сброса, отбрасываются и учитываются в метриках;
+    - при ошибке сброса цены возвращаются в буфер, если за это время не пришли новые;
+    - при max_pending товаров в буфере новые обновления отклоняются (PriceBufferFull).
+    """
+
+    def __init__(
+        self,
+        flush_interval_seconds: float = config.PRICE_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        flush_threshold: int = config.PRICE_WRITE_BEHIND_FLUSH_THRESHOLD,
+        max_pending: int = config.PRICE_WRITE_BEHIND_MAX_PENDING,
+    ):
+        self._flush_interval_seconds = flush_interval_seconds
+        self._flush_threshold = flush_threshold
+        self._max_pending = max_pending
+        self._pending: Dict[UUID, Dict[UUID, float]] = {}
+        self._pending_count = 0
+        # Время первого несброшенного обновления: возраст самой старой цены в буфере
+        self._oldest_at: Optional[float] = None
+        self._threshold_reached = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.flush_size = Histogram(FLUSH_SIZE_BUCKETS)
+        self.flush_seconds = Histogram(FLUSH_SECONDS_BUCKETS)
+        self.counters: Dict[str, Any] = {
+            "accepted": 0,
+            "coalesced": 0,
+            "rejected_full": 0,
+            "discarded_by_sync_writes": 0,
+            "flushes": 0,
+            "flushed_items": 0,
+            "dropped_missing": 0,
+            "flush_failures": 0,
+            "requeued_items": 0,
+            "last_flush_at": None,
+        }
+
+    @property
+    def flush_interval_seconds(self) -> float:
+        return self._flush_interval_seconds
+
+    def put(self, company_id: UUID, item_id: UUID, price: float) -> None:
+        prices = self._pending.get(company_id)
+        if prices is not None and item_id in prices:
+            # Промежуточная цена не попадёт в БД: в буфере остаётся последняя
+            prices[item_id] = price
+            self.counters["accepted"] += 1
+            self.counters["coalesced"] += 1
+            return
+        if self._pending_count >= self._max_pending:
+            self.counters["rejected_full"] += 1
+            raise PriceBufferFull(
+                f"Price write-behind buffer is full ({self._max_pending} pending items)"
+            )
+        self._pending.setdefault(company_id, {})[item_id] = price
+        self._pending_count += 1
+        self.counters["accepted"] += 1
+        if self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+        if self._pending_count >= self._flush_threshold:
+            self._threshold_reached.set()
+
+    def discard(self, company_id: UUID, item_ids: List[UUID]) -> None:
+        """Отменяет отложенные цены товаров перед их синхронной записью."""
+        prices = self._pending.get(company_id)
+        if not prices:
+            return
+        for item_id in item_ids:
+            if prices.pop(item_id, None) is not None:
+                self._pending_count -= 1
+                self.counters["discarded_by_sync_writes"] += 1
+        if not prices:
+            del self._pending[company_id]
+
+    def pending_price(self, company_id: UUID, item_id: UUID) -> Optional[float]:
+        return self._pending.get(company_id, {}).get(item_id)
+
+    def _requeue(self, company_id: UUID, prices: Dict[UUID, float]) -> None:
+        # Более новая цена, принятая во время сброса, не перезаписывается старой
+        pending = self._pending.setdefault(company_id, {})
+        for item_id, price in prices.items():
+            if item_id not in pending:
+                pending[item_id] = price
+                self._pending_count += 1
+                self.counters["requeued_items"] += 1
+        if self._oldest_at is None and self._pending_count:
+            self._oldest_at = time.monotonic()
+
+    async def flush(self, flush_company_prices: CompanyPricesFlusher) -> int:
+        """Сбрасывает буфер: одна транзакция на компанию. Возвращает число обновлённых товаров."""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._oldest_at = None
+            self._threshold_reached.clear()
+            if not pending:
+                return 0
+
+            started_at = time.monotonic()
+            flushed = 0
+            done_company_ids: Set[UUID] = set()
+            try:
+                for company_id, prices in pending.items():
+                    updates: List[Tuple[UUID, float, Optional[str]]] = [
+                        (item_id, price, None) for item_id, price in prices.items()
+                    ]
+                    try:
+                        updated_count, missing_ids = await flush_company_prices(
+                            company_id, updates
+                        )
+                    except Exception as e:
+                        self.counters["flush_failures"] += 1
+                        logger.error(
+                            f"Error of flushing buffered prices of company {company_id}: {e}"
+                        )
+                        self._requeue(company_id, prices)
+                        done_company_ids.add(company_id)
+                        continue
+                    flushed += updated_count
+                    self.counters["dropped_missing"] += len(missing_ids)
+                    done_company_ids.add(company_id)
+            except BaseException:
+                # Отмена посреди сброса (остановка приложения): несброшенные цены, включая
+                # прерванную компанию, возвращаются в буфер для последнего сброса в run
+                for company_id, prices in pending.items():
+                    if company_id not in done_company_ids:
+                        self._requeue(company_id, prices)
+                raise
+
+            self.counters["flushes"] += 1
+            self.counters["flushed_items"] += flushed
+            self.counters["last_flush_at"] = time.time()
+            self.flush_size.observe(sum(len(prices) for prices in pending.values()))
+            self.flush_seconds.observe(time.monotonic() - started_at)
+            return flushed
+
+    async def run(self, flush_company_prices: CompanyPricesFlusher) -> None:
+        # Сброс по интервалу или досрочно по порогу; при отмене задачи — последний сброс
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        self._threshold_reached.wait(), timeout=self._flush_interval_seconds
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush(flush_company_prices)
+        finally:
+            await self.flush(flush_company_prices)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "pending_items": self._pending_count,
+            "pending_companies": len(self._pending),
+            "oldest_pending_age_seconds": (
+                time.monotonic() - self._oldest_at if self._oldest_at is not None else 0.0
+            ),
+            "flush_interval_seconds": self._flush_interval_seconds,
+            "flush_threshold": self._flush_threshold,
+            "max_pending": self._max_pending,
+            "flush_size": self.flush_size.snapshot(),
+            "flush_seconds": self.flush_seconds.snapshot(),
+        }
+
+
+# Общий для процесса буфер: подтверждённые цены живут в памяти этого экземпляра до сброса
+price_write_behind = PriceWriteBehindBuffer()
@@ -24,6 +24,20 @@ class BaseConfig(ABC):
     DB_PASSWORD: str = "items_password"
     DB_PORT: int = 5432
     DB_NAME: str = "items_db"
+    # Количество строк, получаемых за один раз через серверный курсор при потоковом чтении
+    DB_STREAM_YIELD_PER: int = 1000
+    # Размер пакета строк, записываемых одним INSERT ... ON CONFLICT при потоковой загрузке
+    DB_INGEST_CHUNK_SIZE: int = 1000
+    # Максимум значений в одном IN (...) для диалектов без параметров-массивов (SQLite)
+    DB_IN_CLAUSE_CHUNK_SIZE: int = 500
+    # Фоновое удаление товаров компании: размер пакета и пауза между пакетами
+    COMPANY_PURGE_BATCH_SIZE: int = 5000
+    COMPANY_PURGE_PAUSE_SECONDS: float = 0.1
+    # Фоновый обход компаний, помеченных удалёнными: интервал и число компаний за проход
+    COMPANY_PURGE_SWEEP_INTERVAL_SECONDS: float = 60.0
+    COMPANY_PURGE_SWEEP_BATCH_SIZE: int = 100
+    # Количество HASH-секций таблицы items (используется миграцией секционирования)
+    DB_ITEMS_PARTITIONS: int = 16
 
     @property
     @abstractmethod
@@ -34,11 +48,54 @@ class BaseConfig(ABC):
         """
         pass
 
+    # --- Конфигурация реплик PostgreSQL только для чтения ---
+    DB_REPLICA_HOSTS: tuple[str, ...] = ()
+    # Сколько секунд после пишущего запроса клиент читает с основной базы
+    DB_REPLICA_STICKINESS_SECONDS: int = 5
+    # Время жизни в кеше результатов, прочитанных с реплики: не больше допустимого отставания,
+    # иначе чтение, записанное в кеш после инвалидации, надолго переживёт запись
+    DB_REPLICA_CACHE_EXPIRE_SECONDS: int = 5
+    # Как часто перепроверяется доступность реплики
+    DB_REPLICA_HEALTHCHECK_INTERVAL_SECONDS: int = 10
+    DB_REPLICA_HEALTHCHECK_TIMEOUT_SECONDS: float = 1.0
+
+    # --- Конфигурация шардов PostgreSQL (компании распределяются по базам) ---
+    # Основная база — шард 0; хосты дополнительных шардов добавляются только в конец списка,
+    # иначе консистентное хеширование перераспределит компании существующих шардов
+    DB_SHARD_HOSTS: tuple[str, ...] = ()
+    # Число виртуальных узлов шарда на кольце консистентного хеширования
+    DB_SHARD_VIRTUAL_NODES: int = 64
+
     # --- Конфигурация сервиса Redis ---
     REDIS_DRIVER: str = "redis"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_CACHE_EXPIRE_SECONDS: int = 3600
+    # Ретрансляция событий инвалидации кеша из таблицы cache_outbox
+    CACHE_OUTBOX_BATCH_SIZE: int = 500
+    CACHE_OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    # Объединение точечных чтений по ID из конкурентных запросов: размер пакета и окно ожидания
+    LOOKUP_BATCH_MAX_SIZE: int = 100
+    LOOKUP_BATCH_MAX_WAIT_SECONDS: float = 0.0005
+    # Фильтр Блума по ID компаний: ожидаемое число компаний, доля ложных срабатываний,
+    # предельный размер в памяти, интервалы дозагрузки новых компаний и полной перестройки
+    COMPANY_FILTER_CAPACITY: int = 1_000_000
+    COMPANY_FILTER_FALSE_POSITIVE_RATE: float = 0.001
+    COMPANY_FILTER_MAX_BYTES: int = 8 * 1024 * 1024
+    COMPANY_FILTER_REFRESH_INTERVAL_SECONDS: float = 1.0
+    COMPANY_FILTER_REBUILD_INTERVAL_SECONDS: float = 600.0
+    # Поток изменений (SSE): число последних событий для продолжения по Last-Event-ID,
+    # очередь подключения (при переполнении медленный клиент отключается), интервал keepalive
+    CHANGE_STREAM_BUFFER_SIZE: int = 1000
+    CHANGE_STREAM_QUEUE_SIZE: int = 256
+    CHANGE_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    # Отложенная запись цен (write-behind): интервал сброса, порог досрочного сброса
+    # и предел буфера, после которого обновления отклоняются
+    PRICE_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 0.2
+    PRICE_WRITE_BEHIND_FLUSH_THRESHOLD: int = 1000
+    PRICE_WRITE_BEHIND_MAX_PENDING: int = 100_000
+    # Статистика цен компании: число самых далёких от среднего выбросов в ответе
+    PRICE_STATS_OUTLIERS_LIMIT: int = 100
 
     @property
     @abstractmethod
@@ -57,6 +114,26 @@ class BaseConfig(ABC):
         """
         return f"{self.DB_ASYNC_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def DB_REPLICA_URLS(self) -> list[str]:
+        """
+        Формирует URL для подключения к репликам базы данных.
+        """
+        return [
+            f"{self.DB_ASYNC_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{host}:{self.DB_PORT}/{self.DB_NAME}"
+            for host in self.DB_REPLICA_HOSTS
+        ]
+
+    @property
+    def DB_SHARD_URLS(self) -> list[str]:
+        """
+        Формирует URL для подключения к дополнительным шардам базы данных.
+        """
+        return [
+            f"{self.DB_ASYNC_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{host}:{self.DB_PORT}/{self.DB_NAME}"
+            for host in self.DB_SHARD_HOSTS
+        ]
+
     @property
     def ALEMBIC_DB_URL(self) -> str:
         """
@@ -64,6 +141,16 @@ class BaseConfig(ABC):
         """
         return f"{self.DB_SYNC_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def ALEMBIC_SHARD_URLS(self) -> list[str]:
+        """
+        Формирует URL для Alembic по всем шардам (шард 0 — основная база).
+        """
+        return [self.ALEMBIC_DB_URL] + [
+            f"{self.DB_SYNC_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{host}:{self.DB_PORT}/{self.DB_NAME}"
+            for host in self.DB_SHARD_HOSTS
+        ]
+
 
 class DevelopmentConfig(BaseConfig):
     """
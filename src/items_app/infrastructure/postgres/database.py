@@ -1,6 +1,32 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from items_app.infrastructure.config import config
+from items_app.infrastructure.postgres.replicas import ReplicaRouter
+from items_app.infrastructure.postgres.shards import Shard, ShardRouter
 
 
 engine = create_async_engine(config.DB_URL, echo=True)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+
+replica_engines = [
+    create_async_engine(url, echo=True, pool_pre_ping=True)
+    for url in config.DB_REPLICA_URLS
+]
+replica_async_sessions = [
+    async_sessionmaker(replica_engine, expire_on_commit=False)
+    for replica_engine in replica_engines
+]
+replica_router = ReplicaRouter(primary=async_session, replicas=replica_async_sessions)
+
+# Основная база с репликами — шард 0; дополнительные шарды пока без реплик
+shard_engines = [create_async_engine(url, echo=True) for url in config.DB_SHARD_URLS]
+shard_router = ShardRouter(
+    [Shard("shard-0", engine, replica_router)]
+    + [
+        Shard(
+            f"shard-{index}",
+            shard_engine,
+            ReplicaRouter(primary=async_sessionmaker(shard_engine, expire_on_commit=False)),
+        )
+        for index, shard_engine in enumerate(shard_engines, start=1)
+    ]
+)
@@ -0,0 +1,45 @@
+from typing import Any, List, Sequence, Union
+from sqlalchemy import ColumnElement, any_, bindparam
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.config import config
+
+# Колонка в выражении: атрибут модели (Item.id) или произвольное выражение Core
+Column = Union[ColumnElement[Any], InstrumentedAttribute[Any]]
+
+
+def is_postgresql(session: DbSession) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def dialect_insert(session: DbSession):
+    """
+    Возвращает конструктор INSERT с поддержкой ON CONFLICT для диалекта сессии.
+    В приложении используется PostgreSQL, в тестах — SQLite.
+    """
+    return pg_insert if is_postgresql(session) else sqlite_insert
+
+
+def in_values_batches(
+    session: DbSession,
+    column: Column,
+    values: Sequence[Any],
+    chunk_size: int = config.DB_IN_CLAUSE_CHUNK_SIZE,
+) -> List[ColumnElement]:
+    """
+    Условия «column входит в values», по одному на запрос.
+    В PostgreSQL весь список передаётся одним параметром-массивом (column = ANY(:values)),
+    поэтому размер запроса и время планирования не зависят от длины списка.
+    В остальных диалектах список режется на пакеты IN (...) не длиннее chunk_size,
+    чтобы не упереться в лимит параметров; пакеты выполняются в той же сессии подряд.
+    """
+    values = list(dict.fromkeys(values))
+    if is_postgresql(session):
+        array = bindparam(f"{column.key}_values", values, type_=ARRAY(column.type))
+        return [column == any_(array)]
+    return [
+        column.in_(values[start:start + chunk_size])
+        for start in range(0, len(values), chunk_size)
+    ]
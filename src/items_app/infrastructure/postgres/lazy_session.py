@@ -0,0 +1,92 @@
+import inspect
+from typing import Any, Awaitable, Callable, List, Optional, Protocol, Union
+from sqlalchemy import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+SessionFactory = Callable[[], Union[AsyncSession, Awaitable[AsyncSession]]]
+
+
+class DbSession(Protocol):
+    """Интерфейс сессии, которым пользуются репозитории: его реализуют AsyncSession и LazySession."""
+
+    def get_bind(self) -> Union[AsyncEngine, Engine, Connection]: ...
+
+    def add(self, instance: Any) -> None: ...
+
+    async def execute(self, statement: Any, params: Any = None) -> Any: ...
+
+    async def stream(self, statement: Any) -> Any: ...
+
+    async def commit(self) -> None: ...
+
+    async def rollback(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class LazySession:
+    """
+    Заместитель AsyncSession для репозиториев: настоящая сессия создаётся
+    (а реплика выбирается) только при первом обращении к БД.
+    Запрос, полностью обслуженный из кеша, не создаёт сессию и не берёт соединение из пула.
+    """
+
+    def __init__(self, factory: SessionFactory, bind: Union[AsyncEngine, Engine]):
+        self._factory = factory
+        # Диалект нужен репозиториям до первого запроса (dialect_insert, is_postgresql)
+        self._bind = bind
+        self._session: Optional[AsyncSession] = None
+        self._pending: List[Any] = []
+
+    @property
+    def is_acquired(self) -> bool:
+        return self._session is not None
+
+    async def _acquire(self) -> AsyncSession:
+        if self._session is None:
+            session = self._factory()
+            if inspect.isawaitable(session):
+                session = await session
+            # Объекты, добавленные до первого запроса, переносятся в настоящую сессию
+            session.add_all(self._pending)
+            self._pending.clear()
+            self._session = session
+        return self._session
+
+    def get_bind(self) -> Union[AsyncEngine, Engine, Connection]:
+        if self._session is not None:
+            return self._session.get_bind()
+        return self._bind
+
+    def add(self, instance: Any) -> None:
+        if self._session is not None:
+            self._session.add(instance)
+        else:
+            self._pending.append(instance)
+
+    async def execute(self, *args: Any, **kwargs: Any):
+        session = await self._acquire()
+        return await session.execute(*args, **kwargs)
+
+    async def stream(self, *args: Any, **kwargs: Any):
+        session = await self._acquire()
+        return await session.stream(*args, **kwargs)
+
+    async def commit(self) -> None:
+        if self._session is None and not self._pending:
+            return
+        session = await self._acquire()
+        await session.commit()
+
+    async def rollback(self) -> None:
+        if self._session is None:
+            self._pending.clear()
+            return
+        await self._session.rollback()
+
+    async def close(self) -> None:
+        self._pending.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
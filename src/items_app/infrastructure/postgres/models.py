@@ -1,7 +1,19 @@
+import time
 import uuid
-from sqlalchemy import ForeignKey
+from typing import Optional
+from sqlalchemy import (
+    BigInteger,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    String,
+    false,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
+from items_app.infrastructure.postgres.ids import uuid7
 
 
 class Base(DeclarativeBase):
@@ -11,22 +23,141 @@ class Base(DeclarativeBase):
 class Item(Base):
     __tablename__ = "items"
 
+    # ix_items_id не дублирует первичный ключ (company_id, id): он обслуживает поиск по ID
+    # без компании, в том числе проверку чужих ID при загрузке товаров.
+    # Уникальность самого ID обеспечивает реестр item_owners (см. ItemOwner)
     id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True
+        UUID(as_uuid=True), default=uuid7, index=True
     )
     title: Mapped[str]
     price: Mapped[float]
     company_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("companies.id")
+        UUID(as_uuid=True), ForeignKey("companies.id", ondelete="CASCADE")
     )
     company: Mapped["Company"] = relationship(back_populates="items")
+    # Unix-время и версия последнего изменения для инкрементальной синхронизации;
+    # версию задаёт репозиторий при каждой записи (см. ChangeLogRepo)
+    updated_at: Mapped[float] = mapped_column(Float, default=time.time, onupdate=time.time)
+    change_version: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    __table_args__ = (
+        # В PostgreSQL таблица секционирована по HASH(company_id), а первичный ключ
+        # секционированной таблицы обязан включать ключ секционирования
+        PrimaryKeyConstraint("company_id", "id", name="items_pkey"),
+        # Триграммный индекс для поиска по подстроке (ILIKE '%...%') в PostgreSQL
+        Index(
+            "ix_items_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        # Фильтрация и keyset-пагинация по цене внутри компании и по всему каталогу
+        Index("ix_items_company_id_price_id", "company_id", "price", "id"),
+        Index("ix_items_price_id", "price", "id"),
+        # Лента изменений по всему каталогу и по компании в порядке версий
+        Index("ix_items_change_version_id", "change_version", "id"),
+        Index("ix_items_company_id_change_version_id", "company_id", "change_version", "id"),
+    )
 
 
 class Company(Base):
     __tablename__ = "companies"
 
     id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True
+        UUID(as_uuid=True), primary_key=True, default=uuid7
     )
     name: Mapped[str]
-    items: Mapped[list["Item"]] = relationship(back_populates="company")
+    is_deleted: Mapped[bool] = mapped_column(default=False, server_default=false())
+    updated_at: Mapped[float] = mapped_column(Float, default=time.time, onupdate=time.time)
+    change_version: Mapped[int] = mapped_column(BigInteger, default=0)
+    items: Mapped[list["Item"]] = relationship(
+        back_populates="company", passive_deletes=True
+    )
+
+
+class ItemOwner(Base):
+    """
+    Реестр владельцев ID товаров: первичный ключ секционированной items — (company_id, id),
+    поэтому уникальность ID в шарде гарантирует эта таблица. Запись добавляется в транзакции
+    создания товара и остаётся после его удаления: ID не переходит к другой компании,
+    пока жива компания-владелец.
+    """
+
+    __tablename__ = "item_owners"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    company_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("companies.id", ondelete="CASCADE"), index=True
+    )
+
+
+class EntityCounter(Base):
+    """
+    Поддерживаемые инкрементально счётчики строк (всего товаров, товаров компании,
+    компаний), чтобы не выполнять COUNT(*) на каждый запрос страницы.
+    """
+
+    __tablename__ = "entity_counters"
+
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class CompanyStats(Base):
+    """
+    Агрегаты по товарам компании, обновляемые в транзакциях записи товаров.
+    Средняя цена вычисляется как price_sum / items_count.
+    """
+
+    __tablename__ = "company_stats"
+
+    company_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("companies.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    items_count: Mapped[int] = mapped_column(BigInteger, default=0)
+    price_sum: Mapped[float] = mapped_column(default=0)
+    min_price: Mapped[Optional[float]]
+    max_price: Mapped[Optional[float]]
+
+
+class CacheOutboxEvent(Base):
+    """
+    Событие инвалидации кеша (шаблон ключей), записываемое в транзакции изменения данных.
+    Удаляется ретранслятором только после применения к Redis (доставка at-least-once).
+    """
+
+    __tablename__ = "cache_outbox"
+
+    # В SQLite автоинкремент работает только для INTEGER PRIMARY KEY
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True
+    )
+    pattern: Mapped[str] = mapped_column(String)
+    # Unix-время записи события: по нему считается задержка ретрансляции
+    created_at: Mapped[float] = mapped_column(Float, default=time.time)
+
+
+class ItemTombstone(Base):
+    """
+    Надгробие удалённого товара: лента изменений отдаёт его как удаление.
+    Хранится отдельно от items, поэтому переживает и удаление компании.
+    """
+
+    __tablename__ = "item_tombstones"
+
+    company_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    change_version: Mapped[int] = mapped_column(BigInteger)
+    deleted_at: Mapped[float] = mapped_column(Float, default=time.time)
+
+    __table_args__ = (
+        Index("ix_item_tombstones_change_version_id", "change_version", "id"),
+        Index(
+            "ix_item_tombstones_company_id_change_version_id",
+            "company_id",
+            "change_version",
+            "id",
+        ),
+    )
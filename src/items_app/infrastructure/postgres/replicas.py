@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Sequence
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from items_app.infrastructure.config import config
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    Выдаёт сессии основной базы для записи и сессии реплик для чтения.
+    Реплики перебираются по кругу; недоступная реплика пропускается до следующей
+    проверки, а при отсутствии доступных реплик чтение идёт в основную базу.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replicas: Sequence[async_sessionmaker] = (),
+        healthcheck_interval: float = config.DB_REPLICA_HEALTHCHECK_INTERVAL_SECONDS,
+        healthcheck_timeout: float = config.DB_REPLICA_HEALTHCHECK_TIMEOUT_SECONDS,
+    ):
+        self._primary = primary
+        self._replicas = list(replicas)
+        self._healthcheck_interval = healthcheck_interval
+        self._healthcheck_timeout = healthcheck_timeout
+        self._healthy: List[bool] = [True] * len(self._replicas)
+        self._checked_at: List[Optional[float]] = [None] * len(self._replicas)
+        self._next_replica = 0
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._replicas)
+
+    def write_session(self) -> AsyncSession:
+        return self._primary()
+
+    async def read_session(self) -> AsyncSession:
+        for _ in range(len(self._replicas)):
+            index = self._next_replica
+            self._next_replica = (self._next_replica + 1) % len(self._replicas)
+            if await self._is_healthy(index):
+                return self._replicas[index]()
+        return self._primary()
+
+    async def _is_healthy(self, index: int) -> bool:
+        now = time.monotonic()
+        checked_at = self._checked_at[index]
+        if checked_at is None or now - checked_at >= self._healthcheck_interval:
+            # Отмечаем время до проверки, чтобы конкурентные запросы не проверяли реплику повторно
+            self._checked_at[index] = now
+            self._healthy[index] = await self._ping(self._replicas[index])
+        return self._healthy[index]
+
+    async def _ping(self, session_factory: async_sessionmaker) -> bool:
+        try:
+            async with session_factory() as session:
+                await asyncio.wait_for(
+                    session.execute(text("SELECT 1")), self._healthcheck_timeout
+                )
+            return True
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Replica is unavailable, reads fall back to primary: {e}")
+            return False
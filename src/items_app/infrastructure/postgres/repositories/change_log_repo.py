@@ -0,0 +1,158 @@
+import time
+from uuid import UUID
+from sqlalchemy import BigInteger, ColumnElement, Text, cast, func, literal, select, tuple_
+from items_app.infrastructure.postgres.dialects import Column, dialect_insert, is_postgresql
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.postgres.models import Item, ItemTombstone
+from items_app.infrastructure.postgres.repositories.counter_repo import CounterRepo
+from items_app.infrastructure.config import config
+from typing import Iterable, List, Optional, Tuple
+
+
+# Счётчик версий для диалектов без ID транзакций (SQLite в тестах)
+CHANGE_VERSION_SCOPE = "change_version"
+
+# Позиция клиента в ленте изменений: последняя полученная версия и ID внутри неё
+ChangePosition = Tuple[int, Optional[UUID]]
+
+
+def _as_bigint(xid8: ColumnElement) -> ColumnElement:
+    return cast(cast(xid8, Text), BigInteger)
+
+
+def after_position(
+    version_column: Column, id_column: Column, position: Optional[ChangePosition]
+) -> Optional[ColumnElement]:
+    if position is None:
+        return None
+    version, last_id = position
+    if last_id is None:
+        return version_column > version
+    return tuple_(version_column, id_column) > tuple_(literal(version), literal(last_id))
+
+
+class ChangeLogRepo:
+    """
+    Версии изменений и надгробия удалённых товаров для инкрементальной синхронизации.
+    В PostgreSQL версия — ID транзакции записи (xid8): все строки транзакции получают
+    одну версию, а лента отдаёт только версии меньше xmin снимка чтения, то есть
+    уже завершённых транзакций. Поэтому курсор клиента не обгоняет изменение,
+    которое ещё не зафиксировано, но получило меньшую версию.
+    В остальных диалектах запись сериализована, и версия — обычный счётчик.
+    Ошибки не перехватываются: их обрабатывает вызывающий репозиторий.
+    """
+
+    def __init__(self, async_session: DbSession):
+        self._session = async_session
+        self._counters = CounterRepo(async_session)
+
+    async def next_version(self) -> int:
+        if is_postgresql(self._session):
+            cursor = await self._session.execute(select(_as_bigint(func.pg_current_xact_id())))
+            return cursor.scalar_one()
+        await self._counters.increment({CHANGE_VERSION_SCOPE: 1})
+        return await self._counters.get(CHANGE_VERSION_SCOPE)
+
+    @staticmethod
+    def _horizon() -> ColumnElement:
+        # Все транзакции с версией меньше горизонта завершены
+        return _as_bigint(func.pg_snapshot_xmin(func.pg_current_snapshot()))
+
+    def visible_versions(self, version_column: Column) -> Optional[ColumnElement]:
+        """Условие «версия принадлежит завершённой транзакции» или None, если оно не нужно."""
+        if not is_postgresql(self._session):
+            return None
+        return version_column < self._horizon()
+
+    async def get_company_data_version(self, company_id: UUID) -> Tuple[int, bool]:
+        """
+        Версия данных товаров компании: наибольшая версия её товаров и надгробий.
+        Второй элемент — версия устоялась (незавершённых транзакций с меньшей версией нет):
+        только тогда посчитанное по ней можно кешировать под этой версией.
+        """
+        columns: List[ColumnElement] = [
+            func.coalesce(
+                select(func.max(Item.change_version))
+                .where(Item.company_id == company_id)
+                .scalar_subquery(),
+                0,
+            ),
+            func.coalesce(
+                select(func.max(ItemTombstone.change_version))
+                .where(ItemTombstone.company_id == company_id)
+                .scalar_subquery(),
+                0,
+            ),
+        ]
+        if is_postgresql(self._session):
+            columns.append(self._horizon())
+        row = (await self._session.execute(select(*columns))).one()
+        version = max(row[0], row[1])
+        return version, len(row) == 2 or version < row[2]
+
+    async def add_tombstones(
+        self,
+        deleted: Iterable[Tuple[UUID, UUID]],
+        version: int,
+        chunk_size: int = config.DB_INGEST_CHUNK_SIZE,
+    ) -> None:
+        """Записывает надгробия для пар (company_id, item_id)."""
+        deleted_at = time.time()
+        rows = [
+            {"company_id": company_id, "id": item_id, "change_version": version, "deleted_at": deleted_at}
+            for company_id, item_id in deleted
+        ]
+        insert = dialect_insert(self._session)
+        for start in range(0, len(rows), chunk_size):
+            stmt = insert(ItemTombstone).values(rows[start:start + chunk_size])
+            # Повторно удалённый (после повторной вставки) товар получает новую версию
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ItemTombstone.company_id, ItemTombstone.id],
+                set_={
+                    "change_version": stmt.excluded.change_version,
+                    "deleted_at": stmt.excluded.deleted_at,
+                },
+            )
+            await self._session.execute(stmt)
+
+    async def add_company_tombstones(self, company_id: UUID, version: int) -> None:
+        """Надгробия для всех товаров компании перед их удалением по ON DELETE CASCADE."""
+        insert = dialect_insert(self._session)
+        stmt = insert(ItemTombstone).from_select(
+            ["company_id", "id", "change_version", "deleted_at"],
+            select(Item.company_id, Item.id, literal(version, BigInteger), literal(time.time())).where(
+                Item.company_id == company_id
+            ),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ItemTombstone.company_id, ItemTombstone.id],
+            set_={
+                "change_version": stmt.excluded.change_version,
+                "deleted_at": stmt.excluded.deleted_at,
+            },
+        )
+        await self._session.execute(stmt)
+
+    async def get_tombstones(
+        self,
+        after: Optional[ChangePosition],
+        limit: int,
+        company_id: Optional[UUID] = None,
+    ) -> List[Tuple[int, UUID, UUID, float]]:
+        stmt = select(
+            ItemTombstone.change_version,
+            ItemTombstone.id,
+            ItemTombstone.company_id,
+            ItemTombstone.deleted_at,
+        )
+        conditions = (
+            ItemTombstone.company_id == company_id if company_id else None,
+            after_position(ItemTombstone.change_version, ItemTombstone.id, after),
+            self.visible_versions(ItemTombstone.change_version),
+        )
+        for condition in conditions:
+            if condition is not None:
+                stmt = stmt.where(condition)
+        stmt = stmt.order_by(ItemTombstone.change_version, ItemTombstone.id).limit(limit)
+        cursor = await self._session.execute(stmt)
+        return [tuple(row) for row in cursor]
@@ -1,9 +1,31 @@
 from uuid import UUID
-from sqlalchemy import select, delete
-from sqlalchemy.ext.asyncio import AsyncSession
+import numpy as np
+from sqlalchemy import func, select, delete, update
+from sqlalchemy.orm import aliased, contains_eager
 from sqlalchemy.exc import SQLAlchemyError
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.postgres.dialects import in_values_batches
 from items_app.infrastructure.postgres.models import Item, Company
-from typing import List, Optional
+from items_app.infrastructure.postgres.repositories.outbox_repo import OutboxRepo
+from items_app.infrastructure.postgres.repositories.counter_repo import (
+    CounterRepo,
+    COMPANIES_SCOPE,
+    ITEMS_SCOPE,
+    company_items_scope,
+)
+from items_app.infrastructure.postgres.repositories.company_stats_repo import (
+    CompanyStatsRepo,
+)
+from items_app.infrastructure.postgres.repositories.change_log_repo import ChangeLogRepo
+from items_app.infrastructure.postgres.rows import (
+    CompanyRow,
+    CompanyStatsRow,
+    CompanyWithItemsRow,
+    ItemRow,
+    COMPANY_ROW_COLUMNS,
+)
+from items_app.infrastructure.config import config
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
 import logging
 
 
@@ -11,12 +33,22 @@ logger = logging.getLogger(__name__)
 
 
 class CompanyRepo:
-    def __init__(self, async_session: AsyncSession):
+    def __init__(self, async_session: DbSession):
         self._session = async_session
+        self._counters = CounterRepo(async_session)
+        self._outbox = OutboxRepo(async_session)
+        self._stats = CompanyStatsRepo(async_session)
+        self._changes = ChangeLogRepo(async_session)
+
+    async def _drop_company_items_counter(self, company_id: UUID) -> None:
+        company_items_count = await self._counters.pop(company_items_scope(company_id))
+        await self._counters.increment({ITEMS_SCOPE: -company_items_count})
 
     async def add_company(self, company_data: Company) -> Company | None:
         try:
+            company_data.change_version = await self._changes.next_version()
             self._session.add(company_data)
+            await self._counters.increment({COMPANIES_SCOPE: 1})
             return company_data
         except SQLAlchemyError as e:
             await self._session.rollback()
@@ -25,7 +57,9 @@ class CompanyRepo:
 
     async def get_company_by_id(self, company_id: UUID) -> Company | None:
         try:
-            stmt = select(Company).where(Company.id == company_id)
+            stmt = select(Company).where(
+                Company.id == company_id, Company.is_deleted.is_(False)
+            )
             cursor = await self._session.execute(stmt)
             result = cursor.scalar_one_or_none()
             return result
@@ -33,18 +67,108 @@ class CompanyRepo:
             logger.error(f"Error of getting company: {e}")
             return None
 
+    async def get_companies_by_ids(self, company_ids: List[UUID]) -> List[CompanyRow] | None:
+        try:
+            result: List[CompanyRow] = []
+            for ids_condition in in_values_batches(self._session, Company.id, company_ids):
+                stmt = select(*COMPANY_ROW_COLUMNS).where(
+                    ids_condition, Company.is_deleted.is_(False)
+                )
+                cursor = await self._session.execute(stmt)
+                result.extend(CompanyRow(*row) for row in cursor)
+            return result
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting companies by ids: {e}")
+            return None
+
+    async def get_deleted_company_ids(
+        self, limit: int = config.COMPANY_PURGE_SWEEP_BATCH_SIZE
+    ) -> List[UUID] | None:
+        # Компании, помеченные удалёнными, но ещё не очищенные (например, после перезапуска)
+        try:
+            stmt = select(Company.id).where(Company.is_deleted.is_(True)).limit(limit)
+            return list((await self._session.execute(stmt)).scalars())
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting deleted company ids: {e}")
+            return None
+
+    async def stream_company_ids(
+        self, min_id: Optional[UUID] = None, yield_per: int = config.DB_STREAM_YIELD_PER
+    ) -> AsyncIterator[UUID]:
+        # ID действующих компаний серверным курсором; min_id отбирает новые UUIDv7
+        stmt = (
+            select(Company.id)
+            .where(Company.is_deleted.is_(False))
+            .execution_options(yield_per=yield_per)
+        )
+        if min_id:
+            stmt = stmt.where(Company.id >= min_id)
+        try:
+            result = await self._session.stream(stmt)
+            try:
+                async for company_id in result.scalars():
+                    yield company_id
+            finally:
+                await result.close()
+        except SQLAlchemyError as e:
+            logger.error(f"Error of streaming company ids: {e}")
+            raise
+
     async def get_all_companies(
         self, offset: Optional[int] = 0, limit: Optional[int] = 10
-    ) -> List[Company] | None:
+    ) -> List[CompanyRow] | None:
         try:
-            stmt = select(Company).offset(offset).limit(limit)
+            stmt = (
+                select(*COMPANY_ROW_COLUMNS)
+                .where(Company.is_deleted.is_(False))
+                # Однозначный порядок нужен для пагинации и слияния ответов шардов
+                .order_by(Company.id)
+                .offset(offset)
+                .limit(limit)
+            )
             cursor = await self._session.execute(stmt)
-            result = list(cursor.scalars().all())
+            result = [CompanyRow(*row) for row in cursor]
             return result or None
         except SQLAlchemyError as e:
             logger.error(f"Error of getting companies: {e}")
             return None
 
+    async def get_company_with_items(
+        self, company_id: UUID, offset: Optional[int] = None, limit: Optional[int] = None
+    ) -> CompanyWithItemsRow | None:
+        try:
+            # Страница товаров выбирается подзапросом и присоединяется к компании
+            # через Company.items, поэтому компания и её товары читаются одним запросом
+            items_page = (
+                select(Item)
+                .where(Item.company_id == company_id)
+                .order_by(Item.id)
+                .offset(offset)
+                .limit(limit)
+                .subquery()
+            )
+            page_item = aliased(Item, items_page)
+            stmt = (
+                select(Company)
+                .outerjoin(Company.items.of_type(page_item))
+                .where(Company.id == company_id, Company.is_deleted.is_(False))
+                .order_by(page_item.id)
+                .options(contains_eager(Company.items.of_type(page_item)))
+                .execution_options(populate_existing=True)
+            )
+            cursor = await self._session.execute(stmt)
+            company = cursor.unique().scalar_one_or_none()
+            if not company:
+                return None
+            items = [
+                ItemRow(item.id, item.title, item.price, item.company_id)
+                for item in company.items
+            ]
+            return CompanyWithItemsRow(company.id, company.name, items)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting company with items: {e}")
+            return None
+
     async def update_company_data(
         self, updated_company_data: Company
     ) -> Company | None:
@@ -54,6 +178,7 @@ class CompanyRepo:
                 return None
             else:
                 current_company.name = updated_company_data.name
+                current_company.change_version = await self._changes.next_version()
                 return current_company
         except SQLAlchemyError as e:
             await self._session.rollback()
@@ -66,17 +191,169 @@ class CompanyRepo:
             if not current_company:
                 return None
             else:
-                del_items_stmt = delete(Item).where(Item.company_id == company_id)
-                await self._session.execute(del_items_stmt)
-
+                # Товары компании удаляются базой по ON DELETE CASCADE,
+                # поэтому надгробия для ленты изменений пишутся заранее
+                await self._changes.add_company_tombstones(
+                    company_id, await self._changes.next_version()
+                )
                 del_company_stmt = delete(Company).where(Company.id == company_id)
                 await self._session.execute(del_company_stmt)
+                await self._counters.increment({COMPANIES_SCOPE: -1})
+                await self._drop_company_items_counter(company_id)
                 return True
         except SQLAlchemyError as e:
             await self._session.rollback()
             logger.error(f"Error of deleting company: {e}")
             return None
 
+    async def mark_company_deleted(self, company_id: UUID) -> bool | None:
+        try:
+            stmt = (
+                update(Company)
+                .where(Company.id == company_id, Company.is_deleted.is_(False))
+                .values(is_deleted=True, change_version=await self._changes.next_version())
+                .execution_options(synchronize_session=False)
+            )
+            result = await self._session.execute(stmt)
+            if not result.rowcount:
+                return None
+            await self._counters.increment({COMPANIES_SCOPE: -1})
+            return True
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of marking company deleted: {e}")
+            return None
+
+    async def count_items_of_company(self, company_id: UUID) -> int | None:
+        try:
+            return await self._counters.get(company_items_scope(company_id))
+        except SQLAlchemyError as e:
+            logger.error(f"Error of counting items of company: {e}")
+            return None
+
+    async def delete_items_batch_of_company(
+        self, company_id: UUID, batch_size: int
+    ) -> int | None:
+        try:
+            batch_stmt = select(Item.id).where(Item.company_id == company_id).limit(batch_size)
+            batch_ids = list((await self._session.execute(batch_stmt)).scalars())
+            deleted_ids: List[UUID] = []
+            for ids_condition in in_values_batches(self._session, Item.id, batch_ids):
+                stmt = (
+                    delete(Item)
+                    .where(Item.company_id == company_id, ids_condition)
+                    .returning(Item.id)
+                    .execution_options(synchronize_session=False)
+                )
+                deleted_ids.extend((await self._session.execute(stmt)).scalars())
+            if deleted_ids:
+                await self._changes.add_tombstones(
+                    ((company_id, item_id) for item_id in deleted_ids),
+                    await self._changes.next_version(),
+                )
+            await self._counters.increment(
+                {ITEMS_SCOPE: -len(deleted_ids), company_items_scope(company_id): -len(deleted_ids)}
+            )
+            return len(deleted_ids)
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of deleting items batch of company: {e}")
+            return None
+
+    async def remove_deleted_company(self, company_id: UUID) -> bool | None:
+        try:
+            deleted_company = select(Company.id).where(
+                Company.id == company_id, Company.is_deleted.is_(True)
+            )
+            if (await self._session.execute(deleted_company)).scalar_one_or_none() is None:
+                return None
+            # Оставшиеся товары удаляются по ON DELETE CASCADE
+            await self._changes.add_company_tombstones(
+                company_id, await self._changes.next_version()
+            )
+            stmt = delete(Company).where(
+                Company.id == company_id, Company.is_deleted.is_(True)
+            )
+            result = await self._session.execute(stmt)
+            if not result.rowcount:
+                return None
+            await self._drop_company_items_counter(company_id)
+            return True
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of removing deleted company: {e}")
+            return None
+
+    async def get_company_stats(self, company_id: UUID) -> CompanyStatsRow | None:
+        try:
+            return await self._stats.get(company_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting company stats: {e}")
+            return None
+
+    async def get_item_prices(self, company_id: UUID) -> np.ndarray | None:
+        try:
+            # Только колонка цены: значения сразу упаковываются в массив float64,
+            # без объектов ORM и промежуточного списка
+            stmt = select(Item.price).where(Item.company_id == company_id)
+            cursor = await self._session.execute(stmt)
+            return np.fromiter(cursor.scalars(), dtype=np.float64)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting item prices of company: {e}")
+            return None
+
+    async def get_price_outliers(
+        self, company_id: UUID, low: float, high: float, mean: float, limit: int
+    ) -> List[Tuple[UUID, float]] | None:
+        try:
+            stmt = (
+                select(Item.id, Item.price)
+                .where(
+                    Item.company_id == company_id,
+                    (Item.price < low) | (Item.price > high),
+                )
+                .order_by(func.abs(Item.price - mean).desc(), Item.id)
+                .limit(limit)
+            )
+            cursor = await self._session.execute(stmt)
+            return [tuple(row) for row in cursor]
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting price outliers of company: {e}")
+            return None
+
+    async def get_company_data_version(self, company_id: UUID) -> Tuple[int, bool] | None:
+        try:
+            return await self._changes.get_company_data_version(company_id)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting company data version: {e}")
+            return None
+
+    async def rebuild_company_stats(
+        self, company_id: Optional[UUID] = None
+    ) -> int | None:
+        try:
+            return await self._stats.rebuild(company_id)
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of rebuilding company stats: {e}")
+            return None
+
+    async def count_companies(self) -> int | None:
+        try:
+            return await self._counters.get(COMPANIES_SCOPE)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of counting companies: {e}")
+            return None
+
+    async def record_cache_invalidation(self, patterns: Iterable[str]) -> bool | None:
+        try:
+            self._outbox.add(patterns)
+            return True
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of recording cache invalidation: {e}")
+            return None
+
     async def commit(self) -> None:
         try:
             await self._session.commit()
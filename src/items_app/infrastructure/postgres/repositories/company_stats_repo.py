@@ -0,0 +1,165 @@
+from uuid import UUID
+from collections import defaultdict
+from sqlalchemy import select, delete, update, case, func, or_, text
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.postgres.dialects import dialect_insert, is_postgresql
+from items_app.infrastructure.postgres.models import Company, CompanyStats, Item
+from items_app.infrastructure.postgres.rows import CompanyStatsRow
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyStatsRepo:
+    """
+    Агрегаты компаний обновляются в той же сессии (и транзакции), что и товары.
+    Ошибки не перехватываются: их обрабатывает вызывающий репозиторий.
+    """
+
+    def __init__(self, async_session: DbSession):
+        self._session = async_session
+
+    async def apply(
+        self,
+        added: Iterable[Tuple[UUID, float]] = (),
+        removed: Iterable[Tuple[UUID, float]] = (),
+    ) -> None:
+        """
+        Учитывает добавленные и удалённые цены товаров (пары company_id, price).
+        Изменение цены передаётся как удаление старой и добавление новой.
+        Вызывается после записи самих товаров.
+        """
+        added_prices: Dict[UUID, List[float]] = defaultdict(list)
+        removed_prices: Dict[UUID, List[float]] = defaultdict(list)
+        for company_id, price in added:
+            added_prices[company_id].append(price)
+        for company_id, price in removed:
+            removed_prices[company_id].append(price)
+        # Сортировка по company_id задаёт одинаковый порядок блокировок строк во всех транзакциях
+        company_ids = sorted(set(added_prices) | set(removed_prices))
+        if not company_ids:
+            return
+
+        rows = []
+        for company_id in company_ids:
+            company_added = added_prices.get(company_id, [])
+            company_removed = removed_prices.get(company_id, [])
+            rows.append(
+                {
+                    "company_id": company_id,
+                    "items_count": len(company_added) - len(company_removed),
+                    "price_sum": sum(company_added) - sum(company_removed),
+                    "min_price": min(company_added, default=None),
+                    "max_price": max(company_added, default=None),
+                }
+            )
+        insert = dialect_insert(self._session)
+        stmt = insert(CompanyStats).values(rows)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CompanyStats.company_id],
+            set_={
+                "items_count": CompanyStats.items_count + excluded.items_count,
+                "price_sum": CompanyStats.price_sum + excluded.price_sum,
+                # NULL в excluded (нет добавленных цен) оставляет текущую границу
+                "min_price": case(
+                    (
+                        or_(
+                            CompanyStats.min_price.is_(None),
+                            excluded.min_price < CompanyStats.min_price,
+                        ),
+                        excluded.min_price,
+                    ),
+                    else_=CompanyStats.min_price,
+                ),
+                "max_price": case(
+                    (
+                        or_(
+                            CompanyStats.max_price.is_(None),
+                            excluded.max_price > CompanyStats.max_price,
+                        ),
+                        excluded.max_price,
+                    ),
+                    else_=CompanyStats.max_price,
+                ),
+            },
+        )
+        await self._session.execute(stmt)
+
+        if removed_prices:
+            await self._refresh_bounds(sorted(removed_prices))
+
+    async def _refresh_bounds(self, company_ids: List[UUID]) -> None:
+        # Удалённая цена могла быть границей: min/max пересчитываются по индексу
+        # (company_id, price, id) двумя поисками по индексу на компанию
+        min_price = (
+            select(func.min(Item.price))
+            .where(Item.company_id == CompanyStats.company_id)
+            .scalar_subquery()
+        )
+        max_price = (
+            select(func.max(Item.price))
+            .where(Item.company_id == CompanyStats.company_id)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(CompanyStats)
+            .where(CompanyStats.company_id.in_(company_ids))
+            .values(min_price=min_price, max_price=max_price)
+            .execution_options(synchronize_session=False)
+        )
+        await self._session.execute(stmt)
+
+    async def get(self, company_id: UUID) -> Optional[CompanyStatsRow]:
+        # У компании без товаров строки агрегатов может не быть — тогда нулевые значения
+        stmt = (
+            select(
+                Company.id,
+                func.coalesce(CompanyStats.items_count, 0),
+                func.coalesce(CompanyStats.price_sum, 0),
+                CompanyStats.min_price,
+                CompanyStats.max_price,
+            )
+            .outerjoin(CompanyStats, CompanyStats.company_id == Company.id)
+            .where(Company.id == company_id, Company.is_deleted.is_(False))
+        )
+        cursor = await self._session.execute(stmt)
+        row = cursor.one_or_none()
+        if row is None:
+            return None
+        company_id, items_count, price_sum, min_price, max_price = row
+        avg_price = price_sum / items_count if items_count else None
+        return CompanyStatsRow(company_id, items_count, min_price, max_price, avg_price)
+
+    async def rebuild(self, company_id: Optional[UUID] = None) -> int:
+        """Пересчитывает агрегаты с нуля по таблице items (всех компаний или одной)."""
+        if is_postgresql(self._session):
+            # Конкурентные записи ждут окончания пересчёта и применяют свои дельты поверх
+            await self._session.execute(
+                text("LOCK TABLE company_stats IN EXCLUSIVE MODE")
+            )
+        delete_stmt = delete(CompanyStats)
+        aggregates = (
+            select(
+                Company.id,
+                func.count(Item.id),
+                func.coalesce(func.sum(Item.price), 0),
+                func.min(Item.price),
+                func.max(Item.price),
+            )
+            .outerjoin(Item, Item.company_id == Company.id)
+            .where(Company.is_deleted.is_(False))
+            .group_by(Company.id)
+        )
+        if company_id:
+            delete_stmt = delete_stmt.where(CompanyStats.company_id == company_id)
+            aggregates = aggregates.where(Company.id == company_id)
+        await self._session.execute(delete_stmt)
+        insert_stmt = dialect_insert(self._session)(CompanyStats).from_select(
+            ["company_id", "items_count", "price_sum", "min_price", "max_price"],
+            aggregates,
+        )
+        result = await self._session.execute(insert_stmt)
+        return result.rowcount
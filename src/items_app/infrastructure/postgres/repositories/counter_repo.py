@@ -0,0 +1,68 @@
+from uuid import UUID
+from sqlalchemy import select, delete, text
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.postgres.dialects import dialect_insert, is_postgresql
+from items_app.infrastructure.postgres.models import EntityCounter
+from typing import Dict, Optional
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+ITEMS_SCOPE = "items"
+COMPANIES_SCOPE = "companies"
+
+
+def company_items_scope(company_id: UUID) -> str:
+    return f"{ITEMS_SCOPE}:company_id={company_id}"
+
+
+class CounterRepo:
+    """
+    Счётчики обновляются в той же сессии (и транзакции), что и изменяемые строки.
+    Ошибки не перехватываются: их обрабатывает вызывающий репозиторий.
+    """
+
+    def __init__(self, async_session: DbSession):
+        self._session = async_session
+
+    async def increment(self, deltas: Dict[str, int]) -> None:
+        # Сортировка по scope задаёт одинаковый порядок блокировок строк во всех транзакциях
+        rows = [
+            {"scope": scope, "count": delta}
+            for scope, delta in sorted(deltas.items())
+            if delta
+        ]
+        if not rows:
+            return
+        insert = dialect_insert(self._session)
+        stmt = insert(EntityCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EntityCounter.scope],
+            set_={"count": EntityCounter.count + stmt.excluded["count"]},
+        )
+        await self._session.execute(stmt)
+
+    async def get(self, scope: str) -> int:
+        stmt = select(EntityCounter.count).where(EntityCounter.scope == scope)
+        cursor = await self._session.execute(stmt)
+        return cursor.scalar_one_or_none() or 0
+
+    async def pop(self, scope: str) -> int:
+        stmt = (
+            delete(EntityCounter)
+            .where(EntityCounter.scope == scope)
+            .returning(EntityCounter.count)
+        )
+        cursor = await self._session.execute(stmt)
+        return cursor.scalar_one_or_none() or 0
+
+    async def estimate_table_rows(self, table_name: str) -> Optional[int]:
+        # Оценка планировщика PostgreSQL; для других диалектов недоступна
+        if not is_postgresql(self._session):
+            return None
+        stmt = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)")
+        cursor = await self._session.execute(stmt, {"table_name": table_name})
+        estimate = cursor.scalar_one_or_none()
+        # reltuples = -1, если таблица ещё ни разу не анализировалась
+        return estimate if estimate is not None and estimate >= 0 else None
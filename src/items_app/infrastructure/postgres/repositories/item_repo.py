@@ -1,31 +1,135 @@
 from uuid import UUID
-from sqlalchemy import select, delete
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    ColumnElement,
+    select,
+    delete,
+    exists,
+    update,
+    values,
+    column,
+    func,
+    case,
+    literal,
+    tuple_,
+    Float,
+    String,
+)
 from sqlalchemy.exc import SQLAlchemyError
-from items_app.infrastructure.postgres.models import Item
-from typing import List, Optional
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.postgres.dialects import (
+    dialect_insert,
+    in_values_batches,
+    is_postgresql,
+)
+from items_app.infrastructure.postgres.ids import uuid7
+from items_app.infrastructure.postgres.models import Company, Item, ItemOwner
+from items_app.infrastructure.postgres.rows import ItemChangeRow, ItemRow, ITEM_ROW_COLUMNS
+from items_app.infrastructure.postgres.repositories.outbox_repo import OutboxRepo
+from items_app.infrastructure.postgres.repositories.counter_repo import (
+    CounterRepo,
+    ITEMS_SCOPE,
+    company_items_scope,
+)
+from items_app.infrastructure.postgres.repositories.company_stats_repo import (
+    CompanyStatsRepo,
+)
+from items_app.infrastructure.postgres.repositories.change_log_repo import (
+    ChangeLogRepo,
+    ChangePosition,
+    after_position,
+)
+from items_app.infrastructure.config import config
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+from collections import Counter
+from itertools import islice
+import heapq
 import logging
+import time
 
 
 logger = logging.getLogger(__name__)
 
+# Допустимые сортировки списка товаров: колонка и признак обратного порядка
+ITEM_SORTS: Dict[Optional[str], Tuple[Optional[InstrumentedAttribute[Any]], bool]] = {
+    "price": (Item.price, False),
+    "-price": (Item.price, True),
+    "title": (Item.title, False),
+    "-title": (Item.title, True),
+}
+
+# Ключ порядка в поиске: префикс, (минус) сходство или длина названия, название, ID
+SearchRank = Tuple[int, float, str, UUID]
+
+
+
+def of_active_company() -> ColumnElement:
+    # Товары компании, помеченной удалённой, скрыты от чтений и записей до фоновой очистки
+    return ~exists().where(Company.id == Item.company_id, Company.is_deleted.is_(True))
+
+
+def of_registered_owner() -> ColumnElement:
+    # Поиск по ID без компании видит только строку владельца из реестра: строки-дубликаты,
+    # оставшиеся от загрузок до появления реестра, не дают двух результатов на один ID
+    return exists().where(ItemOwner.id == Item.id, ItemOwner.company_id == Item.company_id)
+
 
 class ItemRepo:
-    def __init__(self, async_session: AsyncSession):
+    def __init__(self, async_session: DbSession):
         self._session = async_session
+        self._counters = CounterRepo(async_session)
+        self._outbox = OutboxRepo(async_session)
+        self._stats = CompanyStatsRepo(async_session)
+        self._changes = ChangeLogRepo(async_session)
+
+    async def _increment_items_counters(
+        self, company_ids: Iterable[UUID], sign: int = 1
+    ) -> None:
+        per_company = Counter(company_ids)
+        deltas = {
+            company_items_scope(company_id): sign * count
+            for company_id, count in per_company.items()
+        }
+        deltas[ITEMS_SCOPE] = sign * sum(per_company.values())
+        await self._counters.increment(deltas)
+
+    async def is_company_active(self, company_id: UUID) -> bool | None:
+        try:
+            stmt = select(Company.id).where(
+                Company.id == company_id, Company.is_deleted.is_(False)
+            )
+            return (await self._session.execute(stmt)).scalar_one_or_none() is not None
+        except SQLAlchemyError as e:
+            logger.error(f"Error of checking company: {e}")
+            return None
 
     async def add_item(self, item_data: Item) -> Item | None:
         try:
+            item_data.change_version = await self._changes.next_version()
+            # ID нужен до flush, чтобы занять его в реестре в той же транзакции
+            if item_data.id is None:
+                item_data.id = uuid7()
             self._session.add(item_data)
+            self._session.add(ItemOwner(id=item_data.id, company_id=item_data.company_id))
+            await self._increment_items_counters([item_data.company_id])
+            await self._stats.apply(added=[(item_data.company_id, item_data.price)])
             return item_data
         except SQLAlchemyError as e:
             await self._session.rollback()
             logger.error(f"Error of adding item: {e}")
             return None
 
-    async def get_item_by_id(self, item_id: UUID) -> Item | None:
+    async def get_item_by_id(
+        self, item_id: UUID, company_id: Optional[UUID] = None
+    ) -> Item | None:
         try:
-            stmt = select(Item).where(Item.id == item_id)
+            # С company_id поиск идёт по первичному ключу (company_id, id) в одной секции
+            stmt = select(Item).where(Item.id == item_id, of_active_company())
+            if company_id:
+                stmt = stmt.where(Item.company_id == company_id)
+            else:
+                stmt = stmt.where(of_registered_owner())
             cursor = await self._session.execute(stmt)
             result = cursor.scalar_one_or_none()
             return result
@@ -33,76 +137,455 @@ class ItemRepo:
             logger.error(f"Error of getting item: {e}")
             return None
 
-    async def get_items_by_ids(self, item_ids: List[UUID]) -> List[Item] | None:
+    async def get_items_by_ids(
+        self, item_ids: List[UUID], company_id: Optional[UUID] = None
+    ) -> List[ItemRow] | None:
         try:
-            stmt = select(Item).where(Item.id.in_(item_ids))
-            cursor = await self._session.execute(stmt)
-            result = list(cursor.scalars().all())
+            result: List[ItemRow] = []
+            for ids_condition in in_values_batches(self._session, Item.id, item_ids):
+                stmt = select(*ITEM_ROW_COLUMNS).where(ids_condition, of_active_company())
+                if company_id:
+                    stmt = stmt.where(Item.company_id == company_id)
+                else:
+                    stmt = stmt.where(of_registered_owner())
+                cursor = await self._session.execute(stmt)
+                result.extend(ItemRow(*row) for row in cursor)
             return result or None
         except SQLAlchemyError as e:
             logger.error(f"Error of getting items by ids: {e}")
             return None
 
-    async def get_items_by_company_id(self, company_id: UUID) -> List[Item] | None:
+    async def get_existing_item_ids(self, item_ids: List[UUID]) -> List[UUID] | None:
+        # ID, существующие в любой компании: позволяет отличить чужой товар от отсутствующего
         try:
-            stmt = select(Item).where(Item.company_id == company_id)
+            result: List[UUID] = []
+            for ids_condition in in_values_batches(self._session, Item.id, item_ids):
+                cursor = await self._session.execute(
+                    select(Item.id).where(ids_condition, of_active_company())
+                )
+                result.extend(cursor.scalars())
+            return result
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting existing item ids: {e}")
+            return None
+
+    async def get_items_by_company_id(self, company_id: UUID) -> List[ItemRow] | None:
+        try:
+            stmt = select(*ITEM_ROW_COLUMNS).where(
+                Item.company_id == company_id, of_active_company()
+            )
             cursor = await self._session.execute(stmt)
-            result = list(cursor.scalars().all())
+            result = [ItemRow(*row) for row in cursor]
             return result or None
         except SQLAlchemyError as e:
             logger.error(f"Error of getting items by company id: {e}")
             return None
 
+    async def stream_items_by_company_id(
+        self, company_id: UUID, yield_per: int = config.DB_STREAM_YIELD_PER
+    ) -> AsyncIterator[ItemRow]:
+        # Серверный курсор: в памяти одновременно находится не больше yield_per строк
+        stmt = (
+            select(*ITEM_ROW_COLUMNS)
+            .where(Item.company_id == company_id, of_active_company())
+            .execution_options(yield_per=yield_per)
+        )
+        try:
+            result = await self._session.stream(stmt)
+            try:
+                async for row in result:
+                    yield ItemRow(*row)
+            finally:
+                await result.close()
+        except SQLAlchemyError as e:
+            logger.error(f"Error of streaming items by company id: {e}")
+            raise
+
     async def get_items(
-        self, offset: Optional[int] = 0, limit: Optional[int] = 10
-    ) -> List[Item] | None:
+        self,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 10,
+        *,
+        company_id: Optional[UUID] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+        after: Optional[Tuple[Any, UUID]] = None,
+    ) -> List[ItemRow] | None:
         try:
-            stmt = select(Item).offset(offset).limit(limit)
+            stmt = select(*ITEM_ROW_COLUMNS).where(of_active_company())
+            if company_id:
+                stmt = stmt.where(Item.company_id == company_id)
+            if min_price is not None:
+                stmt = stmt.where(Item.price >= min_price)
+            if max_price is not None:
+                stmt = stmt.where(Item.price <= max_price)
+
+            # ID добавляется в сортировку, чтобы порядок был однозначным для keyset-пагинации
+            sort_column, descending = ITEM_SORTS.get(sort, (None, False))
+            keyset_columns = (sort_column, Item.id) if sort_column is not None else (Item.id,)
+            if after is not None:
+                last_values = after if sort_column is not None else after[1:]
+                keyset = tuple_(*keyset_columns)
+                last_keyset = tuple_(*(literal(value) for value in last_values))
+                stmt = stmt.where(keyset < last_keyset if descending else keyset > last_keyset)
+                offset = None
+            stmt = stmt.order_by(
+                *(column.desc() if descending else column for column in keyset_columns)
+            )
+
+            stmt = stmt.offset(offset).limit(limit)
             cursor = await self._session.execute(stmt)
-            result = list(cursor.scalars().all())
+            result = [ItemRow(*row) for row in cursor]
             return result or None
         except SQLAlchemyError as e:
             logger.error(f"Error of getting items: {e}")
             return None
 
+    async def search_items(
+        self,
+        query: str,
+        company_id: Optional[UUID] = None,
+        prefix_only: bool = False,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 10,
+    ) -> List[ItemRow] | None:
+        ranked = await self.search_items_ranked(query, company_id, prefix_only, offset, limit)
+        return [item for _, item in ranked] if ranked is not None else None
+
+    async def search_items_ranked(
+        self,
+        query: str,
+        company_id: Optional[UUID] = None,
+        prefix_only: bool = False,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 10,
+    ) -> List[Tuple[SearchRank, ItemRow]] | None:
+        """
+        Найденные товары вместе с ключом их порядка в выдаче:
+        по нему сливаются упорядоченные ответы шардов.
+        """
+        try:
+            escaped_query = (
+                query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            )
+            prefix_pattern = f"{escaped_query}%"
+            pattern = prefix_pattern if prefix_only else f"%{escaped_query}%"
+            # Сначала совпадения по префиксу, затем более похожие (или более короткие) названия
+            prefix_rank = case((Item.title.ilike(prefix_pattern, escape="\\"), 0), else_=1)
+            similarity_rank: ColumnElement
+            if is_postgresql(self._session):
+                similarity_rank = -func.similarity(Item.title, query, type_=Float)
+            else:
+                similarity_rank = func.length(Item.title)
+            # В PostgreSQL ILIKE обслуживается триграммным индексом, в SQLite — lower() LIKE
+            stmt = select(*ITEM_ROW_COLUMNS, prefix_rank, similarity_rank).where(
+                Item.title.ilike(pattern, escape="\\"), of_active_company()
+            )
+            if company_id:
+                stmt = stmt.where(Item.company_id == company_id)
+            stmt = (
+                stmt.order_by(prefix_rank, similarity_rank, Item.title, Item.id)
+                .offset(offset)
+                .limit(limit)
+            )
+            cursor = await self._session.execute(stmt)
+            return [
+                ((prefix, similarity, title, item_id), ItemRow(item_id, title, price, company_id))
+                for item_id, title, price, company_id, prefix, similarity in cursor
+            ]
+        except SQLAlchemyError as e:
+            logger.error(f"Error of searching items: {e}")
+            return None
+
     async def update_item(self, updated_item_data: Item) -> Item | None:
         try:
-            current_item = await self.get_item_by_id(updated_item_data.id)
+            current_item = await self.get_item_by_id(
+                updated_item_data.id, company_id=updated_item_data.company_id
+            )
             if not current_item:
                 return None
             else:
+                previous_price = current_item.price
                 current_item.title = updated_item_data.title
                 current_item.price = updated_item_data.price
+                current_item.change_version = await self._changes.next_version()
+                if previous_price != current_item.price:
+                    await self._stats.apply(
+                        added=[(current_item.company_id, current_item.price)],
+                        removed=[(current_item.company_id, previous_price)],
+                    )
                 return current_item
         except SQLAlchemyError as e:
             await self._session.rollback()
             logger.error(f"Error of updating item: {e}")
             return None
 
-    async def delete_item_by_id(self, item_id: UUID) -> bool | None:
+    async def delete_item_by_id(
+        self, item_id: UUID, company_id: Optional[UUID] = None
+    ) -> bool | None:
         try:
-            current_item = await self.get_item_by_id(item_id)
-            if not current_item:
-                return None
+            # Один DELETE, ограниченный компанией; company_id позволяет отсечь лишние секции
+            stmt = delete(Item).where(Item.id == item_id, of_active_company())
+            if company_id:
+                stmt = stmt.where(Item.company_id == company_id)
             else:
-                stmt = delete(Item).where(Item.id == item_id)
-                await self._session.execute(stmt)
-                return True
+                stmt = stmt.where(of_registered_owner())
+            cursor = await self._session.execute(
+                stmt.returning(Item.company_id, Item.price)
+            )
+            deleted = cursor.one_or_none()
+            if not deleted:
+                return None
+            deleted_company_id, deleted_price = deleted
+            await self._changes.add_tombstones(
+                [(deleted_company_id, item_id)], await self._changes.next_version()
+            )
+            await self._increment_items_counters([deleted_company_id], sign=-1)
+            await self._stats.apply(removed=[(deleted_company_id, deleted_price)])
+            return True
         except SQLAlchemyError as e:
             await self._session.rollback()
             logger.error(f"Error of deleting item: {e}")
             return None
 
-    async def delete_items_by_ids(self, item_ids: List[UUID]) -> int | None:
+    async def delete_items_by_ids(
+        self, item_ids: List[UUID], company_id: Optional[UUID] = None
+    ) -> List[UUID] | None:
         try:
-            stmt = delete(Item).where(Item.id.in_(item_ids))
-            result = await self._session.execute(stmt)
-            return result.rowcount or None
+            deleted: List[Tuple[UUID, UUID, float]] = []
+            for ids_condition in in_values_batches(self._session, Item.id, item_ids):
+                stmt = delete(Item).where(ids_condition, of_active_company())
+                if company_id:
+                    stmt = stmt.where(Item.company_id == company_id)
+                else:
+                    stmt = stmt.where(of_registered_owner())
+                cursor = await self._session.execute(
+                    stmt.returning(Item.id, Item.company_id, Item.price)
+                )
+                deleted.extend(tuple(row) for row in cursor)
+            if deleted:
+                await self._changes.add_tombstones(
+                    ((company_id, item_id) for item_id, company_id, _ in deleted),
+                    await self._changes.next_version(),
+                )
+            await self._increment_items_counters(
+                (company_id for _, company_id, _ in deleted), sign=-1
+            )
+            await self._stats.apply(
+                removed=[(company_id, price) for _, company_id, price in deleted]
+            )
+            return [item_id for item_id, _, _ in deleted]
         except SQLAlchemyError as e:
             await self._session.rollback()
             logger.error(f"Error of deleting items: {e}")
             return None
 
+    async def bulk_update_items(
+        self, company_id: UUID, updates: List[Tuple[UUID, float, Optional[str]]]
+    ) -> List[UUID] | None:
+        try:
+            # Прежние цены нужны для пересчёта агрегатов компании
+            previous_prices: Dict[UUID, float] = {}
+            for ids_condition in in_values_batches(
+                self._session, Item.id, [item_id for item_id, _, _ in updates]
+            ):
+                cursor = await self._session.execute(
+                    select(Item.id, Item.price).where(
+                        Item.company_id == company_id, of_active_company(), ids_condition
+                    )
+                )
+                previous_prices.update(cursor.tuples().all())
+            change_version = await self._changes.next_version()
+            # Один UPDATE ... FROM (VALUES ...) на весь пакет, ограниченный company_id
+            new_values = (
+                values(
+                    column("id", PG_UUID(as_uuid=True)),
+                    column("price", Float),
+                    column("title", String),
+                    name="new_values",
+                )
+                .data(updates)
+                .cte("new_values")
+            )
+            stmt = (
+                update(Item)
+                .where(
+                    Item.id == new_values.c.id,
+                    Item.company_id == company_id,
+                    of_active_company(),
+                )
+                .values(
+                    price=new_values.c.price,
+                    title=func.coalesce(new_values.c.title, Item.title),
+                    change_version=change_version,
+                )
+                .returning(Item.id, Item.price)
+                .execution_options(synchronize_session=False)
+            )
+            cursor = await self._session.execute(stmt)
+            updated = cursor.all()
+            await self._stats.apply(
+                added=[(company_id, price) for _, price in updated],
+                removed=[(company_id, previous_prices[item_id]) for item_id, _ in updated],
+            )
+            return [item_id for item_id, _ in updated]
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of bulk updating items: {e}")
+            return None
+
+    async def upsert_items(
+        self, items_data: List[Dict[str, Any]]
+    ) -> List[Tuple[UUID, bool]] | None:
+        """Записанные товары: (ID, признак вставки — товара не было до загрузки)."""
+        try:
+            deleted_company_ids: Set[UUID] = set()
+            for ids_condition in in_values_batches(
+                self._session, Company.id, [item["company_id"] for item in items_data]
+            ):
+                cursor = await self._session.execute(
+                    select(Company.id).where(ids_condition, Company.is_deleted.is_(True))
+                )
+                deleted_company_ids.update(cursor.scalars())
+            items_data = [
+                item for item in items_data if item["company_id"] not in deleted_company_ids
+            ]
+            if not items_data:
+                return []
+
+            # Свободные ID занимаются в реестре владельцев; ID другой компании остаётся за ней.
+            # Параллельные загрузки одного ID упорядочивает первичный ключ реестра: вторая
+            # транзакция ждёт первую и видит её владельца. Порядок по ID исключает взаимные блокировки
+            insert = dialect_insert(self._session)
+            await self._session.execute(
+                insert(ItemOwner)
+                .values(
+                    sorted(
+                        ({"id": item["id"], "company_id": item["company_id"]} for item in items_data),
+                        key=lambda owner: owner["id"],
+                    )
+                )
+                .on_conflict_do_nothing(index_elements=[ItemOwner.id])
+            )
+            item_ids = [item["id"] for item in items_data]
+            owners: Dict[UUID, UUID] = {}
+            for ids_condition in in_values_batches(self._session, ItemOwner.id, item_ids):
+                cursor = await self._session.execute(
+                    select(ItemOwner.id, ItemOwner.company_id).where(ids_condition)
+                )
+                owners.update(cursor.tuples().all())
+            items_data = [item for item in items_data if owners[item["id"]] == item["company_id"]]
+            if not items_data:
+                return []
+
+            # Уже существующие товары нужны, чтобы отличить вставки от обновлений для счётчиков
+            # (а прежние цены — для пересчёта агрегатов компаний)
+            existing: Dict[UUID, Tuple[UUID, float]] = {}
+            for ids_condition in in_values_batches(
+                self._session, Item.id, [item["id"] for item in items_data]
+            ):
+                cursor = await self._session.execute(
+                    select(Item.id, Item.company_id, Item.price).where(
+                        ids_condition, of_registered_owner()
+                    )
+                )
+                existing.update(
+                    (item_id, (company_id, price)) for item_id, company_id, price in cursor
+                )
+            change_version, updated_at = await self._changes.next_version(), time.time()
+            items_data = [
+                {**item, "change_version": change_version, "updated_at": updated_at}
+                for item in items_data
+            ]
+            stmt = insert(Item).values(items_data)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Item.company_id, Item.id],
+                set_={
+                    "title": stmt.excluded.title,
+                    "price": stmt.excluded.price,
+                    "change_version": stmt.excluded.change_version,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            ).returning(Item.id, Item.company_id, Item.price)
+            cursor = await self._session.execute(stmt)
+            upserted = cursor.all()
+            await self._increment_items_counters(
+                company_id for item_id, company_id, _ in upserted if item_id not in existing
+            )
+            await self._stats.apply(
+                added=[(company_id, price) for _, company_id, price in upserted],
+                removed=[
+                    existing[item_id] for item_id, _, _ in upserted if item_id in existing
+                ],
+            )
+            return [(item_id, item_id not in existing) for item_id, _, _ in upserted]
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of upserting items: {e}")
+            return None
+
+    async def get_item_changes(
+        self,
+        after: Optional[ChangePosition],
+        limit: int,
+        company_id: Optional[UUID] = None,
+    ) -> List[ItemChangeRow] | None:
+        try:
+            # Текущие строки товаров и надгробия читаются по индексам (change_version, id)
+            # и сливаются в общем порядке версий
+            stmt = select(
+                Item.change_version, Item.id, Item.company_id, Item.title, Item.price, Item.updated_at
+            )
+            conditions = (
+                Item.company_id == company_id if company_id else None,
+                after_position(Item.change_version, Item.id, after),
+                self._changes.visible_versions(Item.change_version),
+            )
+            for condition in conditions:
+                if condition is not None:
+                    stmt = stmt.where(condition)
+            stmt = stmt.order_by(Item.change_version, Item.id).limit(limit)
+            cursor = await self._session.execute(stmt)
+            upserts = [
+                ItemChangeRow(version, "upsert", item_id, item_company_id, title, price, updated_at)
+                for version, item_id, item_company_id, title, price, updated_at in cursor
+            ]
+            tombstones = await self._changes.get_tombstones(after, limit, company_id=company_id)
+            deletes = [
+                ItemChangeRow(version, "delete", item_id, item_company_id, None, None, deleted_at)
+                for version, item_id, item_company_id, deleted_at in tombstones
+            ]
+            merged = heapq.merge(upserts, deletes, key=lambda change: (change.version, change.id))
+            return list(islice(merged, limit))
+        except SQLAlchemyError as e:
+            logger.error(f"Error of getting item changes: {e}")
+            return None
+
+    async def count_items(self, company_id: Optional[UUID] = None) -> int | None:
+        try:
+            scope = company_items_scope(company_id) if company_id else ITEMS_SCOPE
+            return await self._counters.get(scope)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of counting items: {e}")
+            return None
+
+    async def estimate_items_count(self) -> int | None:
+        try:
+            return await self._counters.estimate_table_rows(Item.__tablename__)
+        except SQLAlchemyError as e:
+            logger.error(f"Error of estimating items count: {e}")
+            return None
+
+    async def record_cache_invalidation(self, patterns: Iterable[str]) -> bool | None:
+        try:
+            self._outbox.add(patterns)
+            return True
+        except SQLAlchemyError as e:
+            await self._session.rollback()
+            logger.error(f"Error of recording cache invalidation: {e}")
+            return None
+
     async def commit(self) -> None:
         try:
             await self._session.commit()
@@ -0,0 +1,46 @@
+from sqlalchemy import select, delete, func
+from items_app.infrastructure.postgres.lazy_session import DbSession
+from items_app.infrastructure.postgres.models import CacheOutboxEvent
+from typing import Iterable, List, Optional
+
+
+class OutboxRepo:
+    """
+    События инвалидации кеша пишутся в той же сессии (и транзакции), что и данные.
+    Ошибки не перехватываются: их обрабатывает вызывающий код.
+    """
+
+    def __init__(self, async_session: DbSession):
+        self._session = async_session
+
+    def add(self, patterns: Iterable[str]) -> None:
+        for pattern in dict.fromkeys(patterns):
+            self._session.add(CacheOutboxEvent(pattern=pattern))
+
+    async def claim_batch(self, limit: int) -> List[CacheOutboxEvent]:
+        # SKIP LOCKED позволяет ретрансляторам нескольких экземпляров разбирать
+        # разные пакеты; в SQLite FOR UPDATE не используется
+        stmt = (
+            select(CacheOutboxEvent)
+            .order_by(CacheOutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        cursor = await self._session.execute(stmt)
+        return list(cursor.scalars().all())
+
+    async def delete(self, event_ids: List[int]) -> None:
+        stmt = (
+            delete(CacheOutboxEvent)
+            .where(CacheOutboxEvent.id.in_(event_ids))
+            .execution_options(synchronize_session=False)
+        )
+        await self._session.execute(stmt)
+
+    async def count_pending(self) -> int:
+        cursor = await self._session.execute(select(func.count(CacheOutboxEvent.id)))
+        return cursor.scalar_one()
+
+    async def oldest_created_at(self) -> Optional[float]:
+        cursor = await self._session.execute(select(func.min(CacheOutboxEvent.created_at)))
+        return cursor.scalar_one_or_none()
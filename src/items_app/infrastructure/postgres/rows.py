@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from uuid import UUID
+from items_app.infrastructure.postgres.models import Item, Company
+
+
+"""
+Лёгкие строки для read-only запросов.
+Не участвуют в identity map сессии и не несут состояния ORM,
+поэтому дешевле экземпляров моделей при выводе списков.
+"""
+
+
+@dataclass(slots=True)
+class ItemRow:
+    id: UUID
+    title: str
+    price: float
+    company_id: UUID
+
+
+@dataclass(slots=True)
+class CompanyRow:
+    id: UUID
+    name: str
+
+
+@dataclass(slots=True)
+class CompanyWithItemsRow:
+    id: UUID
+    name: str
+    items: List[ItemRow]
+
+
+@dataclass(slots=True)
+class CompanyStatsRow:
+    company_id: UUID
+    items_count: int
+    min_price: Optional[float]
+    max_price: Optional[float]
+    avg_price: Optional[float]
+
+
+@dataclass(slots=True)
+class ItemChangeRow:
+    """Изменение товара в ленте: upsert с текущими данными или delete (надгробие)."""
+
+    version: int
+    op: str
+    id: UUID
+    company_id: UUID
+    title: Optional[str]
+    price: Optional[float]
+    updated_at: float
+
+
+# Порядок колонок совпадает с порядком полей строк
+ITEM_ROW_COLUMNS = (Item.id, Item.title, Item.price, Item.company_id)
+COMPANY_ROW_COLUMNS = (Company.id, Company.name)
@@ -0,0 +1,67 @@
+import bisect
+import hashlib
+from typing import List, Optional, Sequence, Union
+from uuid import UUID
+from sqlalchemy import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from items_app.infrastructure.postgres.replicas import ReplicaRouter
+from items_app.infrastructure.config import config
+
+
+def _ring_hash(value: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "big")
+
+
+class Shard:
+    """База данных шарда: движок (для диалекта) и маршрутизатор основной базы и реплик."""
+
+    def __init__(
+        self, name: str, bind: Union[AsyncEngine, Engine], replicas: ReplicaRouter
+    ):
+        self.name = name
+        self.bind = bind
+        self.replicas = replicas
+
+    def __repr__(self) -> str:
+        return f"Shard(name={self.name!r})"
+
+
+class ShardRouter:
+    """
+    Назначает каждой компании один шард консистентным хешированием company_id.
+    Компания хранится в одном шарде вместе со всеми своими товарами, агрегатами,
+    счётчиками и событиями outbox, поэтому запросы в рамках компании не выходят за шард.
+    Шард на кольце определяется именем: добавление шарда в конец списка переносит
+    около 1/N компаний (перенос их данных выполняется отдельно).
+    Запросы без компании идут в шард 0.
+    """
+
+    def __init__(
+        self,
+        shards: Sequence[Shard],
+        virtual_nodes: int = config.DB_SHARD_VIRTUAL_NODES,
+    ):
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self._shards = list(shards)
+        ring = sorted(
+            (_ring_hash(f"{shard.name}#{node}".encode()), index)
+            for index, shard in enumerate(self._shards)
+            for node in range(virtual_nodes)
+        )
+        self._ring_hashes = [ring_hash for ring_hash, _ in ring]
+        self._ring_shards = [index for _, index in ring]
+
+    @property
+    def shards(self) -> List[Shard]:
+        return list(self._shards)
+
+    @property
+    def is_sharded(self) -> bool:
+        return len(self._shards) > 1
+
+    def shard_for(self, company_id: Optional[UUID]) -> Shard:
+        if company_id is None or not self.is_sharded:
+            return self._shards[0]
+        position = bisect.bisect(self._ring_hashes, _ring_hash(company_id.bytes))
+        return self._shards[self._ring_shards[position % len(self._ring_hashes)]]
@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 from items_app.infrastructure.redis.cache.async_client import AsyncRedisClient
 from items_app.infrastructure.redis.cache.base_serializer import BaseSerializer
 from items_app.infrastructure.config import config
@@ -27,6 +27,27 @@ class AsyncCacheManager:
             return None
         return self._serializer.loads(cached_value)
 
+    async def get_many(self, *keys: str) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        cached_values = await self._redis.mget(*keys)
+        return [
+            self._serializer.loads(value) if value is not None else None
+            for value in cached_values
+        ]
+
+    async def set_many(
+        self,
+        values: Dict[str, Any],
+        ex: Optional[int] = config.REDIS_CACHE_EXPIRE_SECONDS,
+    ) -> None:
+        if not values:
+            return
+        serialized_values = {
+            key: self._serializer.dumps(value) for key, value in values.items()
+        }
+        await self._redis.mset(serialized_values, ex)
+
     async def delete(self, *keys: str) -> int:
         return await self._redis.delete(*keys)
 
@@ -37,3 +58,17 @@ class AsyncCacheManager:
             async for key in matching_keys:
                 keys_to_delete.append(key)
         return await self._redis.delete(*keys_to_delete) if keys_to_delete else 0
+
+    async def increment(self, key: str, amount: int = 1) -> int:
+        return await self._redis.incrby(key, amount)
+
+    async def publish(self, channel: str, *values: Any) -> None:
+        if not values:
+            return
+        await self._redis.publish(
+            channel, *(self._serializer.dumps(value) for value in values)
+        )
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Any]:
+        async for message in self._redis.subscribe(channel):
+            yield self._serializer.loads(message)
@@ -1,4 +1,4 @@
-from typing import Optional, AsyncIterator
+from typing import Dict, List, Optional, AsyncIterator
 from redis.asyncio import Redis as AsyncRedis
 from items_app.infrastructure.config import config
 
@@ -18,8 +18,38 @@ class AsyncRedisClient:
     async def get(self, key: str) -> Optional[str]:
         return await self._client.get(name=key)
 
+    async def mget(self, *keys: str) -> List[Optional[str]]:
+        return await self._client.mget(keys)
+
+    async def mset(self, mapping: Dict[str, str], ex: Optional[int] = None) -> None:
+        # MSET не умеет задавать TTL: SET с EX отправляются одним пайплайном
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(name=key, value=value, ex=ex)
+            await pipe.execute()
+
     async def delete(self, *keys: str) -> int:
         return await self._client.delete(*keys)
 
     def scan_iter(self, match: str) -> AsyncIterator[str]:
         return self._client.scan_iter(match=match)
+
+    async def incrby(self, key: str, amount: int = 1) -> int:
+        return await self._client.incrby(name=key, amount=amount)
+
+    async def publish(self, channel: str, *messages: str) -> None:
+        async with self._client.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.publish(channel, message)
+            await pipe.execute()
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        # Подписка занимает отдельное соединение до выхода из итерации
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"]
+        finally:
+            await pubsub.aclose()
@@ -1,9 +1,17 @@
 import json
+from dataclasses import fields
 from uuid import UUID
-from typing import Any
+from typing import Any, Dict, Type
 from items_app.infrastructure.redis.cache.base_serializer import BaseSerializer
 from sqlalchemy.orm import DeclarativeBase
-from items_app.infrastructure.postgres import models
+from items_app.infrastructure.postgres import models, rows
+
+
+# Строки, которые кешируются и восстанавливаются по "__type__"; другие имена не декодируются
+CACHED_ROW_CLASSES = (rows.ItemRow, rows.CompanyRow, rows.CompanyWithItemsRow, rows.CompanyStatsRow)
+CACHED_ROW_TYPES: Dict[str, Type[Any]] = {
+    row_cls.__name__: row_cls for row_cls in CACHED_ROW_CLASSES
+}
 
 
 class JsonSerializer(BaseSerializer):
@@ -22,6 +30,11 @@ class JsonSerializer(BaseSerializer):
             data = {col.key: getattr(obj, col.key) for col in mapper.column_attrs}
             data["__type__"] = obj.__class__.__name__
             return data
+
+        if isinstance(obj, CACHED_ROW_CLASSES):
+            data = {field.name: getattr(obj, field.name) for field in fields(obj)}
+            data["__type__"] = obj.__class__.__name__
+            return data
         return obj
 
     def _object_hook(self, obj: dict) -> Any:
@@ -31,4 +44,7 @@ class JsonSerializer(BaseSerializer):
             if "__type__" in obj and hasattr(models, obj["__type__"]):
                 model_cls = getattr(models, obj["__type__"])
                 return model_cls(**{k: v for k, v in obj.items() if k != "__type__"})
+            if obj["__type__"] in CACHED_ROW_TYPES:
+                row_cls = CACHED_ROW_TYPES[obj["__type__"]]
+                return row_cls(**{k: v for k, v in obj.items() if k != "__type__"})
         return obj
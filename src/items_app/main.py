@@ -1,11 +1,41 @@
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn
+from items_app.api.middlewares import primary_stickiness_middleware
+from items_app.api.providers import (
+    run_cache_outbox_relay,
+    run_change_stream,
+    run_company_filter,
+    run_deleted_companies_sweep,
+    run_price_write_behind,
+)
 from items_app.api.routers.healthcheck_routers import router as healthcheck_routers
 from items_app.api.routers.companies_routers import router as companies_routers
 from items_app.api.routers.items_routers import router as items_routers
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = [
+        asyncio.create_task(run_cache_outbox_relay()),
+        asyncio.create_task(run_company_filter()),
+        asyncio.create_task(run_change_stream()),
+        asyncio.create_task(run_price_write_behind()),
+        asyncio.create_task(run_deleted_companies_sweep()),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.middleware("http")(primary_stickiness_middleware)
 
 app.include_router(healthcheck_routers)
 app.include_router(companies_routers)
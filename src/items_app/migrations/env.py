@@ -7,7 +7,15 @@ from sqlalchemy import pool
 from items_app.infrastructure.config import config as app_config
 from items_app.infrastructure.postgres.models import Base, Item, Company  # noqa: F401
 
-DATABASE_URL = app_config.ALEMBIC_DB_URL
+# Каждый шард мигрируется отдельно: alembic -x shard=N upgrade head
+_x_arguments = context.get_x_argument(as_dictionary=True)
+_shard = _x_arguments.get("shard")
+# DDL, не получивший блокировку за это время, падает вместо того, чтобы выстроить
+# за собой очередь из запросов приложения: alembic -x lock_timeout=30s upgrade head
+LOCK_TIMEOUT = _x_arguments.get("lock_timeout", "5s")
+DATABASE_URL = (
+    app_config.ALEMBIC_SHARD_URLS[int(_shard)] if _shard else app_config.ALEMBIC_DB_URL
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -69,7 +77,16 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        if connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+            connection.commit()
+        # Отдельная транзакция на ревизию: операции из online_ops фиксируют транзакцию
+        # ревизии и выполняются в autocommit, не затрагивая соседние ревизии
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+        )
 
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,343 @@
+"""
+Операции миграций для больших таблиц (items), не блокирующие запись на время работы:
+
+    from items_app.migrations.online_ops import (
+        create_index_concurrently,
+        add_column_with_backfill,
+    )
+
+Каждая операция выполняется в режиме autocommit короткими транзакциями, поэтому
+ревизию с ними нельзя откатить целиком: операции повторяемы, и прерванную миграцию
+нужно просто запустить заново. На других диалектах (SQLite в тестах) выполняются
+обычные операции Alembic.
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger("alembic.online_ops")
+
+PROGRESS_TABLE = "online_migration_progress"
+
+# Ограничение PostgreSQL на длину имени индекса и ограничения
+MAX_IDENTIFIER_LENGTH = 63
+
+
+# --- Вспомогательные запросы к каталогу PostgreSQL ---
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _partitions(table_name: str) -> List[str]:
+    """Партиции таблицы; пустой список — таблица не секционирована."""
+    rows = op.get_bind().execute(
+        sa.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table_name AND parent.relkind = 'p' "
+            "ORDER BY child.relname"
+        ),
+        {"table_name": table_name},
+    )
+    return [row[0] for row in rows]
+
+
+def _index_is_invalid(index_name: str) -> bool:
+    row = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = :index_name AND NOT pg_index.indisvalid"
+        ),
+        {"index_name": index_name},
+    ).first()
+    return row is not None
+
+
+def _index_is_attached(index_name: str) -> bool:
+    row = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_inherits JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid "
+            "WHERE pg_class.relname = :index_name"
+        ),
+        {"index_name": index_name},
+    ).first()
+    return row is not None
+
+
+def _constraint_exists(table_name: str, constraint_name: str) -> bool:
+    row = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_constraint JOIN pg_class ON pg_class.oid = pg_constraint.conrelid "
+            "WHERE pg_class.relname = :table_name AND pg_constraint.conname = :constraint_name"
+        ),
+        {"table_name": table_name, "constraint_name": constraint_name},
+    ).first()
+    return row is not None
+
+
+def _partition_object_name(partition: str, name: str) -> str:
+    return f"{partition}_{name}"[:MAX_IDENTIFIER_LENGTH]
+
+
+def _index_sql(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[str],
+    unique: bool,
+    using: Optional[str],
+    ops: Optional[Dict[str, str]],
+    concurrently: bool,
+    only: bool = False,
+) -> str:
+    column_list = ", ".join(
+        f"{column} {ops[column]}" if ops and column in ops else column for column in columns
+    )
+    return (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX "
+        f"{'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name} "
+        f"ON {'ONLY ' if only else ''}{table_name}"
+        f"{f' USING {using}' if using else ''} ({column_list})"
+    )
+
+
+# --- Индексы ---
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    postgresql_using: Optional[str] = None,
+    postgresql_ops: Optional[Dict[str, str]] = None,
+) -> None:
+    """
+    CREATE INDEX CONCURRENTLY вне транзакции миграции. Невалидный индекс,
+    оставшийся от прерванной попытки, удаляется и строится заново.
+    Для секционированной таблицы индекс создаётся на родителе (ON ONLY, без данных),
+    строится конкурентно на каждой партиции и подключается к родителю.
+    """
+    if not _is_postgresql():
+        op.create_index(index_name, table_name, list(columns), unique=unique)
+        return
+
+    with op.get_context().autocommit_block():
+        partitions = _partitions(table_name)
+        if not partitions:
+            if _index_is_invalid(index_name):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+            op.execute(
+                _index_sql(
+                    index_name, table_name, columns, unique,
+                    postgresql_using, postgresql_ops, concurrently=True,
+                )
+            )
+            return
+
+        # Индекс родителя остаётся невалидным, пока к нему не подключены индексы всех партиций
+        op.execute(
+            _index_sql(
+                index_name, table_name, columns, unique,
+                postgresql_using, postgresql_ops, concurrently=False, only=True,
+            )
+        )
+        for partition in partitions:
+            partition_index = _partition_object_name(partition, index_name)
+            if _index_is_attached(partition_index):
+                continue
+            if _index_is_invalid(partition_index):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {partition_index}")
+            op.execute(
+                _index_sql(
+                    partition_index, partition, columns, unique,
+                    postgresql_using, postgresql_ops, concurrently=True,
+                )
+            )
+            op.execute(f"ALTER INDEX {index_name} ATTACH PARTITION {partition_index}")
+            logger.info(f"Index {partition_index} is built and attached to {index_name}")
+
+
+def drop_index_concurrently(index_name: str, table_name: str) -> None:
+    """
+    DROP INDEX CONCURRENTLY вне транзакции миграции. Индекс секционированной таблицы
+    конкурентно удалить нельзя: DROP INDEX на родителе удаляет индексы партиций
+    под кратковременной блокировкой.
+    """
+    if not _is_postgresql():
+        op.drop_index(index_name, table_name=table_name)
+        return
+
+    with op.get_context().autocommit_block():
+        if _partitions(table_name):
+            op.execute(f"DROP INDEX IF EXISTS {index_name}")
+        else:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+# --- Заполнение колонок пакетами ---
+def _ensure_progress_table() -> None:
+    op.get_bind().execute(
+        sa.text(
+            f"CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} ("
+            "name VARCHAR PRIMARY KEY, "
+            "last_key VARCHAR, "
+            "rows_done BIGINT NOT NULL, "
+            "updated_at FLOAT NOT NULL)"
+        )
+    )
+
+
+def _load_progress(name: str) -> tuple:
+    row = op.get_bind().execute(
+        sa.text(f"SELECT last_key, rows_done FROM {PROGRESS_TABLE} WHERE name = :name"),
+        {"name": name},
+    ).first()
+    return (row[0], row[1]) if row else (None, 0)
+
+
+def _save_progress(name: str, last_key: str, rows_done: int) -> None:
+    bind = op.get_bind()
+    params = {"name": name, "last_key": last_key, "rows_done": rows_done, "updated_at": time.time()}
+    updated = bind.execute(
+        sa.text(
+            f"UPDATE {PROGRESS_TABLE} SET last_key = :last_key, rows_done = :rows_done, "
+            "updated_at = :updated_at WHERE name = :name"
+        ),
+        params,
+    )
+    if updated.rowcount == 0:
+        bind.execute(
+            sa.text(
+                f"INSERT INTO {PROGRESS_TABLE} (name, last_key, rows_done, updated_at) "
+                "VALUES (:name, :last_key, :rows_done, :updated_at)"
+            ),
+            params,
+        )
+
+
+def reset_backfill(name: str) -> None:
+    """Забывает прогресс заполнения (для downgrade ревизии)."""
+    with op.get_context().autocommit_block():
+        _ensure_progress_table()
+        op.get_bind().execute(
+            sa.text(f"DELETE FROM {PROGRESS_TABLE} WHERE name = :name"), {"name": name}
+        )
+
+
+def backfill_in_batches(
+    name: str,
+    table_name: str,
+    set_clause: str,
+    where: Optional[str] = None,
+    key_column: str = "id",
+    batch_size: int = 5_000,
+    pause_seconds: float = 0.1,
+) -> int:
+    """
+    UPDATE table_name SET set_clause пакетами по batch_size строк в порядке key_column,
+    каждый пакет — отдельная транзакция с паузой pause_seconds между ними, чтобы не
+    держать блокировки строк и не нагружать репликацию. Прогресс сохраняется в таблице
+    online_migration_progress под именем name: повторный запуск продолжает с последнего
+    ключа. Возвращает общее число обновлённых строк.
+    """
+    bind = op.get_bind()
+    condition = f" AND ({where})" if where else ""
+    # Ключи пакета выбираются уже с фильтром: строки вне него не занимают места в пакетах
+    # (и пауз), а UPDATE повторяет фильтр для строк, изменившихся между запросами
+    select_first = sa.text(
+        f"SELECT {key_column} FROM {table_name} WHERE TRUE{condition} "
+        f"ORDER BY {key_column} LIMIT :limit"
+    )
+    select_next = sa.text(
+        f"SELECT {key_column} FROM {table_name} WHERE {key_column} > :last_key{condition} "
+        f"ORDER BY {key_column} LIMIT :limit"
+    )
+    update_batch = sa.text(
+        f"UPDATE {table_name} SET {set_clause} WHERE {key_column} IN :keys{condition}"
+    ).bindparams(sa.bindparam("keys", expanding=True))
+
+    with op.get_context().autocommit_block():
+        _ensure_progress_table()
+        last_key, rows_done = _load_progress(name)
+        if last_key is not None:
+            logger.info(f"Backfill {name} resumes after {key_column}={last_key}")
+        while True:
+            if last_key is None:
+                cursor = bind.execute(select_first, {"limit": batch_size})
+            else:
+                cursor = bind.execute(select_next, {"last_key": last_key, "limit": batch_size})
+            keys = list(cursor.scalars())
+            if not keys:
+                break
+            rows_done += bind.execute(update_batch, {"keys": keys}).rowcount
+            last_key = str(keys[-1])
+            _save_progress(name, last_key, rows_done)
+            logger.info(f"Backfill {name}: {rows_done} rows updated, last {key_column}={last_key}")
+            if len(keys) < batch_size:
+                break
+            time.sleep(pause_seconds)
+    return rows_done
+
+
+# --- NOT NULL без долгой блокировки ---
+def set_not_null_online(table_name: str, column_name: str) -> None:
+    """
+    SET NOT NULL без полного сканирования таблицы под ACCESS EXCLUSIVE: сначала
+    CHECK (column IS NOT NULL) NOT VALID, затем VALIDATE (под SHARE UPDATE EXCLUSIVE,
+    запись не блокируется), после чего SET NOT NULL использует проверенное ограничение.
+    Для секционированной таблицы выполняется по партициям, затем на родителе.
+    """
+    if not _is_postgresql():
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.alter_column(column_name, nullable=False)
+        return
+
+    with op.get_context().autocommit_block():
+        partitions = _partitions(table_name)
+        for target in partitions or [table_name]:
+            constraint = _partition_object_name(target, f"{column_name}_not_null")
+            if not _constraint_exists(target, constraint):
+                op.execute(
+                    f"ALTER TABLE {target} ADD CONSTRAINT {constraint} "
+                    f"CHECK ({column_name} IS NOT NULL) NOT VALID"
+                )
+            op.execute(f"ALTER TABLE {target} VALIDATE CONSTRAINT {constraint}")
+            op.execute(f"ALTER TABLE {target} ALTER COLUMN {column_name} SET NOT NULL")
+            op.execute(f"ALTER TABLE {target} DROP CONSTRAINT {constraint}")
+        if partitions:
+            # Все партиции уже NOT NULL — родитель не сканирует данные
+            op.execute(f"ALTER TABLE {table_name} ALTER COLUMN {column_name} SET NOT NULL")
+
+
+def add_column_with_backfill(
+    table_name: str,
+    column: sa.Column,
+    backfill_expression: str,
+    key_column: str = "id",
+    batch_size: int = 5_000,
+    pause_seconds: float = 0.1,
+) -> None:
+    """
+    Замена op.add_column(..., nullable=False) для больших таблиц: колонка добавляется
+    допускающей NULL (без перезаписи таблицы), заполняется пакетами значением
+    backfill_expression и только затем получает NOT NULL, если он объявлен в column.
+    """
+    nullable = column.nullable
+    column.nullable = True
+    # Повторный запуск прерванной миграции продолжает заполнение уже добавленной колонки
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table_name)}
+    if column.name not in existing:
+        op.add_column(table_name, column)
+    backfill_in_batches(
+        f"{table_name}.{column.name}",
+        table_name,
+        f"{column.name} = {backfill_expression}",
+        where=f"{column.name} IS NULL",
+        key_column=key_column,
+        batch_size=batch_size,
+        pause_seconds=pause_seconds,
+    )
+    if not nullable:
+        set_not_null_online(table_name, column.name)
@@ -0,0 +1,52 @@
+"""0008 - Create 'company_stats' table
+
+Revision ID: 212323771c72
+Revises: 254fe3d18bee
+Create Date: 2026-10-19 13:31:09.218734
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "212323771c72"
+down_revision: Union[str, Sequence[str], None] = "254fe3d18bee"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "company_stats",
+        sa.Column("company_id", sa.UUID(), nullable=False),
+        sa.Column("items_count", sa.BigInteger(), nullable=False),
+        sa.Column("price_sum", sa.Float(), nullable=False),
+        sa.Column("min_price", sa.Float(), nullable=True),
+        sa.Column("max_price", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["company_id"],
+            ["companies.id"],
+            name="fk_company_stats_company_id_companies",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("company_id"),
+    )
+    # Начальные значения агрегатов по уже существующим данным
+    op.execute(
+        "INSERT INTO company_stats "
+        "(company_id, items_count, price_sum, min_price, max_price) "
+        "SELECT companies.id, count(items.id), coalesce(sum(items.price), 0), "
+        "min(items.price), max(items.price) "
+        "FROM companies LEFT JOIN items ON items.company_id = companies.id "
+        "WHERE NOT companies.is_deleted GROUP BY companies.id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("company_stats")
@@ -0,0 +1,48 @@
+"""0004 - Create 'entity_counters' table
+
+Revision ID: 221b54d97f6d
+Revises: 5ab2a1c5c072
+Create Date: 2026-10-19 11:02:17.804413
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "221b54d97f6d"
+down_revision: Union[str, Sequence[str], None] = "5ab2a1c5c072"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "entity_counters",
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("scope"),
+    )
+    # Начальные значения счётчиков по уже существующим данным
+    op.execute(
+        "INSERT INTO entity_counters (scope, count) "
+        "SELECT 'items', count(*) FROM items"
+    )
+    op.execute(
+        "INSERT INTO entity_counters (scope, count) "
+        "SELECT 'items:company_id=' || company_id::text, count(*) "
+        "FROM items GROUP BY company_id"
+    )
+    op.execute(
+        "INSERT INTO entity_counters (scope, count) "
+        "SELECT 'companies', count(*) FROM companies WHERE NOT is_deleted"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("entity_counters")
@@ -0,0 +1,132 @@
+"""0007 - Hash partitioning of 'items' by company_id
+
+Revision ID: 254fe3d18bee
+Revises: 3ebba39d7c67
+Create Date: 2026-10-19 12:58:31.402117
+
+Количество секций берётся из DB_ITEMS_PARTITIONS и может быть переопределено:
+    alembic -x items_partitions=32 upgrade head
+
+Данные переносятся одним INSERT ... SELECT под эксклюзивной блокировкой таблицы,
+поэтому миграцию следует выполнять в окно обслуживания.
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+
+from items_app.infrastructure.config import config as app_config
+
+
+# revision identifiers, used by Alembic.
+revision: str = "254fe3d18bee"
+down_revision: Union[str, Sequence[str], None] = "3ebba39d7c67"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ITEMS_COLUMNS = "id, title, price, company_id"
+
+
+def _partitions_count() -> int:
+    partitions = int(
+        context.get_x_argument(as_dictionary=True).get(
+            "items_partitions", app_config.DB_ITEMS_PARTITIONS
+        )
+    )
+    if partitions < 1:
+        raise ValueError("items_partitions must be a positive integer")
+    return partitions
+
+
+def _create_items_indexes() -> None:
+    op.create_index("ix_items_id", "items", ["id"], unique=False)
+    op.create_index(
+        "ix_items_title_trgm",
+        "items",
+        ["title"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_items_company_id_price_id",
+        "items",
+        ["company_id", "price", "id"],
+        unique=False,
+    )
+    op.create_index("ix_items_price_id", "items", ["price", "id"], unique=False)
+
+
+def _rename_old_items() -> None:
+    # Освобождаем имена таблицы, ограничений и индексов для новой таблицы
+    op.rename_table("items", "items_old")
+    op.execute("ALTER TABLE items_old RENAME CONSTRAINT items_pkey TO items_old_pkey")
+    op.execute(
+        "ALTER TABLE items_old RENAME CONSTRAINT fk_items_company_id_companies "
+        "TO fk_items_old_company_id_companies"
+    )
+    for index_name in (
+        "ix_items_id",
+        "ix_items_title_trgm",
+        "ix_items_company_id_price_id",
+        "ix_items_price_id",
+    ):
+        old_index_name = index_name.replace("ix_items_", "ix_items_old_")
+        op.execute(f"ALTER INDEX {index_name} RENAME TO {old_index_name}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    partitions = _partitions_count()
+    op.execute("LOCK TABLE items IN ACCESS EXCLUSIVE MODE")
+    _rename_old_items()
+
+    op.execute(
+        """
+        CREATE TABLE items (
+            id UUID NOT NULL,
+            title VARCHAR NOT NULL,
+            price FLOAT NOT NULL,
+            company_id UUID NOT NULL,
+            CONSTRAINT items_pkey PRIMARY KEY (company_id, id),
+            CONSTRAINT fk_items_company_id_companies FOREIGN KEY (company_id)
+                REFERENCES companies (id) ON DELETE CASCADE
+        ) PARTITION BY HASH (company_id)
+        """
+    )
+    for remainder in range(partitions):
+        op.execute(
+            f"CREATE TABLE items_p{remainder} PARTITION OF items "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        )
+
+    op.execute(f"INSERT INTO items ({ITEMS_COLUMNS}) SELECT {ITEMS_COLUMNS} FROM items_old")
+    op.drop_table("items_old")
+    # Индексы на секционированной таблице создаются в каждой секции
+    _create_items_indexes()
+    op.execute("ANALYZE items")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("LOCK TABLE items IN ACCESS EXCLUSIVE MODE")
+    _rename_old_items()
+
+    op.execute(
+        """
+        CREATE TABLE items (
+            id UUID NOT NULL,
+            title VARCHAR NOT NULL,
+            price FLOAT NOT NULL,
+            company_id UUID NOT NULL,
+            CONSTRAINT items_pkey PRIMARY KEY (id),
+            CONSTRAINT fk_items_company_id_companies FOREIGN KEY (company_id)
+                REFERENCES companies (id) ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute(f"INSERT INTO items ({ITEMS_COLUMNS}) SELECT {ITEMS_COLUMNS} FROM items_old")
+    # Вместе с родительской таблицей удаляются и все её секции
+    op.drop_table("items_old")
+    _create_items_indexes()
+    op.execute("ANALYZE items")
@@ -0,0 +1,35 @@
+"""0006 - Composite price indexes on 'items' for filtering and keyset pagination
+
+Revision ID: 3ebba39d7c67
+Revises: 5bd50d86c365
+Create Date: 2026-10-19 12:20:44.671092
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3ebba39d7c67"
+down_revision: Union[str, Sequence[str], None] = "5bd50d86c365"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_items_company_id_price_id",
+        "items",
+        ["company_id", "price", "id"],
+        unique=False,
+    )
+    op.create_index("ix_items_price_id", "items", ["price", "id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_items_price_id", table_name="items")
+    op.drop_index("ix_items_company_id_price_id", table_name="items")
@@ -0,0 +1,47 @@
+"""0003 - ON DELETE CASCADE for items.company_id and soft delete of companies
+
+Revision ID: 5ab2a1c5c072
+Revises: 855bdde3d2b0
+Create Date: 2026-10-19 10:12:41.519304
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5ab2a1c5c072"
+down_revision: Union[str, Sequence[str], None] = "855bdde3d2b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint("fk_items_company_id_companies", "items", type_="foreignkey")
+    op.create_foreign_key(
+        "fk_items_company_id_companies",
+        "items",
+        "companies",
+        ["company_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+    op.add_column(
+        "companies",
+        sa.Column(
+            "is_deleted", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("companies", "is_deleted")
+    op.drop_constraint("fk_items_company_id_companies", "items", type_="foreignkey")
+    op.create_foreign_key(
+        "fk_items_company_id_companies", "items", "companies", ["company_id"], ["id"]
+    )
@@ -0,0 +1,36 @@
+"""0005 - Trigram GIN index on 'items.title' for search
+
+Revision ID: 5bd50d86c365
+Revises: 221b54d97f6d
+Create Date: 2026-10-19 11:48:05.132876
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5bd50d86c365"
+down_revision: Union[str, Sequence[str], None] = "221b54d97f6d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_items_title_trgm",
+        "items",
+        ["title"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_items_title_trgm", table_name="items")
@@ -0,0 +1,61 @@
+"""0012 - Create 'item_owners' table
+
+Revision ID: 6c1f0e9a3b27
+Revises: dab6b842dbfb
+Create Date: 2026-10-19 21:12:40.517309
+
+Первичный ключ секционированной items — (company_id, id), поэтому один ID мог попасть
+в две компании (параллельные загрузки с ID клиента). Реестр владельцев делает ID
+уникальным. Если дубликаты уже есть, владельцем ID становится компания с наименьшим
+company_id; строки остальных компаний остаются доступны только по (company_id, id).
+"""
+
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "6c1f0e9a3b27"
+down_revision: Union[str, Sequence[str], None] = "dab6b842dbfb"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.item_owners")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "item_owners",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("company_id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["company_id"],
+            ["companies.id"],
+            name="fk_item_owners_company_id_companies",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_item_owners_company_id", "item_owners", ["company_id"], unique=False)
+
+    duplicated_ids = op.get_bind().execute(
+        sa.text("SELECT COUNT(*) FROM (SELECT id FROM items GROUP BY id HAVING COUNT(*) > 1) d")
+    ).scalar()
+    if duplicated_ids:
+        logger.warning(f"{duplicated_ids} item ids belong to several companies")
+    op.execute(
+        "INSERT INTO item_owners (id, company_id) "
+        "SELECT items.id, items.company_id FROM items "
+        "WHERE NOT EXISTS (SELECT 1 FROM items AS other "
+        "WHERE other.id = items.id AND other.company_id < items.company_id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_item_owners_company_id", table_name="item_owners")
+    op.drop_table("item_owners")
@@ -0,0 +1,30 @@
+"""0009 - Drop 'ix_companies_id' duplicating the companies primary key
+
+Revision ID: a47d2b098119
+Revises: 212323771c72
+Create Date: 2026-10-19 14:07:52.661380
+
+ix_items_id сохраняется: после секционирования первичный ключ items — (company_id, id),
+и поиск по одному ID обслуживается только этим индексом.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a47d2b098119"
+down_revision: Union[str, Sequence[str], None] = "212323771c72"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index("ix_companies_id", table_name="companies")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_companies_id", "companies", ["id"], unique=False)
@@ -0,0 +1,92 @@
+"""0011 - Change versions on 'items' and 'companies', 'item_tombstones' table
+
+Revision ID: dab6b842dbfb
+Revises: 587b8c60fde0
+Create Date: 2026-10-19 18:05:12.408213
+
+Колонки добавляются с постоянным значением по умолчанию: в PostgreSQL 11+ это
+изменение только каталога, без перезаписи таблицы, поэтому заполнять их пакетами
+не нужно. Индексы на секционированной items строятся конкурентно по партициям.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from items_app.migrations.online_ops import (
+    create_index_concurrently,
+    drop_index_concurrently,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = "dab6b842dbfb"
+down_revision: Union[str, Sequence[str], None] = "587b8c60fde0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANGED_TABLES = ("items", "companies")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name in CHANGED_TABLES:
+        op.add_column(
+            table_name,
+            sa.Column(
+                "updated_at",
+                sa.Float(),
+                nullable=False,
+                server_default=sa.text("extract(epoch from now())"),
+            ),
+        )
+        op.add_column(
+            table_name,
+            sa.Column("change_version", sa.BigInteger(), nullable=False, server_default="0"),
+        )
+        # Существующие строки сохраняют значения; новые получают их от приложения
+        op.alter_column(table_name, "updated_at", server_default=None)
+        op.alter_column(table_name, "change_version", server_default=None)
+
+    op.create_table(
+        "item_tombstones",
+        sa.Column("company_id", sa.UUID(), nullable=False),
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("change_version", sa.BigInteger(), nullable=False),
+        sa.Column("deleted_at", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("company_id", "id"),
+    )
+    op.create_index(
+        "ix_item_tombstones_change_version_id",
+        "item_tombstones",
+        ["change_version", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_item_tombstones_company_id_change_version_id",
+        "item_tombstones",
+        ["company_id", "change_version", "id"],
+        unique=False,
+    )
+
+    create_index_concurrently("ix_items_change_version_id", "items", ["change_version", "id"])
+    create_index_concurrently(
+        "ix_items_company_id_change_version_id",
+        "items",
+        ["company_id", "change_version", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_concurrently("ix_items_company_id_change_version_id", "items")
+    drop_index_concurrently("ix_items_change_version_id", "items")
+    op.drop_index(
+        "ix_item_tombstones_company_id_change_version_id", table_name="item_tombstones"
+    )
+    op.drop_index("ix_item_tombstones_change_version_id", table_name="item_tombstones")
+    op.drop_table("item_tombstones")
+    for table_name in CHANGED_TABLES:
+        op.drop_column(table_name, "change_version")
+        op.drop_column(table_name, "updated_at")
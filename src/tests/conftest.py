@@ -10,6 +10,12 @@ class FakeRedisClient:
     async def get(self, key):
         return self._store.get(key)
 
+    async def mget(self, *keys):
+        return [self._store.get(k) for k in keys]
+
+    async def mset(self, mapping, ex=None):
+        self._store.update(mapping)
+
     async def delete(self, *keys):
         count = 0
         for k in keys:
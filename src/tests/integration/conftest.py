@@ -1,11 +1,19 @@
 import pytest_asyncio
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 from httpx import ASGITransport, AsyncClient
 
 from items_app.main import app
-from items_app.api.providers import get_session
+from items_app.api.providers import (
+    get_session,
+    get_read_session,
+    get_session_factory,
+    get_shard_router,
+)
 from items_app.infrastructure.postgres.models import Base
+from items_app.infrastructure.postgres.replicas import ReplicaRouter
+from items_app.infrastructure.postgres.shards import Shard, ShardRouter
 from items_app.infrastructure.redis.cache.async_client import AsyncRedisClient
 
 # --- Настройка тестовой базы ---
@@ -18,6 +26,14 @@ engine = create_async_engine(
 TestingSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
+# --- SQLite по умолчанию не проверяет внешние ключи и не выполняет ON DELETE CASCADE ---
+@event.listens_for(engine.sync_engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 # --- Фикстура для инициализации тестовой БД ---
 @pytest_asyncio.fixture(scope="session", autouse=True)
 async def setup_database():
@@ -35,6 +51,13 @@ async def override_get_session():
 
 
 app.dependency_overrides[get_session] = override_get_session
+app.dependency_overrides[get_read_session] = override_get_session
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+# Один шард на тестовой базе: фоновые задачи по всем шардам тоже идут в неё
+testing_shard_router = ShardRouter(
+    [Shard("shard-0", engine, ReplicaRouter(primary=TestingSessionLocal))]
+)
+app.dependency_overrides[get_shard_router] = lambda: testing_shard_router
 
 
 # --- Фикстура отчисти БД и кеша перед каждым тестом ---
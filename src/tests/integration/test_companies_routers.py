@@ -1,7 +1,18 @@
+import json
 import uuid
 import pytest
-from items_app.infrastructure.postgres.models import Base
-from tests.integration.conftest import client
+from sqlalchemy import update
+from items_app.infrastructure.postgres.models import Base, Company, CompanyStats
+from items_app.infrastructure.redis.cache.async_client import AsyncRedisClient
+from items_app.main import app
+from items_app.api.providers import (
+    get_async_cache_manager,
+    get_company_filter,
+    get_json_serializer,
+    sweep_deleted_companies,
+)
+from items_app.application.company_filter.company_filter import CompanyExistenceFilter
+from tests.integration.conftest import client, TestingSessionLocal
 
 
 # --- Тесты ---
@@ -126,3 +137,349 @@ async def test_delete_company_not_found(client):
 async def test_delete_company_invalid_id(client):
     resp = await client.delete("/companies/invalid-uuid")
     assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_write_request_sets_primary_sticky_cookie(client):
+    create_resp = await client.post("/companies", json={"name": "Sticky Company"})
+    assert create_resp.status_code == 200
+    assert "db_primary_until" in create_resp.cookies
+
+    get_resp = await client.get("/companies")
+    assert "db_primary_until" not in get_resp.cookies
+
+
+@pytest.mark.asyncio
+async def test_get_company_with_items_paginated(client):
+    create_resp = await client.post("/companies", json={"name": "Catalog Company"})
+    company_id = create_resp.json()["company"]["id"]
+    for i in range(3):
+        await client.post(
+            "/items",
+            json={"title": f"Item{i}", "price": 1.0 + i, "company_id": company_id},
+        )
+
+    resp = await client.get(f"/companies/{company_id}/items", params={"limit": 2})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["id"] == company_id
+    assert data["name"] == "Catalog Company"
+    assert len(data["items"]) == 2
+
+    next_resp = await client.get(
+        f"/companies/{company_id}/items", params={"offset": 2, "limit": 2}
+    )
+    assert len(next_resp.json()["items"]) == 1
+    all_ids = {item["id"] for item in data["items"] + next_resp.json()["items"]}
+    assert len(all_ids) == 3
+
+    empty_page_resp = await client.get(
+        f"/companies/{company_id}/items", params={"offset": 10}
+    )
+    assert empty_page_resp.status_code == 200
+    assert empty_page_resp.json()["items"] == []
+
+
+@pytest.mark.asyncio
+async def test_get_company_with_items_not_found(client):
+    company_id = "123e4567-e89b-12d3-a456-426614174000"
+    resp = await client.get(f"/companies/{company_id}/items")
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == f"Company with company_id={company_id} not found"
+
+
+@pytest.mark.asyncio
+async def test_delete_company_cascades_to_items(client):
+    create_resp = await client.post("/companies", json={"name": "Cascade"})
+    company_id = create_resp.json()["company"]["id"]
+    item_resp = await client.post(
+        "/items", json={"title": "Item", "price": 1.0, "company_id": company_id}
+    )
+    item_id = item_resp.json()["item"]["id"]
+
+    del_resp = await client.delete(f"/companies/{company_id}")
+    assert del_resp.status_code == 200
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_delete_company_in_background(client):
+    create_resp = await client.post("/companies", json={"name": "Big Tenant"})
+    company_id = create_resp.json()["company"]["id"]
+    for i in range(3):
+        await client.post(
+            "/items",
+            json={"title": f"Item{i}", "price": 1.0, "company_id": company_id},
+        )
+
+    del_resp = await client.delete(
+        f"/companies/{company_id}", params={"mode": "background"}
+    )
+    assert del_resp.status_code == 200
+    assert del_resp.json()["progress"]["total_items"] == 3
+
+    get_resp = await client.get(f"/companies/{company_id}")
+    assert get_resp.status_code == 404
+
+    progress_resp = await client.get(f"/companies/{company_id}/deletion")
+    assert progress_resp.status_code == 200
+    assert progress_resp.json() == {
+        "status": "completed",
+        "deleted_items": 3,
+        "total_items": 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_items_of_soft_deleted_company_are_hidden_until_swept(client):
+    create_resp = await client.post("/companies", json={"name": "Interrupted"})
+    company_id = create_resp.json()["company"]["id"]
+    item_resp = await client.post(
+        "/items", json={"title": "Orphan", "price": 1.0, "company_id": company_id}
+    )
+    item_id = item_resp.json()["item"]["id"]
+    # Компания помечена удалённой, но фоновая очистка не выполнилась (например, перезапуск)
+    async with TestingSessionLocal() as session:
+        await session.execute(
+            update(Company).where(Company.id == uuid.UUID(company_id)).values(is_deleted=True)
+        )
+        await session.commit()
+
+    list_resp = await client.get("/items")
+    assert list_resp.json() == {"message": "No items in database"}
+    update_resp = await client.put(
+        f"/items/{item_id}", json={"title": "Revived", "price": 2.0, "company_id": company_id}
+    )
+    assert update_resp.status_code == 404
+    create_item_resp = await client.post(
+        "/items", json={"title": "New", "price": 1.0, "company_id": company_id}
+    )
+    assert create_item_resp.status_code == 404
+
+    cache = get_async_cache_manager(AsyncRedisClient(), get_json_serializer())
+    assert await sweep_deleted_companies([TestingSessionLocal], cache) == 1
+
+    async with TestingSessionLocal() as session:
+        assert await session.get(Company, uuid.UUID(company_id)) is None
+    progress_resp = await client.get(f"/companies/{company_id}/deletion")
+    assert progress_resp.json() == {"status": "completed", "deleted_items": 1, "total_items": 1}
+    assert await sweep_deleted_companies([TestingSessionLocal], cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_company_deletion_progress_not_found(client):
+    random_id = str(uuid.uuid4())
+    resp = await client.get(f"/companies/{random_id}/deletion")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_all_companies_with_total(client):
+    await client.post("/companies", json={"name": "First"})
+    create_resp = await client.post("/companies", json={"name": "Second"})
+    company_id = create_resp.json()["company"]["id"]
+
+    resp = await client.get("/companies", params={"limit": 1, "include_total": True})
+    assert resp.status_code == 200
+    assert len(resp.json()["companies"]) == 1
+    assert resp.json()["total"] == 2
+
+    await client.delete(f"/companies/{company_id}")
+    resp = await client.get("/companies", params={"include_total": True})
+    assert resp.json()["total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_company_with_items_total(client):
+    create_resp = await client.post("/companies", json={"name": "Counted"})
+    company_id = create_resp.json()["company"]["id"]
+    for i in range(3):
+        await client.post(
+            "/items",
+            json={"title": f"Item{i}", "price": 1.0, "company_id": company_id},
+        )
+
+    resp = await client.get(
+        f"/companies/{company_id}/items", params={"limit": 1, "include_total": True}
+    )
+    assert resp.status_code == 200
+    assert len(resp.json()["items"]) == 1
+    assert resp.json()["total_items"] == 3
+
+
+@pytest.mark.asyncio
+async def test_get_company_stats_follows_item_writes(client):
+    create_resp = await client.post("/companies", json={"name": "Stats"})
+    company_id = create_resp.json()["company"]["id"]
+
+    resp = await client.get(f"/companies/{company_id}/stats")
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "company_id": company_id,
+        "items_count": 0,
+        "min_price": None,
+        "max_price": None,
+        "avg_price": None,
+    }
+
+    item_ids = []
+    for price in (1.0, 2.0, 6.0):
+        item_resp = await client.post(
+            "/items", json={"title": "Item", "price": price, "company_id": company_id}
+        )
+        item_ids.append(item_resp.json()["item"]["id"])
+    resp = await client.get(f"/companies/{company_id}/stats")
+    assert resp.json()["items_count"] == 3
+    assert resp.json()["min_price"] == 1.0
+    assert resp.json()["max_price"] == 6.0
+    assert resp.json()["avg_price"] == 3.0
+
+    await client.put(
+        f"/items/{item_ids[0]}",
+        json={"title": "Item", "price": 4.0, "company_id": company_id},
+    )
+    await client.delete(f"/items/{item_ids[2]}", params={"company_id": company_id})
+    resp = await client.get(f"/companies/{company_id}/stats")
+    assert resp.json()["items_count"] == 2
+    assert resp.json()["min_price"] == 2.0
+    assert resp.json()["max_price"] == 4.0
+    assert resp.json()["avg_price"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_get_company_stats_follows_bulk_writes(client):
+    create_resp = await client.post("/companies", json={"name": "Bulk Stats"})
+    company_id = create_resp.json()["company"]["id"]
+    item_ids = []
+    for price in (1.0, 2.0, 3.0):
+        item_resp = await client.post(
+            "/items", json={"title": "Item", "price": price, "company_id": company_id}
+        )
+        item_ids.append(item_resp.json()["item"]["id"])
+
+    await client.patch(
+        "/items/bulk",
+        json={"company_id": company_id, "items": [{"item_id": item_ids[0], "price": 9.0}]},
+    )
+    await client.request(
+        "DELETE",
+        "/items/delete-many",
+        params={"company_id": company_id},
+        content=json.dumps({"item_ids": [item_ids[1]]}),
+    )
+    resp = await client.get(f"/companies/{company_id}/stats")
+    assert resp.json()["items_count"] == 2
+    assert resp.json()["min_price"] == 3.0
+    assert resp.json()["max_price"] == 9.0
+    assert resp.json()["avg_price"] == 6.0
+
+
+@pytest.mark.asyncio
+async def test_get_company_stats_not_found(client):
+    random_id = str(uuid.uuid4())
+    resp = await client.get(f"/companies/{random_id}/stats")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_reconcile_company_stats_rebuilds_from_items(client):
+    create_resp = await client.post("/companies", json={"name": "Drifted"})
+    company_id = create_resp.json()["company"]["id"]
+    for price in (2.0, 4.0):
+        await client.post(
+            "/items", json={"title": "Item", "price": price, "company_id": company_id}
+        )
+    async with TestingSessionLocal() as session:
+        await session.execute(
+            update(CompanyStats).values(items_count=100, price_sum=0, min_price=None)
+        )
+        await session.commit()
+
+    resp = await client.post("/companies/stats/reconcile")
+    assert resp.status_code == 202
+
+    resp = await client.get(f"/companies/{company_id}/stats")
+    assert resp.json()["items_count"] == 2
+    assert resp.json()["min_price"] == 2.0
+    assert resp.json()["avg_price"] == 3.0
+
+
+@pytest.mark.asyncio
+async def test_company_filter_rejects_unknown_companies(client):
+    existing_resp = await client.post("/companies", json={"name": "Existing"})
+    existing_id = existing_resp.json()["company"]["id"]
+    company_filter = CompanyExistenceFilter(capacity=100, false_positive_rate=1e-6)
+    await company_filter.rebuild(TestingSessionLocal)
+    app.dependency_overrides[get_company_filter] = lambda: company_filter
+    try:
+        unknown_resp = await client.get(f"/companies/{uuid.uuid4()}")
+        assert unknown_resp.status_code == 404
+        item_resp = await client.post(
+            "/items", json={"title": "Orphan", "price": 1.0, "company_id": str(uuid.uuid4())}
+        )
+        assert item_resp.status_code == 404
+        assert company_filter.metrics()["rejected"] == 2
+
+        # Компания, созданная после построения фильтра, видна сразу
+        created_resp = await client.post("/companies", json={"name": "Fresh"})
+        created_id = created_resp.json()["company"]["id"]
+        for company_id in (existing_id, created_id):
+            get_resp = await client.get(f"/companies/{company_id}")
+            assert get_resp.status_code == 200
+    finally:
+        app.dependency_overrides.pop(get_company_filter)
+
+
+@pytest.mark.asyncio
+async def test_get_company_price_stats_follows_item_writes(client):
+    resp = await client.post("/companies", json={"name": "Shop"})
+    company_id = resp.json()["company"]["id"]
+
+    resp = await client.get(f"/companies/{company_id}/price-stats")
+    assert resp.status_code == 200
+    assert resp.json()["items_count"] == 0
+    assert resp.json()["outliers"] == []
+
+    item_ids = []
+    for price in [10.0] * 20 + [1000.0]:
+        item_resp = await client.post(
+            "/items", json={"title": "Item", "price": price, "company_id": company_id}
+        )
+        item_ids.append(item_resp.json()["item"]["id"])
+
+    resp = await client.get(f"/companies/{company_id}/price-stats", params={"bins": 2})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["items_count"] == 21
+    assert data["quantiles"]["p50"] == 10.0
+    assert data["histogram"]["counts"] == [20, 1]
+    assert data["outliers_count"] == 1
+    assert data["outliers"][0]["item_id"] == item_ids[-1]
+    assert data["outliers"][0]["z_score"] > 3.0
+    first_version = data["data_version"]
+
+    # Запись товара меняет версию данных: закешированная статистика не возвращается
+    await client.put(
+        f"/items/{item_ids[-1]}",
+        json={"title": "Item", "price": 10.0, "company_id": company_id},
+    )
+    resp = await client.get(f"/companies/{company_id}/price-stats", params={"bins": 2})
+    data = resp.json()
+    assert data["data_version"] > first_version
+    assert data["outliers_count"] == 0
+    assert data["max_price"] == 10.0
+
+    await client.delete(f"/items/{item_ids[0]}", params={"company_id": company_id})
+    resp = await client.get(f"/companies/{company_id}/price-stats", params={"bins": 2})
+    assert resp.json()["items_count"] == 20
+
+
+@pytest.mark.asyncio
+async def test_get_company_price_stats_not_found(client):
+    resp = await client.get(f"/companies/{uuid.uuid4()}/price-stats")
+    assert resp.status_code == 404
+
+    resp = await client.get(f"/companies/{uuid.uuid4()}/price-stats", params={"bins": 0})
+    assert resp.status_code == 422
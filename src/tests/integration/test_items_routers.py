@@ -1,10 +1,24 @@
+import asyncio
 import uuid
 import json
 import pytest
 import pytest_asyncio
-from sqlalchemy import insert
-from items_app.infrastructure.postgres.models import Company
-from tests.integration.conftest import TestingSessionLocal, client
+from sqlalchemy import insert, select
+from functools import partial
+from items_app.main import app
+from items_app.api.providers import (
+    flush_company_prices,
+    get_async_cache_manager,
+    get_json_serializer,
+    get_price_write_behind,
+    load_items_batch,
+)
+from items_app.application.write_behind.price_write_behind import PriceWriteBehindBuffer
+from items_app.application.cache_outbox.cache_outbox_relay import CacheOutboxRelay
+from items_app.application.change_stream.change_stream import ChangeStream
+from items_app.infrastructure.postgres.models import CacheOutboxEvent, Company
+from items_app.infrastructure.redis.cache.async_client import AsyncRedisClient
+from tests.integration.conftest import TestingSessionLocal, client, testing_shard_router
 
 
 # --- Фикстура для передачи аргумента в роуты ---
@@ -17,6 +31,15 @@ async def company_id():
         return str(comp_id)
 
 
+# --- Отдельный буфер отложенной записи цен на тест ---
+@pytest_asyncio.fixture
+async def price_buffer():
+    buffer = PriceWriteBehindBuffer()
+    app.dependency_overrides[get_price_write_behind] = lambda: buffer
+    yield buffer
+    app.dependency_overrides.pop(get_price_write_behind)
+
+
 # --- Тесты ---
 @pytest.mark.asyncio
 async def test_create_item(client, company_id):
@@ -29,7 +52,7 @@ async def test_create_item(client, company_id):
     assert data["message"] == "New item created successfully"
 
     item_id = data["item"]["id"]
-    assert uuid.UUID(item_id).version == 4
+    assert uuid.UUID(item_id).version == 7
     assert data["item"]["title"] == "Candy"
     assert data["item"]["price"] == 0.45
     assert data["item"]["company_id"] == company_id
@@ -349,3 +372,753 @@ async def test_delete_items_with_partial_invalid_ids(client, company_id):
     )
     assert del_resp.status_code == 404
     assert del_resp.json()["detail"] == f"No items found with IDs {invalid_id}"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_items_prices(client, company_id):
+    resp1 = await client.post(
+        "/items", json={"title": "Item1", "price": 1.0, "company_id": company_id}
+    )
+    resp2 = await client.post(
+        "/items", json={"title": "Item2", "price": 2.0, "company_id": company_id}
+    )
+    id1 = resp1.json()["item"]["id"]
+    id2 = resp2.json()["item"]["id"]
+    missing_id = str(uuid.uuid4())
+
+    bulk_resp = await client.patch(
+        "/items/bulk",
+        json={
+            "company_id": company_id,
+            "items": [
+                {"item_id": id1, "price": 10.0},
+                {"item_id": id2, "price": 20.0, "title": "Renamed"},
+                {"item_id": missing_id, "price": 30.0},
+            ],
+        },
+    )
+    assert bulk_resp.status_code == 200
+    data = bulk_resp.json()
+    assert data["updated_count"] == 2
+    assert data["missing_ids"] == [missing_id]
+
+    get_resp1 = await client.get(f"/items/{id1}", params={"company_id": company_id})
+    get_resp2 = await client.get(f"/items/{id2}", params={"company_id": company_id})
+    assert get_resp1.json()["price"] == 10.0
+    assert get_resp1.json()["title"] == "Item1"
+    assert get_resp2.json()["price"] == 20.0
+    assert get_resp2.json()["title"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_items_of_other_company_are_missing(client, company_id):
+    create_resp = await client.post(
+        "/items", json={"title": "Item1", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+
+    bulk_resp = await client.patch(
+        "/items/bulk",
+        json={
+            "company_id": str(uuid.uuid4()),
+            "items": [{"item_id": item_id, "price": 10.0}],
+        },
+    )
+    assert bulk_resp.status_code == 200
+    assert bulk_resp.json()["updated_count"] == 0
+    assert bulk_resp.json()["missing_ids"] == [item_id]
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["price"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_items_with_empty_list(client, company_id):
+    bulk_resp = await client.patch(
+        "/items/bulk", json={"company_id": company_id, "items": []}
+    )
+    assert bulk_resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_items_of_company_ndjson(client, company_id):
+    await client.post(
+        "/items", json={"title": "Candy", "price": 0.45, "company_id": company_id}
+    )
+    await client.post(
+        "/items", json={"title": "Bombar", "price": 1.99, "company_id": company_id}
+    )
+
+    resp = await client.get(f"/items/company/{company_id}/export")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert {row["title"] for row in rows} == {"Candy", "Bombar"}
+    assert all(row["company_id"] == company_id for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_export_items_of_company_csv(client, company_id):
+    await client.post(
+        "/items", json={"title": "Candy", "price": 0.45, "company_id": company_id}
+    )
+
+    resp = await client.get(
+        f"/items/company/{company_id}/export", params={"format": "csv"}
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    lines = resp.text.splitlines()
+    assert lines[0] == "id,title,price,company_id"
+    assert len(lines) == 2
+    assert "Candy" in lines[1]
+
+
+@pytest.mark.asyncio
+async def test_export_items_of_company_with_invalid_format(client, company_id):
+    resp = await client.get(
+        f"/items/company/{company_id}/export", params={"format": "xml"}
+    )
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_export_items_of_unknown_or_deleted_company(client, company_id):
+    unknown_resp = await client.get(f"/items/company/{uuid.uuid4()}/export")
+    assert unknown_resp.status_code == 404
+
+    await client.delete(f"/companies/{company_id}")
+    deleted_resp = await client.get(
+        f"/items/company/{company_id}/export", params={"format": "csv"}
+    )
+    assert deleted_resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_ingest_items_upserts_ndjson(client, company_id):
+    create_resp = await client.post(
+        "/items", json={"title": "Old", "price": 1.0, "company_id": company_id}
+    )
+    existing_id = create_resp.json()["item"]["id"]
+    new_id = str(uuid.uuid4())
+
+    lines = [
+        json.dumps(
+            {"id": existing_id, "title": "Updated", "price": 2.0, "company_id": company_id}
+        ),
+        "not a json",
+        json.dumps(
+            {"id": new_id, "title": "New", "price": 3.0, "company_id": company_id}
+        ),
+        json.dumps(
+            {"id": str(uuid.uuid4()), "title": "", "price": 3.0, "company_id": company_id}
+        ),
+    ]
+    resp = await client.post("/items/ingest", content="\n".join(lines) + "\n")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["received_count"] == 2
+    assert data["upserted_count"] == 2
+    assert data["invalid_count"] == 2
+    assert data["invalid_lines"] == [2, 4]
+
+    get_resp1 = await client.get(f"/items/{existing_id}", params={"company_id": company_id})
+    get_resp2 = await client.get(f"/items/{new_id}", params={"company_id": company_id})
+    assert get_resp1.json()["title"] == "Updated"
+    assert get_resp2.json()["title"] == "New"
+
+
+@pytest.mark.asyncio
+async def test_ingest_items_does_not_take_over_other_company_items(client, company_id):
+    create_resp = await client.post(
+        "/items", json={"title": "Own", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+    other_company_id = str(uuid.uuid4())
+
+    line = json.dumps(
+        {"id": item_id, "title": "Stolen", "price": 9.0, "company_id": other_company_id}
+    )
+    resp = await client.post("/items/ingest", content=line)
+    assert resp.status_code == 200
+    assert resp.json()["upserted_count"] == 0
+    assert resp.json()["skipped_count"] == 1
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["title"] == "Own"
+
+
+@pytest.mark.asyncio
+async def test_ingest_items_keeps_item_id_with_its_first_company(client, company_id):
+    other_resp = await client.post("/companies", json={"name": "Other Company"})
+    other_company_id = other_resp.json()["company"]["id"]
+    item_id = str(uuid.uuid4())
+
+    first_resp = await client.post(
+        "/items/ingest",
+        content=json.dumps(
+            {"id": item_id, "title": "First", "price": 1.0, "company_id": company_id}
+        ),
+    )
+    second_resp = await client.post(
+        "/items/ingest",
+        content=json.dumps(
+            {"id": item_id, "title": "Second", "price": 2.0, "company_id": other_company_id}
+        ),
+    )
+    assert first_resp.json()["upserted_count"] == 1
+    assert second_resp.json()["upserted_count"] == 0
+    assert second_resp.json()["skipped_count"] == 1
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["title"] == "First"
+    other_get_resp = await client.get(
+        f"/items/{item_id}", params={"company_id": other_company_id}
+    )
+    assert other_get_resp.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_ingest_items_reuses_item_id_after_owner_company_is_deleted(client, company_id):
+    other_resp = await client.post("/companies", json={"name": "Other Company"})
+    other_company_id = other_resp.json()["company"]["id"]
+    create_resp = await client.post(
+        "/items", json={"title": "Own", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+    line = json.dumps(
+        {"id": item_id, "title": "Reused", "price": 2.0, "company_id": other_company_id}
+    )
+
+    # Удаление товара не освобождает ID, пока жива компания-владелец
+    await client.delete(f"/items/{item_id}", params={"company_id": company_id})
+    resp = await client.post("/items/ingest", content=line)
+    assert resp.json()["skipped_count"] == 1
+
+    await client.delete(f"/companies/{company_id}")
+    resp = await client.post("/items/ingest", content=line)
+    assert resp.json()["upserted_count"] == 1
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": other_company_id})
+    assert get_resp.json()["title"] == "Reused"
+
+
+@pytest.mark.asyncio
+async def test_get_items_of_company_by_company_id(client, company_id):
+    await client.post(
+        "/items", json={"title": "Candy", "price": 0.45, "company_id": company_id}
+    )
+    await client.post(
+        "/items", json={"title": "Bombar", "price": 1.99, "company_id": company_id}
+    )
+
+    resp = await client.get(f"/items/company/{company_id}")
+    assert resp.status_code == 200
+    assert {item["title"] for item in resp.json()} == {"Candy", "Bombar"}
+
+
+@pytest.mark.asyncio
+async def test_get_items_of_company_without_items(client, company_id):
+    resp = await client.get(f"/items/company/{company_id}")
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == f"No items found for company with company_id={company_id}"
+
+
+@pytest.mark.asyncio
+async def test_get_items_of_unknown_company(client):
+    unknown_id = str(uuid.uuid4())
+    resp = await client.get(f"/items/company/{unknown_id}")
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == f"Company with company_id={unknown_id} not found"
+
+
+@pytest.mark.asyncio
+async def test_get_all_items_with_total(client, company_id):
+    resp1 = await client.post(
+        "/items", json={"title": "Candy", "price": 0.45, "company_id": company_id}
+    )
+    await client.post(
+        "/items", json={"title": "Bombar", "price": 1.99, "company_id": company_id}
+    )
+
+    resp = await client.get("/items", params={"limit": 1, "include_total": True})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["items"]) == 1
+    assert data["total"] == 2
+    assert data["total_is_estimate"] is False
+
+    item_id = resp1.json()["item"]["id"]
+    await client.delete(f"/items/{item_id}", params={"company_id": company_id})
+    resp = await client.get("/items", params={"include_total": True})
+    assert resp.json()["total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_all_items_with_estimated_total_falls_back_to_counter(client, company_id):
+    await client.post(
+        "/items", json={"title": "Candy", "price": 0.45, "company_id": company_id}
+    )
+
+    resp = await client.get(
+        "/items", params={"include_total": True, "estimate_total": True}
+    )
+    assert resp.status_code == 200
+    assert resp.json()["total"] == 1
+    assert resp.json()["total_is_estimate"] is False
+
+
+@pytest.mark.asyncio
+async def test_search_items_by_substring_ranks_prefix_first(client, company_id):
+    for title in ("Dark chocolate", "Chocolate bar", "Milk", "Choco"):
+        await client.post(
+            "/items", json={"title": title, "price": 1.0, "company_id": company_id}
+        )
+
+    resp = await client.get("/items/search", params={"q": "choco"})
+    assert resp.status_code == 200
+    titles = [item["title"] for item in resp.json()]
+    assert titles == ["Choco", "Chocolate bar", "Dark chocolate"]
+
+
+@pytest.mark.asyncio
+async def test_search_items_by_prefix_scoped_by_company(client, company_id):
+    await client.post(
+        "/items", json={"title": "Dark chocolate", "price": 1.0, "company_id": company_id}
+    )
+    await client.post(
+        "/items", json={"title": "Chocolate bar", "price": 1.0, "company_id": company_id}
+    )
+
+    resp = await client.get(
+        "/items/search",
+        params={"q": "choco", "mode": "prefix", "company_id": company_id},
+    )
+    assert [item["title"] for item in resp.json()] == ["Chocolate bar"]
+
+    other_company_resp = await client.get(
+        "/items/search", params={"q": "choco", "company_id": str(uuid.uuid4())}
+    )
+    assert other_company_resp.json() == []
+
+
+@pytest.mark.asyncio
+async def test_search_items_escapes_wildcards(client, company_id):
+    await client.post(
+        "/items", json={"title": "100% juice", "price": 1.0, "company_id": company_id}
+    )
+    await client.post(
+        "/items", json={"title": "100 grams", "price": 1.0, "company_id": company_id}
+    )
+
+    resp = await client.get("/items/search", params={"q": "100%"})
+    assert [item["title"] for item in resp.json()] == ["100% juice"]
+
+
+@pytest.mark.asyncio
+async def test_get_all_items_filtered_by_price_and_sorted(client, company_id):
+    for title, price in (("A", 5.0), ("B", 1.0), ("C", 3.0), ("D", 10.0)):
+        await client.post(
+            "/items", json={"title": title, "price": price, "company_id": company_id}
+        )
+
+    resp = await client.get(
+        "/items", params={"min_price": 2, "max_price": 9, "sort": "-price"}
+    )
+    assert resp.status_code == 200
+    assert [item["title"] for item in resp.json()] == ["A", "C"]
+
+
+@pytest.mark.asyncio
+async def test_get_all_items_keyset_pagination(client, company_id):
+    for title, price in (("A", 5.0), ("B", 1.0), ("C", 3.0), ("D", 3.0), ("E", 10.0)):
+        await client.post(
+            "/items", json={"title": title, "price": price, "company_id": company_id}
+        )
+
+    seen_prices = []
+    params = {"sort": "price", "limit": 2}
+    for _ in range(5):
+        resp = await client.get("/items", params=params)
+        assert resp.status_code == 200
+        seen_prices += [item["price"] for item in resp.json()]
+        next_cursor = resp.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params = {"sort": "price", "limit": 2, "after": next_cursor}
+    assert seen_prices == [1.0, 3.0, 3.0, 5.0, 10.0]
+
+
+@pytest.mark.asyncio
+async def test_get_all_items_with_invalid_cursor(client):
+    resp = await client.get("/items", params={"after": "not-a-cursor"})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_item_changes_contain_upserts_and_tombstones_in_version_order(client, company_id):
+    first_resp = await client.post(
+        "/items", json={"title": "First", "price": 1.0, "company_id": company_id}
+    )
+    second_resp = await client.post(
+        "/items", json={"title": "Second", "price": 2.0, "company_id": company_id}
+    )
+    first_id, second_id = first_resp.json()["item"]["id"], second_resp.json()["item"]["id"]
+    await client.put(
+        f"/items/{first_id}",
+        json={"title": "First v2", "price": 1.5, "company_id": company_id},
+    )
+    await client.delete(f"/items/{second_id}", params={"company_id": company_id})
+
+    resp = await client.get("/items/changes")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [(change["op"], change["id"]) for change in data["changes"]] == [
+        ("upsert", first_id),
+        ("delete", second_id),
+    ]
+    upsert, delete = data["changes"]
+    assert (upsert["title"], upsert["price"]) == ("First v2", 1.5)
+    assert (delete["title"], delete["price"]) == (None, None)
+    assert upsert["version"] < delete["version"]
+    assert data["has_more"] is False
+
+    since_resp = await client.get("/items/changes", params={"since": upsert["version"]})
+    assert [change["id"] for change in since_resp.json()["changes"]] == [second_id]
+
+    # Полная синхронизация — без since: версия 0 есть у товаров до журнала изменений
+    zero_resp = await client.get("/items/changes", params={"since": 0})
+    assert zero_resp.status_code == 422
+
+    # Курсор последнего ответа отдаёт только новые изменения
+    await client.put(
+        f"/items/{first_id}",
+        json={"title": "First v3", "price": 1.5, "company_id": company_id},
+    )
+    next_resp = await client.get("/items/changes", params={"after": data["next_cursor"]})
+    assert [change["title"] for change in next_resp.json()["changes"]] == ["First v3"]
+
+
+@pytest.mark.asyncio
+async def test_item_changes_cursor_pagination(client, company_id):
+    created_ids = []
+    for index in range(5):
+        resp = await client.post(
+            "/items", json={"title": f"Item {index}", "price": 1.0, "company_id": company_id}
+        )
+        created_ids.append(resp.json()["item"]["id"])
+
+    seen_ids = []
+    params = {"company_id": company_id, "limit": 2}
+    for _ in range(5):
+        resp = await client.get("/items/changes", params=params)
+        assert resp.status_code == 200
+        data = resp.json()
+        seen_ids += [change["id"] for change in data["changes"]]
+        if not data["has_more"]:
+            break
+        params = {"company_id": company_id, "limit": 2, "after": data["next_cursor"]}
+    assert seen_ids == created_ids
+
+    invalid_resp = await client.get("/items/changes", params={"after": "not-a-cursor"})
+    assert invalid_resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_item_changes_record_items_of_deleted_company(client):
+    create_resp = await client.post("/companies", json={"name": "Closing"})
+    company_id = create_resp.json()["company"]["id"]
+    item_ids = []
+    for index in range(2):
+        resp = await client.post(
+            "/items", json={"title": f"Item {index}", "price": 1.0, "company_id": company_id}
+        )
+        item_ids.append(resp.json()["item"]["id"])
+
+    await client.delete(f"/companies/{company_id}")
+
+    resp = await client.get("/items/changes", params={"company_id": company_id})
+    changes = resp.json()["changes"]
+    assert {change["id"] for change in changes} == set(item_ids)
+    assert {change["op"] for change in changes} == {"delete"}
+
+
+@pytest.mark.asyncio
+async def test_get_items_of_company_filtered_by_price(client, company_id):
+    for title, price in (("Cheap", 1.0), ("Mid", 5.0), ("Expensive", 50.0)):
+        await client.post(
+            "/items", json={"title": title, "price": price, "company_id": company_id}
+        )
+
+    resp = await client.get(
+        f"/items/company/{company_id}",
+        params={"min_price": 2, "sort": "title", "limit": 1},
+    )
+    assert resp.status_code == 200
+    assert [item["title"] for item in resp.json()] == ["Expensive"]
+
+    next_resp = await client.get(
+        f"/items/company/{company_id}",
+        params={"min_price": 2, "sort": "title", "limit": 1, "after": resp.headers["X-Next-Cursor"]},
+    )
+    assert [item["title"] for item in next_resp.json()] == ["Mid"]
+
+
+@pytest.mark.asyncio
+async def test_item_of_other_company_is_forbidden_not_missing(client, company_id):
+    create_resp = await client.post(
+        "/items", json={"title": "Owned", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+    other_resp = await client.post("/companies", json={"name": "Other"})
+    other_company_id = other_resp.json()["company"]["id"]
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": other_company_id})
+    assert get_resp.status_code == 403
+    many_resp = await client.post(
+        "/items/get-many",
+        params={"company_id": other_company_id},
+        json={"item_ids": [item_id]},
+    )
+    assert many_resp.status_code == 403
+    update_resp = await client.put(
+        f"/items/{item_id}",
+        json={"title": "Taken", "price": 2.0, "company_id": other_company_id},
+    )
+    assert update_resp.status_code == 403
+    del_resp = await client.delete(f"/items/{item_id}", params={"company_id": other_company_id})
+    assert del_resp.status_code == 403
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.status_code == 200
+    assert get_resp.json()["title"] == "Owned"
+
+
+@pytest.mark.asyncio
+async def test_delete_items_with_foreign_id_deletes_nothing(client, company_id):
+    own_resp = await client.post(
+        "/items", json={"title": "Own", "price": 1.0, "company_id": company_id}
+    )
+    own_id = own_resp.json()["item"]["id"]
+    other_resp = await client.post("/companies", json={"name": "Other"})
+    other_company_id = other_resp.json()["company"]["id"]
+    foreign_resp = await client.post(
+        "/items", json={"title": "Foreign", "price": 1.0, "company_id": other_company_id}
+    )
+    foreign_id = foreign_resp.json()["item"]["id"]
+
+    del_resp = await client.request(
+        "DELETE",
+        "/items/delete-many",
+        params={"company_id": company_id},
+        content=json.dumps({"item_ids": [own_id, foreign_id]}),
+    )
+    assert del_resp.status_code == 403
+
+    get_resp = await client.get(f"/items/{own_id}", params={"company_id": company_id})
+    assert get_resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_write_invalidates_own_keys_and_leaves_outbox_to_relay(client, company_id):
+    await client.get("/items", params={"company_id": company_id})
+    create_resp = await client.post(
+        "/items", json={"title": "Fresh", "price": 1.0, "company_id": company_id}
+    )
+    assert create_resp.status_code == 200
+
+    list_resp = await client.get("/items", params={"company_id": company_id})
+    assert [item["title"] for item in list_resp.json()] == ["Fresh"]
+    async with TestingSessionLocal() as session:
+        cursor = await session.execute(select(CacheOutboxEvent.id))
+        pending_events = cursor.all()
+    assert pending_events
+
+    cache = get_async_cache_manager(AsyncRedisClient(), get_json_serializer())
+    assert await CacheOutboxRelay(TestingSessionLocal, cache).drain() == len(pending_events)
+    async with TestingSessionLocal() as session:
+        cursor = await session.execute(select(CacheOutboxEvent.id))
+        assert cursor.all() == []
+
+
+def batching_total(metrics, histogram, field):
+    # Метрики батчеров разбиты по шардам
+    return sum(shard_metrics[histogram][field] for shard_metrics in metrics.values())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_item_lookups_are_batched(client, company_id):
+    item_ids = []
+    for title in ("First", "Second", "Third"):
+        create_resp = await client.post(
+            "/items", json={"title": title, "price": 1.0, "company_id": company_id}
+        )
+        item_ids.append(create_resp.json()["item"]["id"])
+    # Без метки недавней записи чтения идут через общий батчер
+    client.cookies.clear()
+    before = (await client.get("/healthy/lookup-batching")).json().get("items", {})
+
+    responses = await asyncio.gather(
+        *(client.get(f"/items/{item_id}", params={"company_id": company_id}) for item_id in item_ids)
+    )
+
+    assert [response.json()["title"] for response in responses] == ["First", "Second", "Third"]
+    after = (await client.get("/healthy/lookup-batching")).json()["items"]
+    assert batching_total(after, "wait_seconds", "count") - batching_total(before, "wait_seconds", "count") == 3
+    assert batching_total(after, "batch_size", "sum") - batching_total(before, "batch_size", "sum") == 3
+
+
+@pytest.mark.asyncio
+async def test_item_lookup_batch_uses_its_own_shard_session(client, company_id):
+    create_resp = await client.post(
+        "/items", json={"title": "Batched", "price": 1.0, "company_id": company_id}
+    )
+    item_id = uuid.UUID(create_resp.json()["item"]["id"])
+    key = (item_id, uuid.UUID(company_id))
+
+    # Пакет загружается вне запроса: сессия берётся из фабрики шарда и закрывается после пакета
+    result = await load_items_batch(testing_shard_router.shards[0], [key])
+
+    assert result[key].title == "Batched"
+
+
+@pytest.mark.asyncio
+async def test_item_writes_are_published_to_change_stream(client, company_id):
+    stream = ChangeStream()
+    cache = get_async_cache_manager(AsyncRedisClient(), get_json_serializer())
+    listener = asyncio.create_task(stream.run(cache))
+    subscription = stream.subscribe(company_id=uuid.UUID(company_id))
+    # Ждём, пока слушатель подпишется на канал Redis
+    await asyncio.sleep(0.2)
+    try:
+        create_resp = await client.post(
+            "/items", json={"title": "Streamed", "price": 1.0, "company_id": company_id}
+        )
+        item_id = create_resp.json()["item"]["id"]
+        await client.patch(
+            "/items/bulk",
+            json={"company_id": company_id, "items": [{"item_id": item_id, "price": 2.0}]},
+        )
+        await client.delete(f"/items/{item_id}", params={"company_id": company_id})
+
+        events = [await subscription.next_event(timeout=1) for _ in range(3)]
+    finally:
+        listener.cancel()
+
+    assert [(event["entity"], event["type"]) for event in events] == [
+        ("item", "created"),
+        ("item", "updated"),
+        ("item", "deleted"),
+    ]
+    assert events[1]["data"] == {"id": item_id, "company_id": company_id, "price": 2.0}
+    assert int(events[0]["id"]) < int(events[1]["id"]) < int(events[2]["id"])
+
+
+@pytest.mark.asyncio
+async def test_ingested_items_are_published_as_created_or_updated(client, company_id):
+    existing_resp = await client.post(
+        "/items", json={"title": "Existing", "price": 1.0, "company_id": company_id}
+    )
+    existing_id = existing_resp.json()["item"]["id"]
+    new_id = str(uuid.uuid4())
+
+    stream = ChangeStream()
+    cache = get_async_cache_manager(AsyncRedisClient(), get_json_serializer())
+    listener = asyncio.create_task(stream.run(cache))
+    subscription = stream.subscribe(company_id=uuid.UUID(company_id))
+    await asyncio.sleep(0.2)
+    try:
+        lines = [
+            json.dumps({"id": existing_id, "title": "Existing v2", "price": 2.0, "company_id": company_id}),
+            json.dumps({"id": new_id, "title": "New", "price": 3.0, "company_id": company_id}),
+        ]
+        resp = await client.post("/items/ingest", content="\n".join(lines))
+        assert resp.json()["upserted_count"] == 2
+
+        events = [await subscription.next_event(timeout=1) for _ in range(2)]
+    finally:
+        listener.cancel()
+
+    assert {(event["data"]["id"], event["type"]) for event in events} == {
+        (existing_id, "updated"),
+        (new_id, "created"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_update_item_price_synchronously(client, company_id):
+    create_resp = await client.post(
+        "/items", json={"title": "Item1", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+
+    price_resp = await client.patch(
+        f"/items/{item_id}/price", json={"company_id": company_id, "price": 7.5}
+    )
+    assert price_resp.status_code == 200
+    assert price_resp.json()["durable"] is True
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["price"] == 7.5
+
+    other_resp = await client.patch(
+        f"/items/{item_id}/price", json={"company_id": str(uuid.uuid4()), "price": 1.0}
+    )
+    assert other_resp.status_code == 403
+    missing_resp = await client.patch(
+        f"/items/{uuid.uuid4()}/price", json={"company_id": company_id, "price": 1.0}
+    )
+    assert missing_resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_write_behind_price_updates_are_coalesced_until_flush(
+    client, company_id, price_buffer
+):
+    create_resp = await client.post(
+        "/items", json={"title": "Item1", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+
+    for price in (2.0, 3.0, 4.0):
+        price_resp = await client.patch(
+            f"/items/{item_id}/price",
+            params={"write_behind": True},
+            json={"company_id": company_id, "price": price},
+        )
+        assert price_resp.status_code == 202
+        assert price_resp.json()["durable"] is False
+
+    # До сброса чтения возвращают прежнюю цену
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["price"] == 1.0
+
+    flushed = await price_buffer.flush(partial(flush_company_prices, router=testing_shard_router))
+    assert flushed == 1
+    assert price_buffer.metrics()["coalesced"] == 2
+
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["price"] == 4.0
+    changes_resp = await client.get("/items/changes", params={"company_id": company_id})
+    assert changes_resp.json()["changes"][-1]["price"] == 4.0
+
+
+@pytest.mark.asyncio
+async def test_sync_item_update_cancels_buffered_price(client, company_id, price_buffer):
+    create_resp = await client.post(
+        "/items", json={"title": "Item1", "price": 1.0, "company_id": company_id}
+    )
+    item_id = create_resp.json()["item"]["id"]
+
+    await client.patch(
+        f"/items/{item_id}/price",
+        params={"write_behind": True},
+        json={"company_id": company_id, "price": 2.0},
+    )
+    put_resp = await client.put(
+        f"/items/{item_id}", json={"title": "Item1", "price": 5.0, "company_id": company_id}
+    )
+    assert put_resp.status_code == 200
+
+    assert await price_buffer.flush(partial(flush_company_prices, router=testing_shard_router)) == 0
+    get_resp = await client.get(f"/items/{item_id}", params={"company_id": company_id})
+    assert get_resp.json()["price"] == 5.0
@@ -0,0 +1,176 @@
+import json
+import uuid
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from items_app.main import app
+from items_app.api.providers import (
+    get_read_session,
+    get_session,
+    get_session_factory,
+    get_shard_router,
+)
+from items_app.infrastructure.postgres.models import Base, Company, Item
+from items_app.infrastructure.postgres.replicas import ReplicaRouter
+from items_app.infrastructure.postgres.shards import Shard, ShardRouter
+from tests.integration.conftest import client
+
+
+# --- Три локальные базы SQLite в роли шардов ---
+@pytest_asyncio.fixture
+async def shard_router(tmp_path):
+    engines = [
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / f'shard_{index}'}.db")
+        for index in range(3)
+    ]
+    for shard_engine in engines:
+        async with shard_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    router = ShardRouter(
+        [
+            Shard(
+                f"shard-{index}",
+                shard_engine,
+                ReplicaRouter(primary=async_sessionmaker(shard_engine, expire_on_commit=False)),
+            )
+            for index, shard_engine in enumerate(engines)
+        ]
+    )
+
+    # Сессии выдаёт маршрутизатор шардов, а не общая тестовая база
+    overridden = {
+        dependency: app.dependency_overrides.pop(dependency)
+        for dependency in (get_session, get_read_session, get_session_factory, get_shard_router)
+    }
+    app.dependency_overrides[get_shard_router] = lambda: router
+    yield router
+    app.dependency_overrides.update(overridden)
+    for shard_engine in engines:
+        await shard_engine.dispose()
+
+
+async def shard_company_ids(shard):
+    async with shard.replicas.write_session() as session:
+        cursor = await session.execute(select(Company.id))
+        return {str(company_id) for company_id in cursor.scalars()}
+
+
+async def shard_item_titles(shard):
+    async with shard.replicas.write_session() as session:
+        cursor = await session.execute(select(Item.title))
+        return set(cursor.scalars())
+
+
+# --- Тесты ---
+@pytest.mark.asyncio
+async def test_company_and_its_items_live_in_one_shard(client, shard_router):
+    company_ids = []
+    for index in range(6):
+        company_resp = await client.post("/companies", json={"name": f"Company {index}"})
+        company_id = company_resp.json()["company"]["id"]
+        company_ids.append(company_id)
+        item_resp = await client.post(
+            "/items", json={"title": f"Item {index}", "price": index + 1.0, "company_id": company_id}
+        )
+        assert item_resp.status_code == 200, item_resp.text
+
+    for index, company_id in enumerate(company_ids):
+        owner = shard_router.shard_for(uuid.UUID(company_id))
+        for shard in shard_router.shards:
+            has_company = company_id in await shard_company_ids(shard)
+            has_item = f"Item {index}" in await shard_item_titles(shard)
+            assert has_company == has_item == (shard is owner)
+
+        get_resp = await client.get(f"/companies/{company_id}")
+        assert get_resp.status_code == 200
+        items_resp = await client.get(f"/items/company/{company_id}")
+        assert [item["title"] for item in items_resp.json()] == [f"Item {index}"]
+
+
+@pytest.mark.asyncio
+async def test_lists_are_gathered_from_all_shards_in_order(client, shard_router):
+    company_ids = []
+    for index in range(6):
+        company_resp = await client.post("/companies", json={"name": f"Company {index}"})
+        company_ids.append(company_resp.json()["company"]["id"])
+    for index in range(12):
+        await client.post(
+            "/items",
+            json={"title": f"Item {index}", "price": index + 1.0, "company_id": company_ids[index % 6]},
+        )
+    used_shards = {
+        shard_router.shard_for(uuid.UUID(company_id)).name
+        for company_id in company_ids
+    }
+    assert len(used_shards) > 1
+
+    page_resp = await client.get(
+        "/items", params={"sort": "-price", "offset": 3, "limit": 4, "include_total": True}
+    )
+    page = page_resp.json()
+    assert [item["price"] for item in page["items"]] == [9.0, 8.0, 7.0, 6.0]
+    assert page["total"] == 12
+
+    first_resp = await client.get("/items", params={"sort": "price", "limit": 5})
+    assert [item["price"] for item in first_resp.json()] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    cursor = first_resp.headers["X-Next-Cursor"]
+    second_resp = await client.get("/items", params={"sort": "price", "limit": 5, "after": cursor})
+    assert [item["price"] for item in second_resp.json()] == [6.0, 7.0, 8.0, 9.0, 10.0]
+
+    companies_resp = await client.get("/companies", params={"limit": 10, "include_total": True})
+    companies = companies_resp.json()
+    assert [company["id"] for company in companies["companies"]] == sorted(
+        company_ids, key=lambda company_id: uuid.UUID(company_id)
+    )
+    assert companies["total"] == 6
+
+
+@pytest.mark.asyncio
+async def test_ingested_items_are_written_to_shard_of_their_company(client, shard_router):
+    company_ids = []
+    for index in range(6):
+        company_resp = await client.post("/companies", json={"name": f"Company {index}"})
+        company_ids.append(company_resp.json()["company"]["id"])
+    assert len({shard_router.shard_for(uuid.UUID(company_id)).name for company_id in company_ids}) > 1
+
+    # Компания есть только в строках NDJSON: запрос маршрутизируется в шард 0
+    lines = [
+        json.dumps(
+            {"id": str(uuid.uuid4()), "title": f"Ingested {index}", "price": 1.0, "company_id": company_id}
+        )
+        for index, company_id in enumerate(company_ids)
+    ]
+    resp = await client.post("/items/ingest", content="\n".join(lines))
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["upserted_count"] == 6
+
+    for index, company_id in enumerate(company_ids):
+        owner = shard_router.shard_for(uuid.UUID(company_id))
+        for shard in shard_router.shards:
+            assert (f"Ingested {index}" in await shard_item_titles(shard)) == (shard is owner)
+        items_resp = await client.get(f"/items/company/{company_id}")
+        assert [item["title"] for item in items_resp.json()] == [f"Ingested {index}"]
+
+
+@pytest.mark.asyncio
+async def test_search_without_company_is_gathered_from_all_shards(client, shard_router):
+    company_ids = []
+    for index in range(6):
+        company_resp = await client.post("/companies", json={"name": f"Company {index}"})
+        company_ids.append(company_resp.json()["company"]["id"])
+    titles = ["Lamp", "Lamp shade", "Desk lamp", "Lamp post light", "Floor lamp", "Lampion"]
+    for title, company_id in zip(titles, company_ids):
+        await client.post("/items", json={"title": title, "price": 1.0, "company_id": company_id})
+    assert len({shard_router.shard_for(uuid.UUID(company_id)).name for company_id in company_ids}) > 1
+
+    # Сначала префиксные совпадения, затем более короткие названия — через все шарды
+    resp = await client.get("/items/search", params={"q": "lamp", "limit": 10})
+    assert [item["title"] for item in resp.json()] == [
+        "Lamp", "Lampion", "Lamp shade", "Lamp post light", "Desk lamp", "Floor lamp"
+    ]
+
+    page_resp = await client.get("/items/search", params={"q": "lamp", "offset": 2, "limit": 3})
+    assert [item["title"] for item in page_resp.json()] == [
+        "Lamp shade", "Lamp post light", "Desk lamp"
+    ]
@@ -55,6 +55,23 @@ async def test_get_returns_none_if_not_found(cache, mock_redis):
     mock_redis.get.return_value = None
     assert await cache.get("missing") is None
 
+@pytest.mark.asyncio
+async def test_get_many_keeps_order_and_misses(cache, mock_redis, mock_serializer):
+    mock_redis.mget.return_value = ["SER:a", None, "SER:c"]
+    result = await cache.get_many("k1", "k2", "k3")
+    mock_redis.mget.assert_awaited_once_with("k1", "k2", "k3")
+    assert result == ["a", None, "c"]
+
+@pytest.mark.asyncio
+async def test_set_many_serializes_values(cache, mock_redis):
+    await cache.set_many({"k1": "a", "k2": "b"}, ex=42)
+    mock_redis.mset.assert_awaited_once_with({"k1": "SER:a", "k2": "SER:b"}, 42)
+
+@pytest.mark.asyncio
+async def test_set_many_skips_empty_mapping(cache, mock_redis):
+    await cache.set_many({})
+    mock_redis.mset.assert_not_awaited()
+
 @pytest.mark.asyncio
 async def test_delete_calls_redis_delete(cache, mock_redis):
     mock_redis.delete.return_value = 2
@@ -76,3 +93,15 @@ async def test_delete_pattern_returns_zero_if_no_keys(cache, mock_redis):
     result = await cache.delete_pattern("prefix:*")
     mock_redis.delete.assert_not_awaited()
     assert result == 0
+
+
+@pytest.mark.asyncio
+async def test_publish_serializes_each_value(cache, mock_redis):
+    await cache.publish("channel", "a", "b")
+    mock_redis.publish.assert_awaited_once_with("channel", "SER:a", "SER:b")
+
+
+@pytest.mark.asyncio
+async def test_subscribe_deserializes_messages(cache, mock_redis):
+    mock_redis.subscribe = MagicMock(return_value=async_iterator(["SER:a", "SER:b"]))
+    assert [value async for value in cache.subscribe("channel")] == ["a", "b"]
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from items_app.application.cache_outbox.cache_outbox_relay import (
+    CacheOutboxRelay,
+    coalesce_patterns,
+    outbox_metrics,
+)
+from items_app.infrastructure.postgres.models import Base, CacheOutboxEvent
+
+
+# --- Локальная база SQLite с таблицей cache_outbox ---
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox'}.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def add_events(session_factory, *patterns):
+    async with session_factory() as session:
+        session.add_all(CacheOutboxEvent(pattern=pattern) for pattern in patterns)
+        await session.commit()
+
+
+async def pending_patterns(session_factory):
+    async with session_factory() as session:
+        cursor = await session.execute(select(CacheOutboxEvent.pattern))
+        return list(cursor.scalars())
+
+
+# --- Тесты ---
+def test_coalesce_patterns_drops_duplicates_and_covered_patterns():
+    patterns = [
+        "items:company_id=1:*",
+        "counts:items:*",
+        "items:*",
+        "items:all:*",
+        "counts:items:*",
+        "companies:*",
+    ]
+    assert coalesce_patterns(patterns) == ["counts:items:*", "items:*", "companies:*"]
+
+
+@pytest.mark.asyncio
+async def test_drain_applies_coalesced_batches_and_deletes_events(session_factory):
+    cache = AsyncMock()
+    await add_events(session_factory, "items:company_id=1:*", "items:*", "companies:*")
+    relay = CacheOutboxRelay(session_factory=session_factory, cache=cache, batch_size=2)
+
+    drained = await relay.drain()
+
+    assert drained == 3
+    assert cache.delete_pattern.await_count == 2
+    cache.delete_pattern.assert_any_await("items:*")
+    assert await pending_patterns(session_factory) == []
+    assert outbox_metrics["last_lag_seconds"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_drain_keeps_events_when_cache_is_unavailable(session_factory):
+    cache = AsyncMock()
+    cache.delete_pattern.side_effect = ConnectionError("Redis is down")
+    await add_events(session_factory, "items:*")
+    relay = CacheOutboxRelay(session_factory=session_factory, cache=cache)
+    failures = outbox_metrics["failures"]
+
+    assert await relay.drain() == 0
+
+    assert await pending_patterns(session_factory) == ["items:*"]
+    assert outbox_metrics["failures"] == failures + 1
+
+
+@pytest.mark.asyncio
+async def test_run_drains_when_woken_without_waiting_for_poll(session_factory):
+    cache = AsyncMock()
+    relay = CacheOutboxRelay(session_factory, cache)
+    task = asyncio.create_task(relay.run(poll_interval=60.0))
+    try:
+        await asyncio.sleep(0.05)
+        await add_events(session_factory, "items:*")
+        relay.wake()
+        for _ in range(100):
+            if not await pending_patterns(session_factory):
+                break
+            await asyncio.sleep(0.01)
+        assert await pending_patterns(session_factory) == []
+        cache.delete_pattern.assert_awaited_with("items:*")
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
@@ -0,0 +1,108 @@
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock
+from items_app.api.streaming import encode_change_events
+from items_app.application.change_stream.change_stream import (
+    CHANGE_STREAM_CHANNEL,
+    ChangePublisher,
+    ChangeStream,
+    company_event,
+    item_event,
+)
+
+
+def numbered(event, event_id):
+    return {"id": str(event_id), **event}
+
+
+async def never_disconnected():
+    return False
+
+
+# --- Тесты ---
+@pytest.mark.asyncio
+async def test_publisher_numbers_events_from_shared_sequence():
+    cache = AsyncMock()
+    cache.increment.return_value = 12
+    company_id = uuid4()
+    events = [company_event("created", company_id, "Shop"), company_event("deleted", company_id)]
+
+    await ChangePublisher(cache).publish(*events)
+
+    cache.increment.assert_awaited_once()
+    published = cache.publish.await_args.args
+    assert published[0] == CHANGE_STREAM_CHANNEL
+    assert [event["id"] for event in published[1:]] == ["11", "12"]
+
+
+@pytest.mark.asyncio
+async def test_publisher_swallows_redis_errors():
+    cache = AsyncMock()
+    cache.increment.side_effect = ConnectionError("Redis is down")
+
+    await ChangePublisher(cache).publish(company_event("created", uuid4()))
+
+    cache.publish.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_subscription_receives_only_events_of_its_company():
+    stream = ChangeStream()
+    company_id, other_company_id = uuid4(), uuid4()
+    subscription = stream.subscribe(company_id=company_id)
+
+    stream.dispatch(numbered(item_event("created", uuid4(), other_company_id), 1))
+    stream.dispatch(numbered(item_event("created", uuid4(), company_id, price=1.0), 2))
+
+    event = await subscription.next_event(timeout=0.1)
+    assert event["id"] == "2"
+    assert await subscription.next_event(timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_subscription_resumes_after_last_event_id():
+    stream = ChangeStream(buffer_size=3)
+    company_id = uuid4()
+    for event_id in range(1, 6):
+        stream.dispatch(numbered(company_event("updated", company_id), event_id))
+
+    resumed = stream.subscribe(last_event_id="3")
+    expired = stream.subscribe(last_event_id="1")
+
+    assert [(await resumed.next_event(timeout=0.1))["id"] for _ in range(2)] == ["4", "5"]
+    assert resumed.needs_resync is False
+    assert expired.needs_resync is True
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_disconnected_on_overflow():
+    stream = ChangeStream(queue_size=2)
+    slow = stream.subscribe()
+    company_id = uuid4()
+
+    for event_id in range(1, 4):
+        stream.dispatch(numbered(company_event("updated", company_id), event_id))
+
+    assert slow.overflowed is True
+    assert stream.metrics()["subscribers"] == 0
+    messages = [message async for message in encode_change_events(slow, never_disconnected)]
+    assert messages == [
+        'event: overflow\ndata: {"reason": "Client is too slow, reconnect with Last-Event-ID"}\n\n'
+    ]
+
+
+@pytest.mark.asyncio
+async def test_encode_change_events_formats_sse_and_keepalive():
+    stream = ChangeStream()
+    subscription = stream.subscribe()
+    company_id = uuid4()
+    stream.dispatch(numbered(company_event("created", company_id, "Shop"), 7))
+
+    messages = encode_change_events(subscription, never_disconnected, keepalive_seconds=0.01)
+    first = await messages.__anext__()
+    second = await messages.__anext__()
+    await messages.aclose()
+
+    assert first.startswith("id: 7\nevent: company.created\ndata: ")
+    assert f'"company_id": "{company_id}"' in first
+    assert second == ": keepalive\n\n"
@@ -1,10 +1,14 @@
+import asyncio
 import pytest
 from uuid import uuid4
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from tests.unit.fixtures import mock_repo, mock_cache
+from items_app.application.batching.micro_batcher import MicroBatcher
 from items_app.application.companies_applications.companies_applications_service import (
     CompaniesApplicationsService,
 )
+from items_app.application.company_filter.company_filter import CompanyExistenceFilter
+from items_app.infrastructure.postgres.rows import CompanyRow
 from items_app.application.companies_applications.companies_applications_exceptions import (
     CompanyNotFound,
 )
@@ -25,6 +29,33 @@ async def test_create_company_success(service, mock_repo):
     mock_repo.commit.assert_awaited_once()
     assert result is company
 
+@pytest.mark.asyncio
+async def test_unknown_company_is_rejected_by_filter(mock_repo, mock_cache):
+    company_filter = MagicMock(spec=CompanyExistenceFilter)
+    company_filter.might_exist.return_value = False
+    service = CompaniesApplicationsService(
+        company_repo=mock_repo, cache=mock_cache, company_filter=company_filter
+    )
+
+    with pytest.raises(CompanyNotFound):
+        await service.fetch_company_by_id(uuid4())
+
+    mock_cache.get.assert_not_called()
+    mock_repo.get_company_by_id.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_created_company_is_added_to_filter(mock_repo, mock_cache):
+    company_filter = MagicMock(spec=CompanyExistenceFilter)
+    company = MagicMock()
+    mock_repo.add_company.return_value = company
+    service = CompaniesApplicationsService(
+        company_repo=mock_repo, cache=mock_cache, company_filter=company_filter
+    )
+
+    await service.create_company(company)
+
+    company_filter.add.assert_called_once_with(company.id)
+
 @pytest.mark.asyncio
 async def test_fetch_company_by_id_found(service, mock_repo, mock_cache):
     company_id = uuid4()
@@ -47,6 +78,31 @@ async def test_fetch_company_by_id_not_found(service, mock_repo, mock_cache):
     with pytest.raises(CompanyNotFound):
         await service.fetch_company_by_id(company_id)
 
+@pytest.mark.asyncio
+async def test_fetch_company_by_id_batches_concurrent_lookups(mock_repo, mock_cache):
+    companies = [CompanyRow(uuid4(), "First"), CompanyRow(uuid4(), "Second")]
+    missing_id = uuid4()
+    mock_cache.get_many.side_effect = lambda *keys: [None] * len(keys)
+    mock_repo.get_companies_by_ids.return_value = companies
+    service = CompaniesApplicationsService(company_repo=mock_repo, cache=mock_cache)
+    service.lookup_batcher = MicroBatcher(
+        "test", service.load_companies_batch, max_wait_seconds=0.001
+    )
+
+    results = await asyncio.gather(
+        *(service.fetch_company_by_id(company.id) for company in companies),
+        service.fetch_company_by_id(missing_id),
+        return_exceptions=True,
+    )
+
+    assert results[:2] == companies
+    assert isinstance(results[2], CompanyNotFound)
+    mock_repo.get_companies_by_ids.assert_awaited_once_with(
+        company_ids=[companies[0].id, companies[1].id, missing_id]
+    )
+    mock_repo.get_company_by_id.assert_not_called()
+    mock_cache.set_many.assert_awaited_once()
+
 @pytest.mark.asyncio
 async def test_fetch_all_companies_success(service, mock_repo, mock_cache):
     companies = [MagicMock(), MagicMock()]
@@ -111,3 +167,115 @@ async def test_delete_company_not_found(service, mock_repo):
         await service.delete_company(company_id)
 
     mock_repo.rollback.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_fetch_company_by_id_uses_read_repo(mock_repo, mock_cache):
+    read_repo = AsyncMock()
+    service = CompaniesApplicationsService(
+        company_repo=mock_repo, cache=mock_cache, read_company_repo=read_repo
+    )
+    company_id = uuid4()
+    mock_cache.get.return_value = None
+    read_repo.get_company_by_id.return_value = MagicMock()
+
+    await service.fetch_company_by_id(company_id)
+
+    read_repo.get_company_by_id.assert_awaited_once_with(company_id=company_id)
+    mock_repo.get_company_by_id.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_fetch_company_with_items_found(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    fake_company = MagicMock(items=[MagicMock()])
+    mock_cache.get.return_value = None
+    mock_repo.get_company_with_items.return_value = fake_company
+
+    result = await service.fetch_company_with_items(company_id, 0, 10)
+
+    mock_repo.get_company_with_items.assert_awaited_once_with(company_id=company_id, offset=0, limit=10)
+    mock_cache.set.assert_awaited_once()
+    assert result is fake_company
+
+@pytest.mark.asyncio
+async def test_fetch_company_with_items_not_found(service, mock_repo, mock_cache):
+    mock_cache.get.return_value = None
+    mock_repo.get_company_with_items.return_value = None
+
+    with pytest.raises(CompanyNotFound):
+        await service.fetch_company_with_items(uuid4())
+
+@pytest.mark.asyncio
+async def test_mark_company_deleted_success(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    mock_repo.mark_company_deleted.return_value = True
+    mock_repo.count_items_of_company.return_value = 7
+
+    progress = await service.mark_company_deleted(company_id)
+
+    mock_repo.commit.assert_awaited_once()
+    assert progress == {"status": "pending", "deleted_items": 0, "total_items": 7}
+
+@pytest.mark.asyncio
+async def test_mark_company_deleted_not_found(service, mock_repo):
+    mock_repo.mark_company_deleted.return_value = None
+
+    with pytest.raises(CompanyNotFound):
+        await service.mark_company_deleted(uuid4())
+
+    mock_repo.rollback.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_purge_deleted_company_deletes_in_batches(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    mock_cache.get.return_value = {"status": "pending", "deleted_items": 0, "total_items": 5}
+    mock_repo.delete_items_batch_of_company.side_effect = [2, 2, 1]
+
+    await service.purge_deleted_company(company_id, batch_size=2, pause_seconds=0)
+
+    assert mock_repo.delete_items_batch_of_company.await_count == 3
+    mock_repo.remove_deleted_company.assert_awaited_once_with(company_id=company_id)
+    assert mock_repo.commit.await_count == 4
+    last_progress = mock_cache.set.await_args.args[1]
+    assert last_progress == {"status": "completed", "deleted_items": 5, "total_items": 5}
+
+@pytest.mark.asyncio
+async def test_purge_deleted_company_resumes_interrupted_progress(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    mock_cache.get.return_value = {"status": "failed", "deleted_items": 4, "total_items": 5}
+    mock_repo.delete_items_batch_of_company.side_effect = [1]
+
+    await service.purge_deleted_company(company_id, batch_size=2, pause_seconds=0)
+
+    mock_repo.remove_deleted_company.assert_awaited_once_with(company_id=company_id)
+    last_progress = mock_cache.set.await_args.args[1]
+    assert last_progress == {"status": "completed", "deleted_items": 5, "total_items": 5}
+
+@pytest.mark.asyncio
+async def test_purge_deleted_company_reports_failure(service, mock_repo, mock_cache):
+    mock_cache.get.return_value = None
+    mock_repo.delete_items_batch_of_company.return_value = None
+
+    await service.purge_deleted_company(uuid4(), batch_size=2, pause_seconds=0)
+
+    mock_repo.remove_deleted_company.assert_not_called()
+    assert mock_cache.set.await_args.args[1]["status"] == "failed"
+
+@pytest.mark.asyncio
+async def test_fetch_company_stats_not_found(service, mock_repo, mock_cache):
+    mock_cache.get.return_value = None
+    mock_repo.get_company_stats.return_value = None
+
+    with pytest.raises(CompanyNotFound):
+        await service.fetch_company_stats(uuid4())
+
+    mock_cache.set.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_reconcile_company_stats_failure_rolls_back(service, mock_repo):
+    mock_repo.rebuild_company_stats.return_value = None
+
+    with pytest.raises(RuntimeError):
+        await service.reconcile_company_stats()
+
+    mock_repo.commit.assert_not_called()
+    mock_repo.rollback.assert_awaited_once()
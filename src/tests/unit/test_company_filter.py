@@ -0,0 +1,124 @@
+import time
+import pytest
+import pytest_asyncio
+from uuid import UUID, uuid4
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from items_app.application.company_filter.company_filter import (
+    BloomFilter,
+    CompanyExistenceFilter,
+)
+from items_app.infrastructure.postgres.ids import uuid7, uuid7_lower_bound
+from items_app.infrastructure.postgres.models import Base, Company
+
+
+# --- Локальная база SQLite с таблицей companies ---
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'companies'}.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def add_company(session_factory, company_id, is_deleted=False):
+    async with session_factory() as session:
+        await session.execute(
+            insert(Company).values(id=company_id, name="Company", is_deleted=is_deleted)
+        )
+        await session.commit()
+
+
+def old_uuid7(age_seconds=3600.0):
+    # UUIDv7 компании, созданной задолго до построения фильтра
+    random_bits = uuid4().int & ((1 << 62) - 1)
+    return UUID(int=uuid7_lower_bound(time.time() - age_seconds).int | random_bits)
+
+
+# --- Тесты ---
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter(capacity=10_000, false_positive_rate=0.01, max_bytes=1024 * 1024)
+    added = [uuid4().bytes for _ in range(10_000)]
+    for value in added:
+        bloom.add(value)
+
+    assert all(value in bloom for value in added)
+    false_positives = sum(uuid4().bytes in bloom for _ in range(10_000))
+    assert false_positives < 200
+    # Счётчик приблизителен: значение, попавшее в ложное срабатывание, не считается новым
+    assert 9_800 < bloom.count <= 10_000
+
+
+def test_bloom_filter_size_is_capped_by_max_bytes():
+    bloom = BloomFilter(capacity=1_000_000, false_positive_rate=0.001, max_bytes=1024)
+
+    assert bloom.size_bits == 1024 * 8
+    assert bloom.hashes >= 1
+
+
+def test_filter_accepts_everything_until_built():
+    company_filter = CompanyExistenceFilter(capacity=100)
+
+    assert company_filter.might_exist(uuid4())
+    assert company_filter.metrics()["ready"] is False
+
+
+@pytest.mark.asyncio
+async def test_rebuild_rejects_unknown_and_deleted_companies(session_factory):
+    existing_id, deleted_id = old_uuid7(), old_uuid7()
+    await add_company(session_factory, existing_id)
+    await add_company(session_factory, deleted_id, is_deleted=True)
+    company_filter = CompanyExistenceFilter(capacity=100, false_positive_rate=1e-6)
+
+    await company_filter.rebuild(session_factory)
+
+    assert company_filter.might_exist(existing_id)
+    assert not company_filter.might_exist(deleted_id)
+    assert not company_filter.might_exist(uuid4())
+    assert company_filter.metrics()["rejected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_added_and_refreshed_companies_are_accepted(session_factory):
+    company_filter = CompanyExistenceFilter(capacity=100, false_positive_rate=1e-6)
+    await company_filter.rebuild(session_factory)
+    created_here, created_elsewhere = uuid7(), uuid7()
+
+    company_filter.add(created_here)
+    await add_company(session_factory, created_elsewhere)
+    await company_filter.refresh(session_factory)
+
+    assert company_filter.might_exist(created_here)
+    assert company_filter.might_exist(created_elsewhere)
+
+
+@pytest.mark.asyncio
+async def test_company_created_elsewhere_is_not_rejected_before_refresh(session_factory):
+    company_filter = CompanyExistenceFilter(capacity=100, false_positive_rate=1e-6)
+    await company_filter.rebuild(session_factory)
+    # Компания другого экземпляра вставлена мимо фильтра, дозагрузки ещё не было
+    created_elsewhere = uuid7()
+    await add_company(session_factory, created_elsewhere)
+
+    assert created_elsewhere.bytes not in company_filter._bloom
+    assert company_filter.might_exist(created_elsewhere)
+    assert not company_filter.might_exist(old_uuid7())
+    assert company_filter.metrics()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rebuild_forgets_deleted_companies(session_factory):
+    company_id = old_uuid7()
+    await add_company(session_factory, company_id)
+    company_filter = CompanyExistenceFilter(capacity=100, false_positive_rate=1e-6)
+    await company_filter.rebuild(session_factory)
+    async with session_factory() as session:
+        await session.execute(
+            update(Company).where(Company.id == company_id).values(is_deleted=True)
+        )
+        await session.commit()
+
+    await company_filter.rebuild(session_factory)
+
+    assert not company_filter.might_exist(company_id)
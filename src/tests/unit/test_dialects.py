@@ -0,0 +1,37 @@
+import uuid
+from unittest.mock import MagicMock
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from items_app.infrastructure.postgres.dialects import in_values_batches
+from items_app.infrastructure.postgres.models import Item
+
+
+def session_of(dialect):
+    session = MagicMock()
+    session.get_bind.return_value.dialect = dialect
+    return session
+
+
+# --- Тесты ---
+def test_in_values_batches_binds_one_array_on_postgresql():
+    dialect = postgresql.asyncpg.dialect()
+    ids = [uuid.uuid4() for _ in range(5000)]
+
+    conditions = in_values_batches(session_of(dialect), Item.id, ids)
+
+    assert len(conditions) == 1
+    compiled = select(Item.id).where(conditions[0]).compile(dialect=dialect)
+    assert "= ANY ($1::UUID[])" in str(compiled)
+    assert len(compiled.params) == 1
+
+
+def test_in_values_batches_chunks_and_deduplicates_on_sqlite():
+    first, second, third = (uuid.uuid4() for _ in range(3))
+
+    conditions = in_values_batches(
+        session_of(sqlite.dialect()), Item.id, [first, second, first, third], chunk_size=2
+    )
+
+    assert len(conditions) == 2
+    assert conditions[0].right.value == [first, second]
+    assert conditions[1].right.value == [third]
@@ -0,0 +1,25 @@
+import time
+import uuid
+from items_app.infrastructure.postgres.ids import uuid7
+
+
+# --- Тесты ---
+def test_uuid7_has_version_and_variant():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_embeds_current_unix_time_in_ms():
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    after = time.time_ns() // 1_000_000
+    assert before <= value.int >> 80 <= after
+
+
+def test_uuid7_is_ordered_across_milliseconds():
+    first = uuid7()
+    time.sleep(0.002)
+    second = uuid7()
+    assert first < second
+    assert str(first) < str(second)
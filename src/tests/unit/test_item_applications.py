@@ -1,12 +1,21 @@
+import asyncio
 import pytest
 from uuid import uuid4
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from tests.unit.fixtures import mock_repo, mock_cache
+from items_app.application.batching.micro_batcher import MicroBatcher
 from items_app.application.items_applications.items_applications_service import (
     ItemsApplicationsService,
 )
+from items_app.application.company_filter.company_filter import CompanyExistenceFilter
+from items_app.application.companies_applications.companies_applications_exceptions import (
+    CompanyNotFound,
+)
+from items_app.infrastructure.postgres.rows import ItemChangeRow, ItemRow
 from items_app.application.items_applications.items_applications_exceptions import (
     ItemNotFound,
+    ItemsBulkUpdateFailed,
+    NoAccessToItem,
 )
 
 @pytest.fixture
@@ -35,6 +44,18 @@ async def test_create_item_failure_rolls_back(service, mock_repo):
     mock_repo.rollback.assert_awaited_once()
     mock_repo.commit.assert_not_called()
 
+@pytest.mark.asyncio
+async def test_create_item_for_unknown_company_is_rejected_by_filter(mock_repo, mock_cache):
+    company_filter = MagicMock(spec=CompanyExistenceFilter)
+    company_filter.might_exist.return_value = False
+    service = ItemsApplicationsService(mock_repo, mock_cache, company_filter=company_filter)
+
+    with pytest.raises(CompanyNotFound):
+        await service.create_item(MagicMock())
+
+    mock_repo.add_item.assert_not_called()
+    mock_repo.commit.assert_not_called()
+
 @pytest.mark.asyncio
 async def test_fetch_item_by_id_found(service, mock_repo, mock_cache):
     item_id = uuid4()
@@ -46,10 +67,25 @@ async def test_fetch_item_by_id_found(service, mock_repo, mock_cache):
 
     result = await service.fetch_item_by_id(item_id, company_id)
 
-    mock_repo.get_item_by_id.assert_awaited_once_with(item_id=item_id)
+    mock_repo.get_item_by_id.assert_awaited_once_with(item_id=item_id, company_id=company_id)
     mock_cache.set.assert_awaited_once()
     assert result is fake_item
 
+@pytest.mark.asyncio
+async def test_replica_reads_are_cached_with_short_ttl(mock_repo, mock_cache):
+    read_repo = AsyncMock()
+    company_id = uuid4()
+    fake_item = MagicMock(company_id=company_id)
+    read_repo.get_item_by_id.return_value = fake_item
+    mock_cache.get.return_value = None
+    service = ItemsApplicationsService(
+        mock_repo, mock_cache, read_item_repo=read_repo, read_cache_expire_seconds=5
+    )
+
+    await service.fetch_item_by_id(uuid4(), company_id)
+
+    assert mock_cache.set.await_args.kwargs["ex"] == 5
+
 @pytest.mark.asyncio
 async def test_fetch_item_by_id_not_found(service, mock_repo, mock_cache):
     item_id = uuid4()
@@ -60,6 +96,56 @@ async def test_fetch_item_by_id_not_found(service, mock_repo, mock_cache):
     with pytest.raises(ItemNotFound):
         await service.fetch_item_by_id(item_id, company_id)
 
+@pytest.mark.asyncio
+async def test_fetch_item_by_id_of_other_company_is_forbidden(service, mock_repo, mock_cache):
+    item_id = uuid4()
+    mock_cache.get.return_value = None
+    mock_repo.get_item_by_id.return_value = None
+    mock_repo.get_existing_item_ids.return_value = [item_id]
+
+    with pytest.raises(NoAccessToItem):
+        await service.fetch_item_by_id(item_id, uuid4())
+
+    mock_cache.set.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_fetch_item_by_id_batches_concurrent_lookups(mock_repo, mock_cache):
+    company_id = uuid4()
+    other_company_id = uuid4()
+    own_item = ItemRow(uuid4(), "Own", 1.0, company_id)
+    foreign_item = ItemRow(uuid4(), "Foreign", 2.0, other_company_id)
+    cached_item = ItemRow(uuid4(), "Cached", 3.0, company_id)
+    missing_id = uuid4()
+    mock_cache.get_many.side_effect = lambda *keys: [
+        cached_item if str(cached_item.id) in key else None for key in keys
+    ]
+    mock_repo.get_items_by_ids.return_value = [own_item, foreign_item]
+    service = ItemsApplicationsService(mock_repo, mock_cache)
+    service.lookup_batcher = MicroBatcher(
+        "test", service.load_items_batch, max_wait_seconds=0.001
+    )
+
+    results = await asyncio.gather(
+        service.fetch_item_by_id(own_item.id, company_id),
+        service.fetch_item_by_id(cached_item.id, company_id),
+        service.fetch_item_by_id(foreign_item.id, company_id),
+        service.fetch_item_by_id(missing_id, company_id),
+        return_exceptions=True,
+    )
+
+    assert results[0] == own_item
+    assert results[1] == cached_item
+    assert isinstance(results[2], NoAccessToItem)
+    assert isinstance(results[3], ItemNotFound)
+    mock_cache.get_many.assert_awaited_once()
+    mock_repo.get_items_by_ids.assert_awaited_once_with(
+        item_ids=[own_item.id, foreign_item.id, missing_id]
+    )
+    mock_repo.get_item_by_id.assert_not_called()
+    # В кеш попадает только товар своей компании
+    (cached_values,), _ = mock_cache.set_many.await_args
+    assert list(cached_values.values()) == [own_item]
+
 @pytest.mark.asyncio
 async def test_fetch_items_by_ids_all_found(service, mock_repo, mock_cache):
     ids = [uuid4(), uuid4()]
@@ -71,7 +157,7 @@ async def test_fetch_items_by_ids_all_found(service, mock_repo, mock_cache):
     result = await service.fetch_items_by_ids(ids, company_id)
 
     assert result == fake_items
-    mock_repo.get_items_by_ids.assert_awaited_once_with(item_ids=ids)
+    mock_repo.get_items_by_ids.assert_awaited_once_with(item_ids=ids, company_id=company_id)
     mock_cache.set.assert_awaited_once()
 
 @pytest.mark.asyncio
@@ -105,6 +191,8 @@ async def test_fetch_items_by_ids_empty_input(service, mock_repo, mock_cache):
 
     with pytest.raises(ItemNotFound):
         await service.fetch_items_by_ids([], company_id)
+    mock_cache.get.assert_not_awaited()
+    mock_repo.get_items_by_ids.assert_not_awaited()
 
 @pytest.mark.asyncio
 async def test_fetch_items_of_company_by_company_id_found(service, mock_repo, mock_cache):
@@ -169,7 +257,7 @@ async def test_delete_item_success(service, mock_repo):
 
     result = await service.delete_item(item_id, company_id)
 
-    mock_repo.delete_item_by_id.assert_awaited_once_with(item_id=item_id)
+    mock_repo.delete_item_by_id.assert_awaited_once_with(item_id=item_id, company_id=company_id)
     mock_repo.commit.assert_awaited_once()
     assert result is True
 
@@ -188,12 +276,11 @@ async def test_delete_item_not_found(service, mock_repo):
 async def test_delete_items_success(service, mock_repo):
     item_ids = [uuid4(), uuid4(), uuid4()]
     company_id = uuid4()
-    mock_repo.get_items_by_ids.return_value = [MagicMock(id=item_id, company_id=company_id) for item_id in item_ids]
-    mock_repo.delete_items_by_ids.return_value = True
+    mock_repo.delete_items_by_ids.return_value = item_ids
 
     result = await service.delete_items(item_ids, company_id)
 
-    mock_repo.delete_items_by_ids.assert_awaited_once_with(item_ids=item_ids)
+    mock_repo.delete_items_by_ids.assert_awaited_once_with(item_ids=item_ids, company_id=company_id)
     mock_repo.commit.assert_awaited_once()
     assert result is True
 
@@ -201,10 +288,205 @@ async def test_delete_items_success(service, mock_repo):
 async def test_delete_items_not_found(service, mock_repo):
     item_ids = [uuid4(), uuid4(), uuid4()]
     company_id = uuid4()
-    mock_repo.get_items_by_ids.return_value = []
-    mock_repo.delete_items_by_ids.return_value = None
+    mock_repo.delete_items_by_ids.return_value = []
+    mock_repo.get_existing_item_ids.return_value = []
 
     with pytest.raises(ItemNotFound):
         await service.delete_items(item_ids, company_id)
 
+    mock_repo.commit.assert_not_called()
     mock_repo.rollback.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_delete_items_of_other_company_is_forbidden(service, mock_repo):
+    item_ids = [uuid4(), uuid4()]
+    mock_repo.delete_items_by_ids.return_value = [item_ids[0]]
+    mock_repo.get_existing_item_ids.return_value = [item_ids[1]]
+
+    with pytest.raises(NoAccessToItem):
+        await service.delete_items(item_ids, uuid4())
+
+    mock_repo.get_existing_item_ids.assert_awaited_once_with(item_ids=[item_ids[1]])
+    mock_repo.commit.assert_not_called()
+    mock_repo.rollback.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_bulk_update_items_success(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    item_ids = [uuid4(), uuid4(), uuid4()]
+    updates = [(item_ids[0], 1.0, None), (item_ids[1], 2.0, "New"), (item_ids[2], 3.0, None)]
+    mock_repo.bulk_update_items.return_value = item_ids[:2]
+
+    updated_count, missing_ids = await service.bulk_update_items(company_id, updates)
+
+    mock_repo.bulk_update_items.assert_awaited_once_with(company_id=company_id, updates=updates)
+    mock_repo.commit.assert_awaited_once()
+    mock_cache.delete_pattern.assert_awaited_once()
+    assert updated_count == 2
+    assert missing_ids == [str(item_ids[2])]
+
+@pytest.mark.asyncio
+async def test_bulk_update_items_deduplicates_ids(service, mock_repo):
+    company_id = uuid4()
+    item_id = uuid4()
+    mock_repo.bulk_update_items.return_value = [item_id]
+
+    await service.bulk_update_items(company_id, [(item_id, 1.0, None), (item_id, 2.0, None)])
+
+    mock_repo.bulk_update_items.assert_awaited_once_with(
+        company_id=company_id, updates=[(item_id, 2.0, None)]
+    )
+
+@pytest.mark.asyncio
+async def test_bulk_update_items_failure_rolls_back(service, mock_repo):
+    mock_repo.bulk_update_items.return_value = None
+
+    with pytest.raises(ItemsBulkUpdateFailed):
+        await service.bulk_update_items(uuid4(), [(uuid4(), 1.0, None)])
+
+    mock_repo.rollback.assert_awaited_once()
+    mock_repo.commit.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_ingest_items_commits_per_chunk(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    items_data = [{"id": uuid4(), "title": "T", "price": 1.0, "company_id": company_id} for _ in range(5)]
+    mock_repo.upsert_items.side_effect = lambda chunk: [(item["id"], True) for item in chunk]
+
+    async def items():
+        for item_data in items_data:
+            yield item_data
+
+    summary = await service.ingest_items(items(), chunk_size=2)
+
+    assert mock_repo.upsert_items.await_count == 3
+    assert mock_repo.commit.await_count == 3
+    assert mock_repo.record_cache_invalidation.await_count == 3
+    mock_cache.delete_pattern.assert_awaited_once()
+    assert summary == {"received": 5, "upserted": 5, "skipped": 0, "failed": 0, "chunks": 3}
+
+@pytest.mark.asyncio
+async def test_ingest_items_counts_failed_chunk(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    mock_repo.upsert_items.return_value = None
+
+    async def items():
+        yield {"id": uuid4(), "title": "T", "price": 1.0, "company_id": company_id}
+
+    summary = await service.ingest_items(items())
+
+    mock_repo.commit.assert_not_called()
+    mock_cache.delete_pattern.assert_not_called()
+    assert summary["failed"] == 1
+
+@pytest.mark.asyncio
+async def test_count_items_uses_counter(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    mock_cache.get.return_value = None
+    mock_repo.count_items.return_value = 42
+
+    result = await service.count_items(company_id=company_id)
+
+    mock_repo.count_items.assert_awaited_once_with(company_id=company_id)
+    mock_repo.estimate_items_count.assert_not_called()
+    mock_cache.set.assert_awaited_once()
+    assert result == (42, False)
+
+@pytest.mark.asyncio
+async def test_count_items_uses_estimate_for_whole_table(service, mock_repo, mock_cache):
+    mock_cache.get.return_value = None
+    mock_repo.estimate_items_count.return_value = 1_000_000
+
+    result = await service.count_items(estimate=True)
+
+    mock_repo.count_items.assert_not_called()
+    assert result == (1_000_000, True)
+
+@pytest.mark.asyncio
+async def test_search_items_normalizes_query_and_caches(service, mock_repo, mock_cache):
+    mock_cache.get.return_value = None
+    mock_repo.search_items.return_value = []
+
+    result = await service.search_items("  Choco ", prefix_only=True)
+
+    mock_repo.search_items.assert_awaited_once_with(
+        query="choco", company_id=None, prefix_only=True, offset=0, limit=10
+    )
+    mock_cache.set.assert_awaited_once()
+    assert result == []
+
+@pytest.mark.asyncio
+async def test_fetch_all_items_passes_filters_and_keys_cache_by_them(service, mock_repo, mock_cache):
+    company_id = uuid4()
+    mock_cache.get.return_value = None
+    mock_repo.get_items.return_value = []
+
+    await service.fetch_all_items(0, 10, company_id=company_id, min_price=1.0, sort="-price")
+
+    mock_repo.get_items.assert_awaited_once_with(
+        0, 10, company_id=company_id, min_price=1.0, sort="-price"
+    )
+    cache_key = mock_cache.set.await_args.args[0]
+    assert f"company_id={company_id}" in cache_key
+    assert "min_price=1.0" in cache_key
+    assert "sort=-price" in cache_key
+
+@pytest.mark.asyncio
+async def test_create_item_records_invalidation_before_commit_and_wakes_relay(mock_repo, mock_cache):
+    relay = MagicMock()
+    service = ItemsApplicationsService(mock_repo, mock_cache, outbox_relay=relay)
+    calls = []
+    mock_repo.record_cache_invalidation.side_effect = lambda patterns: calls.append("record") or True
+    mock_repo.commit.side_effect = lambda: calls.append("commit")
+
+    await service.create_item(MagicMock())
+
+    assert calls == ["record", "commit"]
+    # Запись не разбирает outbox сама: удаляет свои ключи и будит фоновый ретранслятор
+    mock_cache.delete_pattern.assert_awaited_once()
+    relay.wake.assert_called_once()
+    relay.drain.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_write_succeeds_when_cache_is_unavailable_with_outbox(mock_repo, mock_cache):
+    relay = MagicMock()
+    service = ItemsApplicationsService(mock_repo, mock_cache, outbox_relay=relay)
+    mock_cache.delete_pattern.side_effect = ConnectionError("Redis is down")
+    item = MagicMock()
+    mock_repo.add_item.return_value = item
+
+    assert await service.create_item(item) is item
+
+    relay.wake.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_item_changes_keeps_position_per_shard(mock_repo, mock_cache):
+    company_id = uuid4()
+    first_shard, second_shard = AsyncMock(), AsyncMock()
+    first_changes = [
+        ItemChangeRow(version, "upsert", uuid4(), company_id, "Item", 1.0, 0.0)
+        for version in (10, 30)
+    ]
+    second_changes = [ItemChangeRow(20, "delete", uuid4(), company_id, None, None, 0.0)]
+    first_shard.get_item_changes.return_value = first_changes
+    second_shard.get_item_changes.return_value = second_changes
+    service = ItemsApplicationsService(
+        mock_repo, mock_cache, shard_read_item_repos=[first_shard, second_shard]
+    )
+
+    changes, positions, has_more = await service.fetch_item_changes(since=5, limit=2)
+
+    assert changes == [first_changes[0], second_changes[0]]
+    assert positions == [(10, first_changes[0].id), (20, second_changes[0].id)]
+    assert has_more is True
+    first_shard.get_item_changes.assert_awaited_once_with((5, None), 3, company_id=None)
+
+
+@pytest.mark.asyncio
+async def test_fetch_item_changes_rejects_cursor_of_other_scope(mock_repo, mock_cache):
+    service = ItemsApplicationsService(mock_repo, mock_cache)
+
+    with pytest.raises(ValueError):
+        await service.fetch_item_changes(after=[None, None])
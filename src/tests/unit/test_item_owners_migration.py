@@ -0,0 +1,85 @@
+import importlib.util
+from pathlib import Path
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from items_app.migrations import online_ops
+
+MIGRATION_PATH = (
+    Path(online_ops.__file__).parent
+    / "versions"
+    / "6c1f0e9a3b27_0012_create_item_owners_table.py"
+)
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("migration_0012", MIGRATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# --- Локальная база SQLite с товарами, где один ID есть у двух компаний ---
+@pytest.fixture
+def connection(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrations'}.db")
+    with engine.connect() as conn:
+        conn.execute(sa.text("CREATE TABLE companies (id VARCHAR PRIMARY KEY)"))
+        conn.execute(
+            sa.text(
+                "CREATE TABLE items (id VARCHAR, company_id VARCHAR, "
+                "PRIMARY KEY (company_id, id))"
+            )
+        )
+        conn.execute(
+            sa.text("INSERT INTO companies (id) VALUES ('company-a'), ('company-b')")
+        )
+        conn.execute(
+            sa.text(
+                "INSERT INTO items (id, company_id) VALUES "
+                "('item-1', 'company-a'), ('item-2', 'company-b'), ('item-2', 'company-a')"
+            )
+        )
+        conn.commit()
+        yield conn
+    engine.dispose()
+
+
+def run_operations(connection, operation):
+    context = MigrationContext.configure(connection)
+    with context.begin_transaction(_per_migration=True):
+        with Operations.context(context):
+            operation()
+
+
+# --- Тесты ---
+def test_upgrade_registers_one_owner_per_item_id(connection):
+    migration = load_migration()
+
+    run_operations(connection, migration.upgrade)
+
+    owners = connection.execute(
+        sa.text("SELECT id, company_id FROM item_owners ORDER BY id")
+    ).all()
+    # Дубликат достаётся компании с наименьшим company_id
+    assert owners == [("item-1", "company-a"), ("item-2", "company-a")]
+
+
+def test_item_owners_reject_second_owner_of_id(connection):
+    migration = load_migration()
+    run_operations(connection, migration.upgrade)
+
+    with pytest.raises(sa.exc.IntegrityError):
+        connection.execute(
+            sa.text("INSERT INTO item_owners (id, company_id) VALUES ('item-1', 'company-b')")
+        )
+
+
+def test_downgrade_drops_item_owners(connection):
+    migration = load_migration()
+    run_operations(connection, migration.upgrade)
+
+    run_operations(connection, migration.downgrade)
+
+    assert "item_owners" not in sa.inspect(connection).get_table_names()
@@ -0,0 +1,42 @@
+from uuid import uuid4
+from items_app.infrastructure.redis.cache.json_serializer import JsonSerializer
+from items_app.infrastructure.postgres.rows import ItemRow, CompanyRow, CompanyWithItemsRow
+
+
+# --- Тесты ---
+def test_item_rows_round_trip():
+    serializer = JsonSerializer()
+    rows = [ItemRow(uuid4(), "Candy", 0.45, uuid4()), ItemRow(uuid4(), "Bombar", 1.99, uuid4())]
+
+    result = serializer.loads(serializer.dumps(rows))
+
+    assert result == rows
+    assert all(isinstance(row, ItemRow) for row in result)
+
+def test_company_row_round_trip():
+    serializer = JsonSerializer()
+    row = CompanyRow(uuid4(), "Test Company")
+
+    result = serializer.loads(serializer.dumps(row))
+
+    assert isinstance(result, CompanyRow)
+    assert result == row
+
+def test_company_with_items_row_round_trip():
+    serializer = JsonSerializer()
+    company_id = uuid4()
+    row = CompanyWithItemsRow(company_id, "Test Company", [ItemRow(uuid4(), "Candy", 0.45, company_id)])
+
+    result = serializer.loads(serializer.dumps(row))
+
+    assert result == row
+    assert isinstance(result.items[0], ItemRow)
+
+def test_unregistered_type_is_not_instantiated():
+    serializer = JsonSerializer()
+    # Имена из модуля rows, не входящие в реестр строк, остаются словарями
+    payload = '{"__type__": "dataclass", "cls": "x"}'
+
+    result = serializer.loads(payload)
+
+    assert result == {"__type__": "dataclass", "cls": "x"}
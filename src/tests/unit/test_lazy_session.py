@@ -0,0 +1,79 @@
+import uuid
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from tests.unit.fixtures import mock_cache
+from items_app.application.items_applications.items_applications_service import (
+    ItemsApplicationsService,
+)
+from items_app.infrastructure.postgres.lazy_session import LazySession
+from items_app.infrastructure.postgres.models import Base, Company
+from items_app.infrastructure.postgres.repositories.item_repo import ItemRepo
+
+
+# --- Локальная база SQLite и счётчик созданных сессий ---
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'lazy'}.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def factory(engine):
+    return MagicMock(side_effect=async_sessionmaker(engine, expire_on_commit=False))
+
+
+# --- Тесты ---
+@pytest.mark.asyncio
+async def test_unused_session_is_never_created(engine, factory):
+    session = LazySession(factory, bind=engine)
+
+    await session.commit()
+    await session.rollback()
+    await session.close()
+
+    factory.assert_not_called()
+    assert session.get_bind().dialect.name == "sqlite"
+
+
+@pytest.mark.asyncio
+async def test_session_is_created_once_on_first_use(engine, factory):
+    session = LazySession(factory, bind=engine)
+    company_id = uuid.uuid4()
+
+    session.add(Company(id=company_id, name="Lazy"))
+    assert not session.is_acquired
+    await session.commit()
+    cursor = await session.execute(select(Company.name).where(Company.id == company_id))
+
+    assert cursor.scalar_one() == "Lazy"
+    factory.assert_called_once()
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_async_factory_is_awaited(engine):
+    real_factory = async_sessionmaker(engine, expire_on_commit=False)
+    factory = AsyncMock(side_effect=lambda: real_factory())
+    session = LazySession(factory, bind=engine)
+
+    await session.execute(select(Company.id))
+
+    factory.assert_awaited_once()
+    await session.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_does_not_create_session(engine, factory, mock_cache):
+    session = LazySession(factory, bind=engine)
+    service = ItemsApplicationsService(item_repo=ItemRepo(session), cache=mock_cache)
+    mock_cache.get.return_value = [MagicMock()]
+
+    await service.fetch_items_of_company_by_company_id(uuid.uuid4())
+
+    factory.assert_not_called()
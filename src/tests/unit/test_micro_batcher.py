@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from items_app.application.batching.micro_batcher import Histogram, MicroBatcher
+
+
+# --- Тесты ---
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 4, 16))
+    for value in (1, 3, 4, 10, 100):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot["buckets"] == {"1": 1, "4": 3, "16": 4, "+Inf": 5}
+    assert snapshot["count"] == 5
+    assert snapshot["sum"] == 118
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_share_one_batch():
+    loader = AsyncMock(side_effect=lambda keys: {key: key * 10 for key in keys})
+    batcher = MicroBatcher("test", loader, max_batch_size=100, max_wait_seconds=0.001)
+
+    results = await asyncio.gather(*(batcher.load(key) for key in (1, 2, 3, 2)))
+
+    assert results == [10, 20, 30, 20]
+    loader.assert_awaited_once_with([1, 2, 3])
+    metrics = batcher.metrics()
+    assert metrics["batch_size"]["count"] == 1
+    assert metrics["batch_size"]["sum"] == 3
+    assert metrics["wait_seconds"]["count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_batch_is_dispatched_when_full():
+    loader = AsyncMock(side_effect=lambda keys: {key: key for key in keys})
+    batcher = MicroBatcher("test", loader, max_batch_size=2, max_wait_seconds=10)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.load(key) for key in (1, 2, 3, 4))), timeout=1
+    )
+
+    assert results == [1, 2, 3, 4]
+    assert [call.args[0] for call in loader.await_args_list] == [[1, 2], [3, 4]]
+
+
+@pytest.mark.asyncio
+async def test_missing_key_resolves_to_none():
+    loader = AsyncMock(return_value={})
+    batcher = MicroBatcher("test", loader, max_wait_seconds=0)
+
+    assert await batcher.load("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_loader_error_is_raised_for_every_caller():
+    loader = AsyncMock(side_effect=RuntimeError("DB error"))
+    batcher = MicroBatcher("test", loader, max_wait_seconds=0.001)
+
+    results = await asyncio.gather(
+        batcher.load(1), batcher.load(2), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    loader.assert_awaited_once()
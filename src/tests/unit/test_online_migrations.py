@@ -0,0 +1,132 @@
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from items_app.migrations import online_ops
+from items_app.migrations.online_ops import (
+    PROGRESS_TABLE,
+    add_column_with_backfill,
+    backfill_in_batches,
+    create_index_concurrently,
+)
+
+
+# --- Локальная база SQLite с таблицей для миграций ---
+@pytest.fixture
+def connection(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrations'}.db")
+    with engine.connect() as conn:
+        conn.execute(sa.text("CREATE TABLE items (id INTEGER PRIMARY KEY, price FLOAT, views INTEGER)"))
+        conn.execute(
+            sa.text("INSERT INTO items (id, price) VALUES (:id, :price)"),
+            [{"id": item_id, "price": float(item_id)} for item_id in range(1, 26)],
+        )
+        conn.commit()
+        yield conn
+    engine.dispose()
+
+
+def run_operations(connection, operation):
+    # Транзакция одной ревизии, как при запуске alembic upgrade
+    context = MigrationContext.configure(connection)
+    with context.begin_transaction(_per_migration=True):
+        with Operations.context(context):
+            result = operation()
+    return result
+
+
+# --- Тесты ---
+def test_backfill_updates_rows_in_batches(connection):
+    rows_done = run_operations(
+        connection,
+        lambda: backfill_in_batches(
+            "views", "items", "views = 0", where="views IS NULL", batch_size=10, pause_seconds=0
+        ),
+    )
+
+    assert rows_done == 25
+    assert connection.execute(sa.text("SELECT COUNT(*) FROM items WHERE views = 0")).scalar() == 25
+    progress = connection.execute(
+        sa.text(f"SELECT last_key, rows_done FROM {PROGRESS_TABLE} WHERE name = 'views'")
+    ).one()
+    assert progress == ("25", 25)
+
+
+def test_backfill_batches_only_rows_matching_filter(connection, monkeypatch):
+    connection.execute(sa.text("UPDATE items SET views = 1 WHERE id NOT IN (3, 17, 24)"))
+    connection.commit()
+    sleeps = []
+    monkeypatch.setattr(online_ops.time, "sleep", sleeps.append)
+
+    rows_done = run_operations(
+        connection,
+        lambda: backfill_in_batches(
+            "views", "items", "views = 0", where="views IS NULL", batch_size=2, pause_seconds=0
+        ),
+    )
+
+    # Три подходящие строки из 25 — два пакета и одна пауза между ними
+    assert rows_done == 3
+    assert sleeps == [0]
+    progress = connection.execute(
+        sa.text(f"SELECT last_key, rows_done FROM {PROGRESS_TABLE} WHERE name = 'views'")
+    ).one()
+    assert progress == ("24", 3)
+
+
+def test_backfill_resumes_after_failure(connection, monkeypatch):
+    save_progress = online_ops._save_progress
+    saved = []
+
+    def failing_save_progress(name, last_key, rows_done):
+        save_progress(name, last_key, rows_done)
+        saved.append(last_key)
+        if len(saved) == 2:
+            raise RuntimeError("Connection lost")
+
+    monkeypatch.setattr(online_ops, "_save_progress", failing_save_progress)
+    with pytest.raises(RuntimeError):
+        run_operations(
+            connection,
+            lambda: backfill_in_batches("views", "items", "views = 1", batch_size=10, pause_seconds=0),
+        )
+    monkeypatch.setattr(online_ops, "_save_progress", save_progress)
+    connection.execute(sa.text("UPDATE items SET views = NULL"))
+    connection.commit()
+
+    rows_done = run_operations(
+        connection,
+        lambda: backfill_in_batches("views", "items", "views = 1", batch_size=10, pause_seconds=0),
+    )
+
+    assert rows_done == 25
+    # Уже обработанные до сбоя пакеты при продолжении не перечитываются
+    assert connection.execute(sa.text("SELECT COUNT(*) FROM items WHERE views = 1")).scalar() == 5
+
+
+def test_add_column_with_backfill_sets_not_null(connection):
+    run_operations(
+        connection,
+        lambda: add_column_with_backfill(
+            "items",
+            sa.Column("currency", sa.String(), nullable=False),
+            "'RUB'",
+            batch_size=7,
+            pause_seconds=0,
+        ),
+    )
+
+    columns = {column["name"]: column for column in sa.inspect(connection).get_columns("items")}
+    assert columns["currency"]["nullable"] is False
+    assert connection.execute(
+        sa.text("SELECT COUNT(*) FROM items WHERE currency = 'RUB'")
+    ).scalar() == 25
+
+
+def test_create_index_falls_back_to_plain_index(connection):
+    run_operations(
+        connection, lambda: create_index_concurrently("ix_items_price", "items", ["price"])
+    )
+
+    indexes = sa.inspect(connection).get_indexes("items")
+    assert [index["name"] for index in indexes] == ["ix_items_price"]
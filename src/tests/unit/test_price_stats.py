@@ -0,0 +1,47 @@
+import numpy as np
+from items_app.application.price_stats.price_stats import (
+    compute_price_stats,
+    outlier_bounds,
+)
+
+
+# --- Тесты ---
+def test_price_stats_match_reference_computation():
+    prices = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0])
+
+    stats = compute_price_stats(prices, bins=3, z_threshold=3.0)
+
+    assert stats["items_count"] == 10
+    assert stats["mean"] == 5.5
+    assert stats["min_price"] == 1.0
+    assert stats["max_price"] == 10.0
+    assert stats["quantiles"]["p50"] == 5.5
+    assert stats["quantiles"]["p25"] == 3.25
+    assert stats["histogram"]["edges"] == [1.0, 4.0, 7.0, 10.0]
+    # Последняя корзина включает правую границу
+    assert stats["histogram"]["counts"] == [3, 3, 4]
+    assert stats["outliers_count"] == 0
+
+
+def test_outliers_are_flagged_by_z_score():
+    prices = np.array([10.0] * 20 + [1000.0])
+
+    stats = compute_price_stats(prices, bins=5, z_threshold=3.0)
+
+    assert stats["outliers_count"] == 1
+    low, high = outlier_bounds(stats["mean"], stats["std"], 3.0)
+    assert low < 10.0 < high < 1000.0
+    assert sum(stats["histogram"]["counts"]) == 21
+
+
+def test_equal_and_empty_prices_have_no_outliers():
+    equal = compute_price_stats(np.full(5, 2.5), bins=4, z_threshold=1.0)
+    assert equal["std"] == 0.0
+    assert equal["outliers_count"] == 0
+    assert outlier_bounds(equal["mean"], equal["std"], 1.0) is None
+
+    empty = compute_price_stats(np.array([], dtype=np.float64), bins=4, z_threshold=1.0)
+    assert empty["items_count"] == 0
+    assert empty["mean"] is None
+    assert empty["quantiles"]["p50"] is None
+    assert empty["histogram"] == {"edges": [], "counts": []}
@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import pytest
+from uuid import uuid4
+from items_app.application.write_behind.price_write_behind import (
+    PriceBufferFull,
+    PriceWriteBehindBuffer,
+)
+
+
+class RecordingFlusher:
+    def __init__(self, fail_companies=(), missing=()):
+        self.calls = []
+        self.fail_companies = set(fail_companies)
+        self.missing = set(missing)
+
+    async def __call__(self, company_id, updates):
+        self.calls.append((company_id, updates))
+        if company_id in self.fail_companies:
+            raise ConnectionError("Database is down")
+        missing_ids = [str(item_id) for item_id, _, _ in updates if item_id in self.missing]
+        return len(updates) - len(missing_ids), missing_ids
+
+
+# --- Тесты ---
+@pytest.mark.asyncio
+async def test_buffer_keeps_only_last_price_of_item():
+    buffer = PriceWriteBehindBuffer()
+    flusher = RecordingFlusher()
+    company_id, item_id, other_id = uuid4(), uuid4(), uuid4()
+
+    for price in (1.0, 2.0, 3.0):
+        buffer.put(company_id, item_id, price)
+    buffer.put(company_id, other_id, 5.0)
+
+    assert await buffer.flush(flusher) == 2
+    assert flusher.calls == [(company_id, [(item_id, 3.0, None), (other_id, 5.0, None)])]
+    metrics = buffer.metrics()
+    assert metrics["accepted"] == 4
+    assert metrics["coalesced"] == 2
+    assert metrics["flushed_items"] == 2
+    assert metrics["pending_items"] == 0
+    assert metrics["flush_size"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_groups_prices_by_company_and_counts_missing_items():
+    buffer = PriceWriteBehindBuffer()
+    first_company, second_company = uuid4(), uuid4()
+    deleted_id = uuid4()
+    flusher = RecordingFlusher(missing={deleted_id})
+
+    buffer.put(first_company, uuid4(), 1.0)
+    buffer.put(second_company, uuid4(), 2.0)
+    buffer.put(second_company, deleted_id, 3.0)
+
+    assert await buffer.flush(flusher) == 2
+    assert [company_id for company_id, _ in flusher.calls] == [first_company, second_company]
+    assert buffer.metrics()["dropped_missing"] == 1
+    # Пустой буфер не сбрасывается
+    assert await buffer.flush(flusher) == 0
+    assert buffer.metrics()["flushes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_prices_without_overwriting_newer_ones():
+    buffer = PriceWriteBehindBuffer()
+    company_id, item_id, other_id = uuid4(), uuid4(), uuid4()
+    buffer.put(company_id, item_id, 1.0)
+    buffer.put(company_id, other_id, 2.0)
+
+    async def failing_flusher(flushed_company_id, updates):
+        # Новая цена пришла, пока сброс выполнялся
+        buffer.put(company_id, item_id, 10.0)
+        raise ConnectionError("Database is down")
+
+    assert await buffer.flush(failing_flusher) == 0
+    assert buffer.pending_price(company_id, item_id) == 10.0
+    assert buffer.pending_price(company_id, other_id) == 2.0
+    metrics = buffer.metrics()
+    assert metrics["flush_failures"] == 1
+    assert metrics["requeued_items"] == 1
+    assert metrics["pending_items"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_run_flushes_prices_of_interrupted_flush():
+    buffer = PriceWriteBehindBuffer(flush_interval_seconds=0.01)
+    company_id, item_id = uuid4(), uuid4()
+    flush_started = asyncio.Event()
+    persisted = {}
+
+    async def slow_flusher(flushed_company_id, updates):
+        if not flush_started.is_set():
+            # Первый сброс прерывается остановкой приложения до записи в БД
+            flush_started.set()
+            await asyncio.sleep(60)
+        persisted.update({updated_id: price for updated_id, price, _ in updates})
+        return len(updates), []
+
+    buffer.put(company_id, item_id, 7.0)
+    task = asyncio.create_task(buffer.run(slow_flusher))
+    await asyncio.wait_for(flush_started.wait(), timeout=1)
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+    assert persisted == {item_id: 7.0}
+    assert buffer.metrics()["pending_items"] == 0
+
+
+def test_threshold_wakes_flush_and_full_buffer_rejects_new_items():
+    buffer = PriceWriteBehindBuffer(flush_threshold=2, max_pending=3)
+    company_id, item_id = uuid4(), uuid4()
+
+    buffer.put(company_id, item_id, 1.0)
+    assert not buffer._threshold_reached.is_set()
+    buffer.put(company_id, uuid4(), 1.0)
+    assert buffer._threshold_reached.is_set()
+    buffer.put(company_id, uuid4(), 1.0)
+
+    with pytest.raises(PriceBufferFull):
+        buffer.put(company_id, uuid4(), 1.0)
+    # Новая цена уже буферизованного товара принимается и в полном буфере
+    buffer.put(company_id, item_id, 2.0)
+    assert buffer.metrics()["rejected_full"] == 1
+
+
+def test_sync_write_discards_buffered_price():
+    buffer = PriceWriteBehindBuffer()
+    company_id, item_id = uuid4(), uuid4()
+    buffer.put(company_id, item_id, 1.0)
+
+    buffer.discard(company_id, [item_id, uuid4()])
+
+    assert buffer.pending_price(company_id, item_id) is None
+    metrics = buffer.metrics()
+    assert metrics["discarded_by_sync_writes"] == 1
+    assert metrics["pending_items"] == 0
+    assert metrics["pending_companies"] == 0
@@ -0,0 +1,95 @@
+import time
+import uuid
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from unittest.mock import MagicMock
+from items_app.api.middlewares import PRIMARY_STICKY_COOKIE
+from items_app.api.providers import get_read_cache_expire_seconds
+from items_app.infrastructure.config import config
+from items_app.infrastructure.postgres.models import Base, Company
+from items_app.infrastructure.postgres.replicas import ReplicaRouter
+from items_app.infrastructure.postgres.shards import Shard, ShardRouter
+
+
+# --- Две локальные базы SQLite: основная и реплика ---
+@pytest_asyncio.fixture
+async def databases(tmp_path):
+    engines = []
+    session_factories = []
+    for name in ("primary", "replica"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Company).values(id=uuid.uuid4(), name=name))
+        engines.append(engine)
+        session_factories.append(async_sessionmaker(engine, expire_on_commit=False))
+    yield session_factories
+    for engine in engines:
+        await engine.dispose()
+
+
+async def company_name(session):
+    async with session:
+        cursor = await session.execute(select(Company.name))
+        return cursor.scalar_one()
+
+
+# --- Тесты ---
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_and_writes_to_primary(databases):
+    primary, replica = databases
+    router = ReplicaRouter(primary=primary, replicas=[replica])
+
+    assert await company_name(await router.read_session()) == "replica"
+    assert await company_name(router.write_session()) == "primary"
+
+@pytest.mark.asyncio
+async def test_reads_fall_back_to_primary_without_replicas(databases):
+    primary, _ = databases
+    router = ReplicaRouter(primary=primary)
+
+    assert await company_name(await router.read_session()) == "primary"
+
+@pytest.mark.asyncio
+async def test_unhealthy_replica_falls_back_to_primary(databases, tmp_path):
+    primary, _ = databases
+    broken_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'missing_dir' / 'replica.db'}"
+    )
+    broken_replica = async_sessionmaker(broken_engine, expire_on_commit=False)
+    router = ReplicaRouter(primary=primary, replicas=[broken_replica])
+
+    assert await company_name(await router.read_session()) == "primary"
+    await broken_engine.dispose()
+
+@pytest.mark.asyncio
+async def test_healthy_replicas_are_used_round_robin(databases):
+    primary, replica = databases
+    router = ReplicaRouter(primary=primary, replicas=[replica, primary])
+
+    names = [await company_name(await router.read_session()) for _ in range(4)]
+
+    assert names == ["replica", "primary", "replica", "primary"]
+
+
+def test_reads_from_replicas_get_short_cache_ttl(databases):
+    primary, replica = databases
+    request = MagicMock(cookies={})
+    with_replicas = ShardRouter(
+        [Shard("shard-0", None, ReplicaRouter(primary=primary, replicas=[replica]))]
+    )
+    without_replicas = ShardRouter([Shard("shard-0", None, ReplicaRouter(primary=primary))])
+
+    assert get_read_cache_expire_seconds(request, with_replicas) == (
+        config.DB_REPLICA_CACHE_EXPIRE_SECONDS
+    )
+    assert get_read_cache_expire_seconds(request, without_replicas) == (
+        config.REDIS_CACHE_EXPIRE_SECONDS
+    )
+    # Клиент, недавно писавший, читает с основной базы
+    request.cookies = {PRIMARY_STICKY_COOKIE: str(time.time() + 60)}
+    assert get_read_cache_expire_seconds(request, with_replicas) == (
+        config.REDIS_CACHE_EXPIRE_SECONDS
+    )
@@ -0,0 +1,57 @@
+import pytest
+from uuid import uuid4
+from unittest.mock import MagicMock
+from items_app.infrastructure.postgres.shards import Shard, ShardRouter
+
+
+def make_shards(count):
+    return [Shard(f"shard-{index}", MagicMock(), MagicMock()) for index in range(count)]
+
+
+# --- Тесты ---
+def test_single_shard_serves_every_company():
+    shards = make_shards(1)
+    router = ShardRouter(shards)
+
+    assert not router.is_sharded
+    assert router.shard_for(uuid4()) is shards[0]
+
+
+def test_requests_without_company_go_to_first_shard():
+    shards = make_shards(3)
+
+    assert ShardRouter(shards).shard_for(None) is shards[0]
+
+
+def test_companies_are_spread_over_shards_stably():
+    shards = make_shards(4)
+    router = ShardRouter(shards)
+    company_ids = [uuid4() for _ in range(4000)]
+
+    assignment = [router.shard_for(company_id) for company_id in company_ids]
+
+    assert assignment == [ShardRouter(shards).shard_for(company_id) for company_id in company_ids]
+    for shard in shards:
+        assert 600 < assignment.count(shard) < 1400
+
+
+def test_adding_shard_moves_only_its_share_of_companies():
+    shards = make_shards(4)
+    company_ids = [uuid4() for _ in range(4000)]
+    before = ShardRouter(shards)
+    after = ShardRouter(shards + make_shards(5)[4:])
+
+    moved = [
+        company_id
+        for company_id in company_ids
+        if before.shard_for(company_id).name != after.shard_for(company_id).name
+    ]
+
+    # Переезжают только компании нового шарда (около 1/5)
+    assert all(after.shard_for(company_id).name == "shard-4" for company_id in moved)
+    assert 400 < len(moved) < 1300
+
+
+def test_router_requires_shards():
+    with pytest.raises(ValueError):
+        ShardRouter([])